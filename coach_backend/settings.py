@@ -43,11 +43,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removed at startup unless PLAYCALLING_SERVER_TIMING is on.
+    'playcalling.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Routes play history queries to the request's organization database.
+    'playcalling.sharding.OrganizationMiddleware',
+    # Removed at startup unless PLAYCALLING_REPLICAS names a replica.
+    'playcalling.replicas.ReadAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +82,32 @@ WSGI_APPLICATION = 'coach_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept open for CONN_MAX_AGE seconds and checked before reuse.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Play history shard; assign organizations to it in PLAYCALLING_SHARDS.
+    'shard1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'shard1.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Read replica of default; enable it in PLAYCALLING_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
 
+DATABASE_ROUTERS = ['playcalling.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -136,3 +161,142 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
     ],
 }
+
+# Playcalling
+# Recommendation engine: 'rules' evaluates the heuristics on every request,
+# 'precompiled' looks the answer up in a table built once at startup, and
+# 'history' adjusts the pitch call using recorded outcomes (see
+# PLAYCALLING_HISTORY_ENGINE), and 'packs' evaluates hot-reloadable rule packs
+# (see PLAYCALLING_RULE_PACKS).
+PLAYCALLING_ENGINE = 'rules'
+
+# Largest number of situations accepted by POST /api/recommendations/batch/.
+PLAYCALLING_BATCH_MAX_SIZE = 10000
+
+# Seconds clients may keep GET /api/recommendations/table/ before revalidating.
+PLAYCALLING_DECISION_TABLE_MAX_AGE = 86400
+
+# Plays per page returned by GET /api/plays/ (keyset pagination).
+PLAYCALLING_HISTORY_PAGE_SIZE = 50
+
+# Queue saved recommendations in-process and insert them in background batches
+# instead of inside the request. See playcalling/writebehind.py for the options.
+PLAYCALLING_HISTORY_WRITE_BEHIND = False
+PLAYCALLING_HISTORY_BUFFER = {
+    'max_size': 10000,
+    'batch_size': 500,
+    'flush_interval': 0.5,
+    'overflow': 'sync',
+}
+
+# Rows fetched per database round trip by GET /api/plays/export/.
+PLAYCALLING_EXPORT_CHUNK_SIZE = 2000
+
+# Cache of rendered recommendation responses keyed on the canonical situation.
+# backend: 'local' (per-process LRU of max_entries) or 'django' (the `alias`
+# cache shared by all workers); set to None to disable.
+PLAYCALLING_RESPONSE_CACHE = {
+    'backend': 'local',
+    'max_entries': 4096,
+}
+
+# Validate JSON recommendation requests with the compact validator and encode
+# responses directly instead of going through the DRF serializers. The
+# browsable API always uses the serializers.
+PLAYCALLING_FAST_PATH = False
+
+# Add a Server-Timing header (parse/validate/engine/serialize/history phases,
+# DB query count and time) and log requests slower than the threshold.
+PLAYCALLING_SERVER_TIMING = False
+PLAYCALLING_SLOW_REQUEST_MS = 250
+
+# Route the recommendation endpoint and the play history list/detail reads to
+# the native async views in playcalling/async_views.py. Only useful when served
+# through coach_backend/asgi.py.
+PLAYCALLING_ASYNC_VIEWS = False
+
+# Live game channels (/api/games/<game_id>/stream/): seconds between SSE
+# keep-alive comments, seconds before a stream is closed (clients reconnect),
+# and how many games one process keeps in memory.
+PLAYCALLING_LIVE_KEEPALIVE = 15
+PLAYCALLING_LIVE_MAX_DURATION = 3600
+PLAYCALLING_LIVE_MAX_GAMES = 1000
+
+# Game sessions (/api/sessions/) kept in memory per process; the GameSession
+# table holds every session and is the source of truth.
+PLAYCALLING_SESSION_CACHE_SIZE = 1000
+
+# History-driven engine. table_dir holds a memory-mapped outcome table shared by
+# the workers on a host (None keeps a per-process copy); pitches with fewer
+# recorded outcomes than min_samples in a situation are left to the rules.
+PLAYCALLING_HISTORY_ENGINE = {
+    'table_dir': None,
+    'min_samples': 30,
+}
+
+# Run expectancy key points. path is the .npz artifact written by
+# `manage.py rebuild_run_expectancy` (None leaves them out); states with fewer
+# recorded plays than min_samples are skipped, and workers look for a newer
+# artifact every reload_interval seconds.
+PLAYCALLING_RUN_EXPECTANCY = {
+    'path': None,
+    'min_samples': 20,
+    'reload_interval': 60,
+}
+
+# Inning simulator behind POST /api/simulate/. trials is the default per
+# option; requests above parallel_threshold total trials fan out to a pool of
+# `workers` processes (None: one per CPU, 0: never). With
+# merge_into_recommendations on, every recommendation with a steal, squeeze or
+# first-and-third decision gets the simulated comparison in key_points.
+PLAYCALLING_SIMULATION = {
+    'trials': 20000,
+    'max_trials': 200000,
+    'workers': None,
+    'parallel_threshold': 200000,
+    'merge_into_recommendations': False,
+}
+
+# Rule packs for PLAYCALLING_ENGINE = 'packs'. A RulePack named `default`
+# replaces the shipped playcalling/packs/default.json; workers look for changed
+# packs every reload_interval seconds.
+PLAYCALLING_RULE_PACKS = {
+    'default': 'default',
+    'reload_interval': 5,
+}
+
+# Play history shards. `databases` only get the history tables from migrate;
+# `organizations` maps an organization (X-Organization header or
+# ?organization=) to the database holding its plays, everything else stays in
+# default. Run `manage.py rebalance_shards` after changing the mapping.
+PLAYCALLING_SHARDS = {
+    'databases': ['shard1'],
+    'organizations': {},
+}
+
+# Read replicas: primary alias -> replica alias, e.g. {'default': 'replica'}.
+# History reads (list, detail, export, analytics, admin) use the replica; a
+# client that wrote reads from the primary for pin_seconds afterwards. Keep the
+# local SQLite replica current with `manage.py sync_replicas`.
+PLAYCALLING_REPLICAS = {
+    'databases': {},
+    'pin_seconds': 5,
+}
+
+# Applied to every new SQLite connection. WAL lets readers, including
+# sync_replicas, run while a writer commits.
+PLAYCALLING_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+}
+
+# Columnar archive of old plays. `manage.py archive_plays --before DATE` moves
+# older plays into per-season files under path (None turns archiving off);
+# situation analytics and run expectancy read them along with the live table.
+PLAYCALLING_ARCHIVE = {
+    'path': None,
+}
+
+# Recommendation texts remembered per process and database, so saving and
+# reading plays rarely needs to query RecommendationText.
+PLAYCALLING_RECOMMENDATION_TEXT_CACHE_SIZE = 4096
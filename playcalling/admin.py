@@ -1,11 +1,36 @@
 from django.contrib import admin
 
-from .models import GamePlay
+from .forms import GamePlayAdminForm
+from .models import GamePlay, GameSession, RulePack, SituationOutcomeSummary
+from .search import SEARCH_FIELDS, match_plays
+from .sharding import shard_options
+
+
+class OrganizationFilter(admin.SimpleListFilter):
+    """
+    Organizations with their own database. ``OrganizationMiddleware`` reads the
+    same ``organization`` parameter, so picking one also routes the changelist
+    and the change pages opened from it to that database. Summaries have no
+    organization column; for them the filter only picks the database.
+    """
+
+    title = 'organization'
+    parameter_name = 'organization'
+
+    def lookups(self, request, model_admin):
+        return [(organization, organization) for organization in sorted(shard_options()['organizations'])]
+
+    def queryset(self, request, queryset):
+        if self.value() and hasattr(queryset.model, 'organization'):
+            return queryset.filter(organization=self.value())
+        return queryset
 
 
 @admin.register(GamePlay)
 class GamePlayAdmin(admin.ModelAdmin):
+    form = GamePlayAdminForm
     list_display = (
+        'organization',
         'offense_team',
         'defense_team',
         'inning',
@@ -20,20 +45,56 @@ class GamePlayAdmin(admin.ModelAdmin):
         'generated_from_engine',
         'created_at',
     )
+    # Situation filtering goes through the indexed base_out_state column
+    # rather than the individual outs/runner columns.
     list_filter = (
+        OrganizationFilter,
         'half_inning',
-        'outs',
-        'runners_on_first',
-        'runners_on_second',
-        'runners_on_third',
+        'base_out_state',
         'generated_from_engine',
         'created_at',
     )
-    search_fields = (
+    # Searches go through the full-text index (see search.py); the fields
+    # only turn the search box on.
+    search_fields = SEARCH_FIELDS
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return match_plays(queryset, search_term), False
+
+
+@admin.register(SituationOutcomeSummary)
+class SituationOutcomeSummaryAdmin(admin.ModelAdmin):
+    list_display = ('base_out_state', 'balls', 'strikes', 'recommended_pitch', 'outcome', 'count')
+    list_filter = (OrganizationFilter, 'base_out_state', 'balls', 'strikes')
+    readonly_fields = ('base_out_state', 'balls', 'strikes', 'recommended_pitch', 'outcome', 'count')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(GameSession)
+class GameSessionAdmin(admin.ModelAdmin):
+    list_display = (
         'offense_team',
         'defense_team',
-        'context_notes',
-        'catcher_instructions',
-        'offensive_sign',
-        'runner_instructions',
+        'inning',
+        'half_inning',
+        'outs',
+        'balls',
+        'strikes',
+        'score_difference',
+        'version',
+        'updated_at',
     )
+    list_filter = ('half_inning',)
+    search_fields = ('offense_team', 'defense_team')
+    readonly_fields = ('version',)
+
+
+@admin.register(RulePack)
+class RulePackAdmin(admin.ModelAdmin):
+    list_display = ('name', 'team', 'active', 'updated_at')
+    list_filter = ('active',)
+    search_fields = ('name', 'team')
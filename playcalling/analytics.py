@@ -0,0 +1,195 @@
+"""
+Incrementally maintained situation/outcome aggregates.
+
+Every ``GamePlay`` with a recorded ``actual_outcome`` contributes one to the
+``SituationOutcomeSummary`` row for its base-out state, count, recommended
+pitch and outcome. Saves and deletes adjust the counts through signals,
+``bulk_create`` through ``record_new_plays`` and ``rebuild_summary``
+recomputes everything from the play table and the archived seasons. Writes that bypass the model
+(``QuerySet.update``) need a rebuild. Each play history database (see
+``sharding.py``) keeps the summary of its own plays. Committed changes are
+mirrored into the history engine's outcome table.
+"""
+
+from collections import Counter
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F
+
+from .archive import archived_chunks
+from .history import record_outcome, summary_rebuilt
+from .models import GamePlay, SituationOutcomeSummary, play_lookups
+
+OUTCOME_MAX_LENGTH = SituationOutcomeSummary._meta.get_field('outcome').max_length
+SUMMARY_SOURCE_FIELDS = (
+    'base_out_state',
+    'balls',
+    'strikes',
+    'recommended_pitch',
+    'actual_outcome',
+)
+
+
+def normalize_outcome(outcome):
+    return ' '.join((outcome or '').split())[:OUTCOME_MAX_LENGTH]
+
+
+# The columns behind SUMMARY_SOURCE_FIELDS on the play table.
+SUMMARY_SOURCE_COLUMNS = ('base_out_state', 'balls', 'strikes', 'recommendation_text_id', 'actual_outcome')
+
+
+def _summary_key(base_out_state, balls, strikes, recommended_pitch, actual_outcome):
+    outcome = normalize_outcome(actual_outcome)
+    if not outcome:
+        return None
+    return (base_out_state, balls, strikes, recommended_pitch, outcome)
+
+
+def summary_key(play):
+    """``(base_out_state, balls, strikes, recommended_pitch, outcome)`` or None without an outcome."""
+    return _summary_key(*(getattr(play, field) for field in SUMMARY_SOURCE_FIELDS))
+
+
+def snapshot_summary_key(play):
+    """Remember which summary row ``play`` currently counts towards, if that takes no query."""
+    loaded = play.get_deferred_fields()
+    texts = None if any(field in loaded for field in SUMMARY_SOURCE_COLUMNS) else play.loaded_recommendation_texts()
+    if texts is None:
+        play._summary_key = None
+        play._summary_key_known = False
+    else:
+        play._summary_key = _summary_key(
+            play.base_out_state, play.balls, play.strikes, texts['recommended_pitch'], play.actual_outcome
+        )
+        play._summary_key_known = True
+
+
+def _key_filter(key):
+    base_out_state, balls, strikes, recommended_pitch, outcome = key
+    return {
+        'base_out_state': base_out_state,
+        'balls': balls,
+        'strikes': strikes,
+        'recommended_pitch': recommended_pitch,
+        'outcome': outcome,
+    }
+
+
+def apply_delta(key, delta, using=DEFAULT_DB_ALIAS):
+    """Add ``delta`` to the summary row for ``key`` in ``using``, creating or removing it as needed."""
+    if key is None or delta == 0:
+        return
+    transaction.on_commit(partial(record_outcome, key, delta), using=using)
+    rows = SituationOutcomeSummary.objects.using(using).filter(**_key_filter(key))
+    if delta < 0:
+        rows.update(count=F('count') + delta)
+        rows.filter(count__lte=0).delete()
+        return
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic(using=using):
+            SituationOutcomeSummary.objects.using(using).create(count=delta, **_key_filter(key))
+    except IntegrityError:
+        # Another writer created the row first.
+        rows.update(count=F('count') + delta)
+
+
+def record_new_plays(plays, using=DEFAULT_DB_ALIAS):
+    """Count plays freshly inserted into ``using``, e.g. after ``bulk_create``."""
+    counts = Counter()
+    for play in plays:
+        key = summary_key(play)
+        counts[key] += 1
+        play._summary_key = key
+        play._summary_key_known = True
+    counts.pop(None, None)
+    for key, delta in counts.items():
+        apply_delta(key, delta, using)
+
+
+def _load_stored_key(instance, using):
+    """For instances whose key is not known yet, read the stored key once."""
+    if getattr(instance, '_summary_key_known', False) or instance._state.adding or instance.pk is None:
+        return
+    rows = GamePlay.objects.using(using).filter(pk=instance.pk).values_list(*play_lookups(SUMMARY_SOURCE_FIELDS))
+    stored = rows.first()
+    instance._summary_key = _summary_key(*stored) if stored else None
+    instance._summary_key_known = True
+
+
+def play_saving(sender, instance, using, **kwargs):
+    _load_stored_key(instance, using)
+
+
+def play_saved(sender, instance, created, using, **kwargs):
+    old_key = None if created else getattr(instance, '_summary_key', None)
+    new_key = summary_key(instance)
+    if old_key != new_key:
+        apply_delta(old_key, -1, using)
+        apply_delta(new_key, 1, using)
+    instance._summary_key = new_key
+    instance._summary_key_known = True
+
+
+def play_deleting(sender, instance, using, **kwargs):
+    _load_stored_key(instance, using)
+
+
+def play_deleted(sender, instance, using, **kwargs):
+    apply_delta(getattr(instance, '_summary_key', None), -1, using)
+
+
+def rebuild_summary(using=DEFAULT_DB_ALIAS):
+    """Recompute every summary row in ``using`` from its play table; returns the number of rows."""
+    with transaction.atomic(using=using):
+        return _rebuild_summary(using)
+
+
+def _rebuild_summary(using):
+    transaction.on_commit(summary_rebuilt, using=using)
+    SituationOutcomeSummary.objects.using(using).all().delete()
+    counts = Counter()
+    grouped = (
+        GamePlay.objects.using(using).exclude(actual_outcome='')
+        .values_list(*play_lookups(SUMMARY_SOURCE_FIELDS))
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for base_out_state, balls, strikes, pitch, outcome, total in grouped.iterator():
+        outcome = normalize_outcome(outcome)
+        if outcome:
+            counts[(base_out_state, balls, strikes, pitch, outcome)] += total
+    # Archived plays keep counting; see archive.py.
+    for chunk in archived_chunks(SUMMARY_SOURCE_FIELDS, using):
+        rows = zip(*(chunk[field].tolist() for field in SUMMARY_SOURCE_FIELDS))
+        for base_out_state, balls, strikes, pitch, outcome in rows:
+            outcome = normalize_outcome(outcome)
+            if outcome:
+                counts[(base_out_state, balls, strikes, pitch, outcome)] += 1
+    SituationOutcomeSummary.objects.using(using).bulk_create(
+        SituationOutcomeSummary(count=total, **_key_filter(key)) for key, total in counts.items()
+    )
+    return len(counts)
+
+
+def situation_summaries(queryset):
+    """Group summary rows into one entry per situation and recommended pitch."""
+    grouped = {}
+    for row in queryset.order_by('base_out_state', 'balls', 'strikes', 'recommended_pitch', '-count', 'outcome'):
+        key = (row.base_out_state, row.balls, row.strikes, row.recommended_pitch)
+        entry = grouped.get(key)
+        if entry is None:
+            entry = grouped[key] = {
+                'base_out_state': row.base_out_state,
+                'situation': row.get_base_out_state_display(),
+                'balls': row.balls,
+                'strikes': row.strikes,
+                'recommended_pitch': row.recommended_pitch,
+                'total': 0,
+                'outcomes': {},
+            }
+        entry['total'] += row.count
+        entry['outcomes'][row.outcome] = row.count
+    return list(grouped.values())
@@ -4,3 +4,33 @@ from django.apps import AppConfig
 class PlaycallingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'playcalling'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+
+        from . import analytics, interning, replicas, rulepacks, search
+        from .models import GamePlay, RulePack
+        from .recommendations import decision_table, get_engine
+
+        pre_save.connect(analytics.play_saving, sender=GamePlay, dispatch_uid='summary_play_saving')
+        post_save.connect(analytics.play_saved, sender=GamePlay, dispatch_uid='summary_play_saved')
+        pre_delete.connect(analytics.play_deleting, sender=GamePlay, dispatch_uid='summary_play_deleting')
+        post_delete.connect(analytics.play_deleted, sender=GamePlay, dispatch_uid='summary_play_deleted')
+        post_save.connect(rulepacks.packs_changed, sender=RulePack, dispatch_uid='rule_pack_saved')
+        post_delete.connect(rulepacks.packs_changed, sender=RulePack, dispatch_uid='rule_pack_deleted')
+        connection_created.connect(replicas.apply_sqlite_pragmas, dispatch_uid='sqlite_pragmas')
+        post_migrate.connect(search.install_after_migrate, sender=self, dispatch_uid='play_search_index')
+        post_migrate.connect(interning.clear_after_migrate, sender=self, dispatch_uid='recommendation_text_cache')
+
+        # Fail fast on a misconfigured engine and build the lookup table at
+        # startup instead of on the first request. The history engine starts
+        # from the same table; its outcome counts need the database and are
+        # loaded on first use, as are stored rule packs.
+        engine = getattr(settings, 'PLAYCALLING_ENGINE', 'rules')
+        get_engine(engine)
+        if engine in ('precompiled', 'history'):
+            decision_table()
+        elif engine == 'packs':
+            rulepacks.shipped_pack()
@@ -0,0 +1,334 @@
+"""
+Columnar archive of old play history.
+
+``archive_plays`` moves plays recorded before a cutoff out of the play tables
+into one directory per database and season (calendar year, UTC) under
+``PLAYCALLING_ARCHIVE['path']``. Numbers, flags and timestamps are stored as
+fixed-width ``.npy`` arrays, one per field. Text fields and
+``defensive_alignment`` are dictionary-encoded: each distinct value is stored
+once in ``<field>.strings.json`` and rows hold ``uint32`` codes into it.
+Seasons are sorted by ``(created_at, id)`` and are never changed in place.
+Archiving more plays into a season writes a new generation next to it and
+then removes the old one.
+
+Readers memory-map the arrays and walk them in chunks, so a scan never holds
+more than one chunk of a season in memory. ``play_chunks`` yields a
+database's archived seasons and then its live plays as dicts of NumPy
+columns. ``load_sequence`` (run expectancy) and ``rebuild_summary``
+(situation analytics) use it. Archived plays stay counted in the outcome
+summary. They no longer appear in the history API, the admin, exports or
+search.
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import GamePlay, play_lookups
+
+ARCHIVE_FORMAT = 1
+
+DEFAULT_ARCHIVE_SETTINGS = {
+    # Directory holding the archived seasons; None turns archiving off.
+    'path': None,
+}
+
+# Fixed-width columns; datetimes are microseconds since the epoch (UTC).
+NUMERIC_FIELDS = {
+    'id': np.int64,
+    'inning': np.uint16,
+    'outs': np.uint8,
+    'balls': np.uint8,
+    'strikes': np.uint8,
+    'runners_on_first': np.bool_,
+    'runners_on_second': np.bool_,
+    'runners_on_third': np.bool_,
+    'base_out_state': np.uint8,
+    'score_difference': np.int32,
+    'generated_from_engine': np.bool_,
+    'created_at': 'datetime64[us]',
+    'updated_at': 'datetime64[us]',
+}
+# Dictionary-encoded columns.
+TEXT_FIELDS = (
+    'organization',
+    'offense_team',
+    'defense_team',
+    'half_inning',
+    'context_notes',
+    'recommended_pitch',
+    'defensive_alignment',
+    'catcher_instructions',
+    'offensive_sign',
+    'runner_instructions',
+    'actual_outcome',
+)
+ARCHIVE_FIELDS = (*NUMERIC_FIELDS, *TEXT_FIELDS)
+
+# Ids per DELETE, well below SQLite's limit on query parameters.
+DELETE_BATCH_SIZE = 1000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_SEASON_DIRECTORY = re.compile(r'^(\d{4})\.(\d+)$')
+
+
+def archive_options():
+    return {**DEFAULT_ARCHIVE_SETTINGS, **getattr(settings, 'PLAYCALLING_ARCHIVE', {})}
+
+
+def _microseconds(moment):
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _column(field, values):
+    """``values`` of ``field`` as a chunk column: fixed-width array or object array."""
+    if field in ('created_at', 'updated_at'):
+        return np.fromiter(map(_microseconds, values), dtype=np.int64, count=len(values)).view('datetime64[us]')
+    if field in NUMERIC_FIELDS:
+        return np.array(values, dtype=NUMERIC_FIELDS[field])
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def queryset_chunks(queryset, fields, chunk_size=50000):
+    """``queryset``'s rows as dicts of ``fields`` -> column, ``chunk_size`` rows at a time."""
+    rows = queryset.values_list(*play_lookups(fields)).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield {field: _column(field, values) for field, values in zip(fields, zip(*chunk))}
+
+
+class ArchivedSeason:
+    """One generation of a season's archive; columns are memory-mapped on access."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        self.season = manifest['season']
+        self.generation = manifest['generation']
+        self.rows = manifest['rows']
+        self._dictionaries = {}
+
+    def array(self, field):
+        """The stored array of ``field``: values, or codes for a text field."""
+        name = f'{field}.codes.npy' if field in TEXT_FIELDS else f'{field}.npy'
+        return np.load(os.path.join(self.directory, name), mmap_mode='r')
+
+    def dictionary(self, field):
+        """Distinct values of a text field as an object array, indexed by code."""
+        if field not in self._dictionaries:
+            with open(os.path.join(self.directory, f'{field}.strings.json'), encoding='utf-8') as handle:
+                values = json.load(handle)
+            self._dictionaries[field] = np.fromiter(values, dtype=object, count=len(values))
+        return self._dictionaries[field]
+
+    def chunks(self, fields, chunk_size=50000):
+        arrays = {field: self.array(field) for field in fields}
+        for start in range(0, self.rows, chunk_size):
+            chunk = {}
+            for field, array in arrays.items():
+                part = np.array(array[start:start + chunk_size])
+                chunk[field] = self.dictionary(field)[part] if field in TEXT_FIELDS else part
+            yield chunk
+
+
+def database_archive(using):
+    return os.path.join(archive_options()['path'], using)
+
+
+def archived_seasons(using):
+    """The current generation of every season archived from ``using``, oldest season first."""
+    if archive_options()['path'] is None:
+        return []
+    directory = database_archive(using)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    latest = {}
+    for name in names:
+        match = _SEASON_DIRECTORY.match(name)
+        # Generations without a manifest are still being written.
+        if match and os.path.exists(os.path.join(directory, name, 'manifest.json')):
+            season, generation = int(match[1]), int(match[2])
+            if generation > latest.get(season, (-1, None))[0]:
+                latest[season] = (generation, name)
+    return [ArchivedSeason(os.path.join(directory, latest[season][1])) for season in sorted(latest)]
+
+
+def archived_chunks(fields, using, chunk_size=50000):
+    for season in archived_seasons(using):
+        yield from season.chunks(fields, chunk_size)
+
+
+def play_chunks(fields, using, chunk_size=50000):
+    """
+    Every play of ``using``, archived seasons first and then the play table,
+    each in recording order, as dicts of ``fields`` -> NumPy column.
+    """
+    yield from archived_chunks(fields, using, chunk_size)
+    live = GamePlay.objects.using(using).order_by('created_at', 'id')
+    yield from queryset_chunks(live, fields, chunk_size)
+
+
+def archive_source(databases):
+    """Fingerprint of the archives of ``databases``; changes whenever a season is rewritten."""
+    return {
+        f'{alias}/{season.season}': [season.generation, season.rows]
+        for alias in databases
+        for season in archived_seasons(alias)
+    }
+
+
+def _seasons(created_at):
+    return created_at.astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _dictionary_key(value):
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+
+
+class SeasonBuilder:
+    """Accumulates a season's rows as fixed-width arrays and dictionary codes."""
+
+    def __init__(self, season, current=None):
+        self.season = season
+        self.current = current
+        self.parts = {field: [] for field in ARCHIVE_FIELDS}
+        self.values = {field: [] for field in TEXT_FIELDS}
+        self.codes = {field: {} for field in TEXT_FIELDS}
+        if current is not None:
+            # Codes of the current generation stay valid; new values are appended.
+            for field in TEXT_FIELDS:
+                self.values[field] = list(current.dictionary(field))
+                self.codes[field] = {_dictionary_key(value): code for code, value in enumerate(self.values[field])}
+        self.rows = 0
+
+    def add(self, chunk):
+        for field in NUMERIC_FIELDS:
+            self.parts[field].append(chunk[field])
+        for field in TEXT_FIELDS:
+            values, codes = self.values[field], self.codes[field]
+            encoded = np.empty(len(chunk[field]), dtype=np.uint32)
+            for row, value in enumerate(chunk[field]):
+                key = _dictionary_key(value)
+                code = codes.get(key)
+                if code is None:
+                    code = codes[key] = len(values)
+                    values.append(value)
+                encoded[row] = code
+            self.parts[field].append(encoded)
+        self.rows += len(chunk['id'])
+
+    def columns(self, exclude=()):
+        """
+        Current and new rows merged, sorted by ``(created_at, id)``. A new row
+        replaces the current one with its id; ids in ``exclude`` are left out.
+        """
+        columns = {
+            field: np.concatenate(parts) if parts else np.zeros(0, dtype=self._dtype(field))
+            for field, parts in self.parts.items()
+        }
+        if self.current is not None:
+            kept = ~np.isin(self.current.array('id'), columns['id'])
+            columns = {
+                field: np.concatenate([self.current.array(field)[kept], column]) for field, column in columns.items()
+            }
+        if len(exclude):
+            included = ~np.isin(columns['id'], np.asarray(exclude, dtype=np.int64))
+            columns = {field: column[included] for field, column in columns.items()}
+        order = np.lexsort((columns['id'], columns['created_at']))
+        return {field: column[order] for field, column in columns.items()}
+
+    @staticmethod
+    def _dtype(field):
+        return np.uint32 if field in TEXT_FIELDS else NUMERIC_FIELDS[field]
+
+    def write(self, directory, exclude=()):
+        """Write the merged season as the next generation; returns the new ``ArchivedSeason``."""
+        columns = self.columns(exclude)
+        generation = self.current.generation + 1 if self.current is not None else 1
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=directory, prefix=f'.{self.season}-')
+        for field, column in columns.items():
+            name = f'{field}.codes.npy' if field in TEXT_FIELDS else f'{field}.npy'
+            np.save(os.path.join(staging, name), column)
+        for field in TEXT_FIELDS:
+            with open(os.path.join(staging, f'{field}.strings.json'), 'w', encoding='utf-8') as handle:
+                json.dump(self.values[field], handle, ensure_ascii=False)
+        # The manifest goes last: readers skip generations without one.
+        manifest = {
+            'format': ARCHIVE_FORMAT,
+            'season': self.season,
+            'generation': generation,
+            'rows': len(columns['id']),
+        }
+        with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle)
+        target = os.path.join(directory, f'{self.season}.{generation}')
+        os.rename(staging, target)
+        if self.current is not None:
+            # Readers that already mapped the old files keep them until they close.
+            shutil.rmtree(self.current.directory)
+        return ArchivedSeason(target)
+
+
+def archive_plays(using, before, chunk_size=50000, dry_run=False):
+    """
+    Move the plays of ``using`` recorded before ``before`` into the archive.
+    Returns ``{season: plays}`` for the plays moved (or, with ``dry_run``, to be moved).
+
+    Seasons are written before any play is deleted, and a play archived
+    again replaces its earlier copy, so an interrupted run can simply be
+    repeated. A play is only deleted while its ``updated_at`` still matches
+    the archived copy. Plays changed or deleted since they were read stay as
+    they are in the database and are taken out of the season again; the
+    next run archives them.
+    """
+    if archive_options()['path'] is None:
+        raise ValueError('Set PLAYCALLING_ARCHIVE["path"] to archive plays.')
+    plays = GamePlay.objects.using(using).filter(created_at__lt=before)
+    current = {season.season: season for season in archived_seasons(using)}
+    builders = {}
+    for chunk in queryset_chunks(plays.order_by('created_at', 'id'), ARCHIVE_FIELDS, chunk_size):
+        seasons = _seasons(chunk['created_at'])
+        for season in np.unique(seasons).tolist():
+            if season not in builders:
+                builders[season] = SeasonBuilder(season, current.get(season))
+            rows = seasons == season
+            builders[season].add({field: column[rows] for field, column in chunk.items()})
+    moved = {season: builder.rows for season, builder in sorted(builders.items())}
+    if dry_run:
+        return moved
+
+    for season, builder in builders.items():
+        archived = builder.write(database_archive(using))
+        ids = np.concatenate(builder.parts['id'])
+        updated = np.concatenate(builder.parts['updated_at']).astype(np.int64)
+        stale = []
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = slice(start, start + DELETE_BATCH_SIZE)
+            stale.extend(_delete_unchanged(using, ids[batch], updated[batch]))
+        if stale:
+            SeasonBuilder(season, archived).write(database_archive(using), exclude=stale)
+            moved[season] -= len(stale)
+    return moved
+
+
+def _delete_unchanged(using, ids, updated):
+    """Delete the plays ``ids`` still last updated at ``updated`` (microseconds); returns the other ids."""
+    archived = dict(zip(ids.tolist(), updated.tolist()))
+    plays = GamePlay.objects.using(using).filter(pk__in=list(archived))
+    with transaction.atomic(using=using):
+        current = plays.select_for_update().values_list('id', 'updated_at')
+        unchanged = [pk for pk, updated_at in current if _microseconds(updated_at) == archived[pk]]
+        # A raw delete sends no signals: archived plays keep counting in the outcome summary.
+        GamePlay.objects.using(using).filter(pk__in=unchanged)._raw_delete(using)
+    return sorted(set(archived) - set(unchanged))
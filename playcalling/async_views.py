@@ -0,0 +1,228 @@
+"""
+Native async versions of the recommendation and play history read endpoints,
+and the live game channel endpoints.
+
+``urls.py`` routes to these instead of the DRF views when
+``PLAYCALLING_ASYNC_VIEWS`` is on. Under an ASGI server they run on the event
+loop: requests are checked with ``RecommendationRequestValidator`` and the
+database is only reached through the async ORM (``asave``, ``aget``, ``async
+for``), so one worker can serve many concurrent coaches without a thread per
+request. Recommendations are rendered on a worker thread, because the engine,
+merged simulations and the run expectancy file would otherwise stall every
+other connection, live streams included.
+
+Responses are the JSON the DRF views produce. Writes to the play history
+(create, update, delete) are handed to ``GamePlayViewSet`` unchanged.
+
+The live game views are always routed. The stream needs ASGI: under WSGI
+Django would collect the endless event stream into a list and hold the worker
+forever, so it answers 501 there.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, UnsupportedMediaType, ValidationError
+from rest_framework.request import Request
+
+from .cache import canonical_key, get_response_cache
+from .filters import filter_plays
+from .live import get_channels
+from .models import GamePlay
+from .pagination import PlayHistoryCursorPagination, PlaySearchPagination
+from .search import rank_plays
+from .serializers import GamePlaySerializer
+from .sharding import organization_plays
+from .timing import phase
+from .views import (
+    RECOMMENDATION_REQUEST_VALIDATOR,
+    GamePlayViewSet,
+    _apersist_history,
+    _encode_json,
+    _render_recommendation,
+)
+
+
+# Writes are rare next to reads, so they keep the DRF viewset behind a thread hop.
+_create_play = sync_to_async(GamePlayViewSet.as_view({'post': 'create'}))
+_change_play = sync_to_async(
+    GamePlayViewSet.as_view({'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+)
+
+
+def _json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(_encode_json(data), status=status, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    """Async JSON view that, like DRF's ``APIView``, is exempt from CSRF checks."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc, ValidationError) else {'detail': exc.detail}
+            return _json_response(detail, status=exc.status_code)
+
+
+def _parse_json(request):
+    if request.content_type != 'application/json':
+        raise UnsupportedMediaType(request.content_type)
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+
+def _cached_recommendation(validated):
+    """``(etag, body, recommendation)`` from the response cache, rendering on a miss."""
+    cache = get_response_cache()
+    if cache is None:
+        return _render_recommendation(validated)
+    engine_name = getattr(settings, 'PLAYCALLING_ENGINE', 'rules')
+    return cache.get_or_render(canonical_key(engine_name, validated), lambda: _render_recommendation(validated))
+
+
+_acached_recommendation = sync_to_async(_cached_recommendation, thread_sensitive=False)
+
+
+class AsyncRecommendationView(AsyncAPIView):
+    """Async ``RecommendationView``: same GET/POST contract, JSON only."""
+
+    async def get(self, request, *args, **kwargs):
+        return await self._respond(request, request.GET, allow_save=False)
+
+    async def post(self, request, *args, **kwargs):
+        with phase('parse'):
+            data = _parse_json(request)
+        return await self._respond(request, data, allow_save=True)
+
+    async def _respond(self, request, data, allow_save):
+        with phase('validate'):
+            validated, errors = RECOMMENDATION_REQUEST_VALIDATOR.validate(data)
+        if errors:
+            return _json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        etag, body, recommendation = await _acached_recommendation(validated)
+
+        if request.method == 'GET' and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+
+        if allow_save and validated.get('save_to_history', False):
+            await _apersist_history(validated, recommendation)
+
+        return response
+
+
+class LiveGameStateView(AsyncAPIView):
+    """
+    The scorer's device posts the current situation for ``game_id``.
+
+    The request body and the response are the same as ``POST
+    /api/recommendations/``. Subscribers of the game stream receive the
+    changes.
+    """
+
+    async def post(self, request, game_id, *args, **kwargs):
+        with phase('parse'):
+            data = _parse_json(request)
+        with phase('validate'):
+            validated, errors = RECOMMENDATION_REQUEST_VALIDATOR.validate(data)
+        if errors:
+            return _json_response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        etag, body, recommendation = await _acached_recommendation(validated)
+        situation = {name: value for name, value in validated.items() if name != 'save_to_history'}
+        get_channels().get(game_id).publish(situation, recommendation)
+
+        if validated.get('save_to_history', False):
+            await _apersist_history(validated, recommendation)
+
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class LiveGameStreamView(AsyncAPIView):
+    """
+    ``text/event-stream`` of ``game_id``. The stream opens with a ``snapshot``
+    event holding the whole document, then sends a ``delta`` event (a JSON
+    merge patch) after each update. Only served under ASGI, and closed after
+    ``PLAYCALLING_LIVE_MAX_DURATION`` seconds.
+    """
+
+    async def get(self, request, game_id, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return _json_response(
+                {'detail': 'Live game streams need an ASGI server (coach_backend/asgi.py).'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        channel = get_channels().get(game_id)
+        keepalive = getattr(settings, 'PLAYCALLING_LIVE_KEEPALIVE', 15)
+        max_duration = getattr(settings, 'PLAYCALLING_LIVE_MAX_DURATION', 3600)
+        response = StreamingHttpResponse(channel.events(keepalive, max_duration), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncPlayListView(AsyncAPIView):
+    """Async history list with the same filters and cursor pagination as ``GamePlayViewSet``."""
+
+    queryset = GamePlay.objects.prefetch_related('recommendation_text').order_by('-created_at', '-id')
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request)
+        queryset = filter_plays(organization_plays(self.queryset.all()), request.query_params)
+        if request.query_params.get('q'):
+            queryset = rank_plays(queryset, request.query_params['q'])
+            paginator = PlaySearchPagination()
+        else:
+            paginator = PlayHistoryCursorPagination()
+        plays = await paginator.apaginate_queryset(queryset, request, view=self)
+        data = GamePlaySerializer(plays, many=True).data
+        return _json_response(paginator.get_paginated_data(data))
+
+    async def post(self, request, *args, **kwargs):
+        return await _create_play(request, *args, **kwargs)
+
+
+class AsyncPlayDetailView(AsyncAPIView):
+    """Async history detail; updates and deletes go through ``GamePlayViewSet``."""
+
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            play = await organization_plays(GamePlay.objects.select_related('recommendation_text')).aget(pk=pk)
+        except GamePlay.DoesNotExist:
+            return _json_response(
+                {'detail': f'No {GamePlay._meta.object_name} matches the given query.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return _json_response(GamePlaySerializer(play).data)
+
+    async def put(self, request, *args, **kwargs):
+        return await _change_play(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await _change_play(request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await _change_play(request, *args, **kwargs)
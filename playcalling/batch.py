@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from .recommendations import decision_table, situation_header
+from .situations import BASE_STATES, COUNTS
+
+SITUATION_COLUMNS = (
+    'inning',
+    'outs',
+    'balls',
+    'strikes',
+    'runners_on_first',
+    'runners_on_second',
+    'runners_on_third',
+    'score_difference',
+)
+
+
+def to_columns(situations: Sequence[Mapping[str, object]]) -> Dict[str, np.ndarray]:
+    """Gather the engine inputs of many situations into integer arrays."""
+    size = len(situations)
+    return {
+        name: np.fromiter((int(row.get(name) or 0) for row in situations), dtype=np.int64, count=size)
+        for name in SITUATION_COLUMNS
+    }
+
+
+def situation_keys(columns: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    Vectorised ``situation_key``: evaluate the leverage and score conditions as
+    boolean masks over the whole batch and pack each row into a decision-table index.
+    """
+    base_out_state = (
+        columns['outs'] * BASE_STATES
+        + columns['runners_on_first']
+        + columns['runners_on_second'] * 2
+        + columns['runners_on_third'] * 4
+    )
+    count = columns['balls'] * 3 + columns['strikes']
+    high_leverage = (columns['inning'] >= 7) & (np.abs(columns['score_difference']) <= 2)
+    score_sign = np.sign(columns['score_difference'])
+    return ((base_out_state * COUNTS + count) * 2 + high_leverage) * 3 + score_sign + 1
+
+
+def recommend_batch(situations: Sequence[Mapping[str, object]]) -> List[Dict[str, object]]:
+    """
+    Recommendations for every situation, in order, matching
+    ``generate_recommendation``; only for the ``TABULAR_ENGINES``.
+    """
+    if not situations:
+        return []
+    table = decision_table()
+    keys = situation_keys(to_columns(situations)).tolist()
+    recommendations = []
+    for context, key in zip(situations, keys):
+        pitch_call, catcher_plan, alignment, signs, key_points = table[key]
+        recommendations.append(
+            {
+                'pitch_call': pitch_call,
+                'catcher_plan': catcher_plan,
+                'defensive_alignment': dict(alignment),
+                'offensive_signs': dict(signs),
+                'key_points': [situation_header(context), *key_points],
+            }
+        )
+    return recommendations
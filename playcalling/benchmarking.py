@@ -0,0 +1,225 @@
+"""Helpers shared by the benchmark management commands."""
+
+import asyncio
+import importlib
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches
+from django.utils import timezone
+
+from .models import GamePlay
+
+
+@contextmanager
+def benchmark_database(verbosity=0, on_disk=False):
+    """
+    Run the body against a freshly migrated throwaway database, exactly like the
+    test runner does, so benchmarks never touch real play history.
+
+    SQLite test databases live in shared memory, where concurrent writers fail
+    with "table is locked"; ``on_disk`` puts the throwaway database in a
+    temporary file instead so writers queue on the file lock as in production.
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory() as directory:
+        if on_disk and connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+            teardown_test_environment()
+            test_settings['NAME'] = old_test_name
+
+
+def seed_plays(rows, batch_size=5000, seed=0):
+    """Insert ``rows`` synthetic plays, one second apart, ending now."""
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(seconds=rows)
+    for offset in range(0, rows, batch_size):
+        GamePlay.objects.bulk_create(
+            GamePlay(
+                offense_team=rng.choice(['Visitors', 'Home', 'Travelers']),
+                defense_team=rng.choice(['Home', 'Visitors', 'Locals']),
+                inning=rng.randint(1, 9),
+                half_inning=rng.choice(['top', 'bottom']),
+                outs=rng.randint(0, 2),
+                balls=rng.randint(0, 3),
+                strikes=rng.randint(0, 2),
+                runners_on_first=rng.random() < 0.3,
+                runners_on_second=rng.random() < 0.2,
+                runners_on_third=rng.random() < 0.1,
+                score_difference=rng.randint(-4, 4),
+                recommended_pitch='Four-seam fastball on the outer half.',
+                generated_from_engine=True,
+                created_at=start + timedelta(seconds=index),
+            )
+            for index in range(offset, min(offset + batch_size, rows))
+        )
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_benchmark(func, warmup=100, repetitions=1000):
+    """Time ``repetitions`` calls to ``func`` after ``warmup`` untimed calls."""
+    for _ in range(warmup):
+        func()
+    timings = sorted(measure(func, repetitions))
+    total = sum(timings)
+    return {
+        'repetitions': repetitions,
+        'ops_per_sec': round(repetitions / total, 2) if total else 0.0,
+        'mean_ms': round(total / repetitions * 1000, 4),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+    }
+
+
+def summarize_concurrent(timings, elapsed, concurrency):
+    """Throughput and latency percentiles for requests issued ``concurrency`` at a time."""
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'concurrency': concurrency,
+        'ops_per_sec': round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 4) if timings else 0.0,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+    }
+
+
+def run_threaded(func, requests, concurrency):
+    """Call ``func`` ``requests`` times from a pool of ``concurrency`` threads, like a threaded WSGI server."""
+
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            func()
+        finally:
+            # Each pool thread opened its own connections; do not leak them.
+            connections.close_all()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(timed, range(requests)))
+    return summarize_concurrent(timings, time.perf_counter() - started, concurrency)
+
+
+def run_concurrent(coroutine_func, requests, concurrency):
+    """Await ``coroutine_func()`` ``requests`` times on one event loop with at most ``concurrency`` in flight."""
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with semaphore:
+                started = time.perf_counter()
+                await coroutine_func()
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        timings = await asyncio.gather(*(timed() for _ in range(requests)))
+        return timings, time.perf_counter() - started
+
+    timings, elapsed = asyncio.run(main())
+    return summarize_concurrent(timings, elapsed, concurrency)
+
+
+@contextmanager
+def async_views(enabled=True):
+    """Re-import the URLconf with ``PLAYCALLING_ASYNC_VIEWS`` set to ``enabled`` for the body."""
+
+    def reload_urls():
+        importlib.reload(importlib.import_module('playcalling.urls'))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(PLAYCALLING_ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+def compare_to_baseline(results, baseline, threshold_pct, metric='p50_ms'):
+    """
+    Yield ``(name, baseline_value, current_value, change_pct, regressed)`` for
+    every benchmark present in both result sets.
+    """
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous.get(metric):
+            continue
+        change = (current[metric] - previous[metric]) / previous[metric] * 100
+        yield name, previous[metric], current[metric], change, change > threshold_pct
+
+
+def measure(func, repetitions=1):
+    """Wall-clock seconds for each of ``repetitions`` calls to ``func``."""
+    timings = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def median_ms(timings):
+    return statistics.median(timings) * 1000
+
+
+def synthetic_sequence(rows, seed=0):
+    """
+    ``runexpectancy.load_sequence`` columns for ``rows`` plays in plausible
+    half innings (outs only go up, runs only accumulate), built without a database.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(3, 9, size=rows // 3 + 1)
+    ends = np.cumsum(lengths)
+    lengths = lengths[: np.searchsorted(ends, rows) + 1]
+    halves = len(lengths)
+    segment = np.repeat(np.arange(halves), lengths)[:rows]
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    within = np.arange(rows) - starts[segment]
+    outs = np.minimum(within * 3 // lengths[segment], 2)
+    # Runs scored before each play of the half inning, on top of a random score at its start.
+    before = np.cumsum(rng.poisson(0.12, size=rows))
+    before = np.concatenate(([0], before[:-1]))
+    scored = before - before[starts][segment] + rng.integers(-4, 5, size=halves)[segment]
+    game = segment // 18
+    return {
+        'offense_team': (game * 2 + segment % 2) % 30,
+        'defense_team': (game * 2 + 1 - segment % 2) % 30,
+        'inning': segment % 18 // 2 + 1,
+        'half_inning': segment % 2,
+        'base_out_state': outs * 8 + rng.integers(0, 8, size=rows),
+        'balls': rng.integers(0, 4, size=rows),
+        'strikes': rng.integers(0, 3, size=rows),
+        'score_difference': scored,
+        'created_at': 1_600_000_000 + np.arange(rows) * 20,
+    }
@@ -0,0 +1,167 @@
+"""
+Response cache for the recommendation API.
+
+Rendered JSON bodies are cached under a canonical situation key built only
+from the fields the engine reads, so requests that differ in team names,
+notes or ``save_to_history`` share an entry. The key also carries the engine
+fingerprint, which keeps a shared cache correct across deployments that
+change the rules, the version of the run expectancy artifact and the
+simulation settings, when either adds key points to the responses.
+
+``PLAYCALLING_RESPONSE_CACHE`` selects the backend: ``'local'`` keeps a bounded
+in-process LRU, ``'django'`` stores entries in a Django cache alias shared by
+every worker, and ``None`` disables caching. Caching is also off for engines
+whose answers change as data accumulates (see ``DETERMINISTIC_ENGINES``).
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .recommendations import DETERMINISTIC_ENGINES, engine_cache_key
+from .runexpectancy import run_expectancy_version
+from .simulation import simulation_key
+
+DEFAULT_CACHE_SETTINGS = {
+    'backend': 'local',
+    'max_entries': 4096,
+    # Used by the 'django' backend.
+    'alias': 'default',
+    'timeout': None,
+}
+
+CANONICAL_FIELDS = (
+    'inning',
+    'outs',
+    'balls',
+    'strikes',
+    'runners_on_first',
+    'runners_on_second',
+    'runners_on_third',
+    'score_difference',
+)
+
+
+def canonical_key(engine_name, validated):
+    """Cache key for everything the engine can see in a validated request."""
+    values = ':'.join(str(int(validated.get(name) or 0)) for name in CANONICAL_FIELDS)
+    prefix = f'playcalling:rec:{engine_name}:{engine_cache_key(engine_name, validated)}'
+    return f"{prefix}:{run_expectancy_version()}:{simulation_key()}:{validated['half_inning']}:{values}"
+
+
+class LocalLRUBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_entries': self.max_entries, 'evictions': self.evictions}
+
+
+class DjangoCacheBackend:
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, key):
+        return caches[self.alias].get(key)
+
+    def set(self, key, value):
+        caches[self.alias].set(key, value, self.timeout)
+
+    def stats(self):
+        return {'alias': self.alias}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """Return the cached ``(etag, body, recommendation)`` for ``key``, rendering it on a miss."""
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            entry = render()
+            self.backend.set(key, entry)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+            **self.backend.stats(),
+        }
+
+
+_cache = None
+_cache_configured = False
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide cache configured from ``PLAYCALLING_RESPONSE_CACHE``, or None when disabled."""
+    global _cache, _cache_configured
+    if not _cache_configured:
+        with _cache_lock:
+            if not _cache_configured:
+                configured = getattr(settings, 'PLAYCALLING_RESPONSE_CACHE', DEFAULT_CACHE_SETTINGS)
+                if getattr(settings, 'PLAYCALLING_ENGINE', 'rules') not in DETERMINISTIC_ENGINES:
+                    configured = None
+                if configured:
+                    options = {**DEFAULT_CACHE_SETTINGS, **configured}
+                    if options['backend'] == 'local':
+                        _cache = ResponseCache(LocalLRUBackend(options['max_entries']))
+                    elif options['backend'] == 'django':
+                        _cache = ResponseCache(DjangoCacheBackend(options['alias'], options['timeout']))
+                    else:
+                        raise ValueError(f"Unknown response cache backend {options['backend']!r}.")
+                _cache_configured = True
+    return _cache
+
+
+def response_cache_stats():
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else None
+
+
+@receiver(setting_changed)
+def _reset_cache(setting, **kwargs):
+    global _cache, _cache_configured
+    if setting in ('PLAYCALLING_RESPONSE_CACHE', 'PLAYCALLING_ENGINE'):
+        with _cache_lock:
+            _cache = None
+            _cache_configured = False
@@ -0,0 +1,74 @@
+"""
+Streaming export of the play history.
+
+Rows are read with ``values_list(...).iterator()`` and serialised as they
+arrive, so no model instances are built and memory use does not depend on the
+size of the table. Values are rendered exactly like ``GamePlaySerializer``.
+"""
+
+import csv
+import json
+
+from .models import play_lookups
+from .serializers import GamePlaySerializer
+
+EXPORT_FIELDS = tuple(GamePlaySerializer.Meta.fields)
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, 'isoformat'):
+        return _json_default(value)
+    return value
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines, lines_per_chunk):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= lines_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default=_json_default, ensure_ascii=False) + '\n'
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def export_rows(queryset, fmt, chunk_size=2000):
+    """Iterate over encoded chunks of ``queryset`` in the requested format."""
+    rows = queryset.order_by('-created_at', '-id').values_list(*play_lookups(EXPORT_FIELDS))
+    rows = rows.iterator(chunk_size=chunk_size)
+    lines = _ndjson_lines(rows) if fmt == 'ndjson' else _csv_lines(rows)
+    return _batched(lines, lines_per_chunk=200)
@@ -0,0 +1,157 @@
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .search import match_plays
+from .situations import BASE_STATES, base_state_bits
+
+BOOLEAN_VALUES = {
+    'true': True,
+    '1': True,
+    'yes': True,
+    'false': False,
+    '0': False,
+    'no': False,
+}
+
+
+def _int_param(params, name, min_value=None, max_value=None):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError({name: ['A valid integer is required.']})
+    if min_value is not None and value < min_value:
+        raise ValidationError({name: [f'Ensure this value is greater than or equal to {min_value}.']})
+    if max_value is not None and value > max_value:
+        raise ValidationError({name: [f'Ensure this value is less than or equal to {max_value}.']})
+    return value
+
+
+def _bases_param(params):
+    """Parse ``bases`` such as ``1-3``, ``123`` or ``empty`` into a base mask."""
+    raw = params.get('bases')
+    if raw in (None, ''):
+        return None
+    raw = raw.strip().lower()
+    if raw in ('empty', 'none', '0'):
+        return 0
+    occupied = raw.replace('-', '').replace(',', '')
+    if not occupied or set(occupied) - {'1', '2', '3'}:
+        raise ValidationError({'bases': ['Use occupied bases such as "1-3", "123" or "empty".']})
+    return base_state_bits('1' in occupied, '2' in occupied, '3' in occupied)
+
+
+def _count_param(params):
+    raw = params.get('count')
+    if raw in (None, ''):
+        return None, None
+    try:
+        balls, strikes = (int(part) for part in raw.split('-'))
+    except ValueError:
+        raise ValidationError({'count': ['Use balls-strikes such as "3-2".']})
+    if not (0 <= balls <= 3 and 0 <= strikes <= 2):
+        raise ValidationError({'count': ['Count must be between 0-0 and 3-2.']})
+    return balls, strikes
+
+
+def _datetime_param(params, name, end_of_day=False):
+    """Accept an ISO 8601 datetime or a plain date (start or end of that day)."""
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            if day is not None:
+                value = datetime.combine(day, time.max if end_of_day else time.min)
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: ['Use an ISO 8601 date or datetime.']})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def situation_filters(params):
+    """
+    Lookups for the outs/bases/count query parameters.
+
+    Outs and runners are translated into lookups on the packed ``base_out_state``
+    column so that every situation filter can use the composite indexes.
+    """
+    filters = {}
+
+    base_out_state = _int_param(params, 'base_out_state', 0, 3 * BASE_STATES - 1)
+    outs = _int_param(params, 'outs', 0, 2)
+    bases = _bases_param(params)
+    if base_out_state is not None:
+        filters['base_out_state'] = base_out_state
+    if outs is not None and bases is not None:
+        filters['base_out_state'] = outs * BASE_STATES + bases
+    elif outs is not None:
+        filters['base_out_state__range'] = (outs * BASE_STATES, outs * BASE_STATES + BASE_STATES - 1)
+    elif bases is not None:
+        filters['base_out_state__in'] = [out_count * BASE_STATES + bases for out_count in range(3)]
+
+    balls, strikes = _count_param(params)
+    balls = _int_param(params, 'balls', 0, 3) if balls is None else balls
+    strikes = _int_param(params, 'strikes', 0, 2) if strikes is None else strikes
+    if balls is not None:
+        filters['balls'] = balls
+    if strikes is not None:
+        filters['strikes'] = strikes
+    return filters
+
+
+def filter_plays(queryset, params):
+    """Narrow a ``GamePlay`` queryset by the history query parameters."""
+    filters = situation_filters(params)
+
+    inning_min = _int_param(params, 'inning_min', 1)
+    inning_max = _int_param(params, 'inning_max', 1)
+    if inning_min is not None:
+        filters['inning__gte'] = inning_min
+    if inning_max is not None:
+        filters['inning__lte'] = inning_max
+
+    half_inning = params.get('half_inning')
+    if half_inning:
+        if half_inning not in ('top', 'bottom'):
+            raise ValidationError({'half_inning': [f'"{half_inning}" is not a valid choice.']})
+        filters['half_inning'] = half_inning
+
+    created_after = _datetime_param(params, 'created_after')
+    created_before = _datetime_param(params, 'created_before', end_of_day=True)
+    if created_after is not None:
+        filters['created_at__gte'] = created_after
+    if created_before is not None:
+        filters['created_at__lte'] = created_before
+
+    for name in ('offense_team', 'defense_team'):
+        if params.get(name):
+            filters[name] = params[name]
+
+    generated = params.get('generated_from_engine')
+    if generated:
+        if generated.lower() not in BOOLEAN_VALUES:
+            raise ValidationError({'generated_from_engine': ['Must be a valid boolean.']})
+        filters['generated_from_engine'] = BOOLEAN_VALUES[generated.lower()]
+
+    queryset = queryset.filter(**filters)
+
+    team = params.get('team')
+    if team:
+        # Either side of the OR is answered by its own team index.
+        queryset = queryset.filter(Q(offense_team=team) | Q(defense_team=team))
+
+    if params.get('q'):
+        queryset = match_plays(queryset, params['q'])
+    return queryset
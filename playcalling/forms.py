@@ -1,5 +1,7 @@
 from django import forms
 
+from .models import RECOMMENDATION_TEXT_FIELDS, GamePlay
+
 
 class RecommendationForm(forms.Form):
     HALF_INNING_CHOICES = (
@@ -30,3 +32,28 @@ class RecommendationForm(forms.Form):
         required=False,
         label='Save this recommendation to the play history',
     )
+
+
+class GamePlayAdminForm(forms.ModelForm):
+    """Admin form editing the recommendation texts, which are not model fields."""
+
+    recommended_pitch = forms.CharField(max_length=128, required=False)
+    defensive_alignment = forms.JSONField(required=False)
+    catcher_instructions = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}))
+    offensive_sign = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}))
+    runner_instructions = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}))
+
+    class Meta:
+        model = GamePlay
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in RECOMMENDATION_TEXT_FIELDS:
+            self.initial.setdefault(field, getattr(self.instance, field))
+
+    def save(self, commit=True):
+        for field in RECOMMENDATION_TEXT_FIELDS:
+            value = self.cleaned_data[field]
+            setattr(self.instance, field, {} if field == 'defensive_alignment' and value is None else value)
+        return super().save(commit)
@@ -0,0 +1,265 @@
+"""
+Server-side game state advanced by compact pitch events.
+
+A session holds the full situation. Clients post events such as
+``{"type": "ball"}`` or ``{"type": "runner_advance", "from": 1, "to": 3}``,
+and ``apply_events`` works out the next situation. It handles walks,
+strikeouts, the third out and the switch of sides between half innings.
+
+``SessionStore`` keeps recently used sessions in a bounded in-process LRU.
+Every change is written through to ``GameSession`` with a conditional update
+on ``version``, so a worker holding a stale copy notices, reloads and tries
+again. The database stays the source of truth when several workers serve
+the same game.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import GameSession
+from .validation import REQUIRED
+
+STATE_FIELDS = (
+    'offense_team',
+    'defense_team',
+    'inning',
+    'half_inning',
+    'outs',
+    'balls',
+    'strikes',
+    'runners_on_first',
+    'runners_on_second',
+    'runners_on_third',
+    'score_difference',
+    'context_notes',
+    'save_to_history',
+    'version',
+)
+
+MAX_EVENTS_PER_REQUEST = 50
+
+RUNNER_FIELDS = {1: 'runners_on_first', 2: 'runners_on_second', 3: 'runners_on_third'}
+BASE_NAMES = {0: 'batter', 1: 'first', 2: 'second', 3: 'third', 4: 'home'}
+
+
+class InvalidEvent(Exception):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+        self.message = message
+
+
+class VersionConflict(Exception):
+    pass
+
+
+def _reset_count(state):
+    state['balls'] = 0
+    state['strikes'] = 0
+
+
+def _end_half_inning(state):
+    state['outs'] = 0
+    for field in RUNNER_FIELDS.values():
+        state[field] = False
+    _reset_count(state)
+    if state['half_inning'] == 'top':
+        state['half_inning'] = 'bottom'
+    else:
+        state['half_inning'] = 'top'
+        state['inning'] += 1
+    state['offense_team'], state['defense_team'] = state['defense_team'], state['offense_team']
+    state['score_difference'] = -state['score_difference']
+
+
+def _record_out(state):
+    if state['outs'] == 2:
+        _end_half_inning(state)
+    else:
+        state['outs'] += 1
+
+
+def _walk(state):
+    """Batter to first; runners move up only when forced."""
+    if state['runners_on_first']:
+        if state['runners_on_second']:
+            if state['runners_on_third']:
+                state['score_difference'] += 1
+            state['runners_on_third'] = True
+        state['runners_on_second'] = True
+    state['runners_on_first'] = True
+    _reset_count(state)
+
+
+def _require_runner(state, base, field):
+    if not state[RUNNER_FIELDS[base]]:
+        raise InvalidEvent(field, f'No runner on {BASE_NAMES[base]}.')
+
+
+def apply_event(state, event):
+    """Apply one validated event to ``state`` in place."""
+    kind = event['type']
+    if kind == 'ball':
+        if state['balls'] == 3:
+            _walk(state)
+        else:
+            state['balls'] += 1
+    elif kind == 'strike':
+        if state['strikes'] == 2:
+            _reset_count(state)
+            _record_out(state)
+        else:
+            state['strikes'] += 1
+    elif kind == 'foul':
+        if state['strikes'] < 2:
+            state['strikes'] += 1
+    elif kind == 'out':
+        runner = event.get('runner')
+        if runner is None:
+            _reset_count(state)
+        else:
+            _require_runner(state, runner, 'runner')
+            state[RUNNER_FIELDS[runner]] = False
+        _record_out(state)
+    elif kind == 'runner_advance':
+        for field in ('from', 'to'):
+            if field not in event:
+                raise InvalidEvent(field, REQUIRED)
+        origin, target = event['from'], event['to']
+        if target <= origin:
+            raise InvalidEvent('to', f'Must be past {BASE_NAMES[origin]}.')
+        if origin == 0:
+            _reset_count(state)
+        else:
+            _require_runner(state, origin, 'from')
+            state[RUNNER_FIELDS[origin]] = False
+        if target == 4:
+            state['score_difference'] += 1
+        elif state[RUNNER_FIELDS[target]]:
+            raise InvalidEvent('to', f'{BASE_NAMES[target].title()} is already occupied.')
+        else:
+            state[RUNNER_FIELDS[target]] = True
+    elif kind == 'run_scored':
+        state['score_difference'] += event['runs']
+    else:
+        raise InvalidEvent('type', f'"{kind}" is not a valid choice.')
+
+
+def apply_events(state, events):
+    """
+    Return a new state with all ``events`` applied, or raise ``InvalidEvent``
+    with ``index`` set to the first event that does not fit the situation.
+    """
+    state = dict(state)
+    for index, event in enumerate(events):
+        try:
+            apply_event(state, event)
+        except InvalidEvent as exc:
+            exc.index = index
+            raise
+    state['version'] += len(events)
+    return state
+
+
+class SessionStore:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, session_id, state):
+        with self._lock:
+            self._entries[session_id] = state
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def create(self, **fields):
+        session = GameSession.objects.create(**fields)
+        state = {name: getattr(session, name) for name in STATE_FIELDS}
+        self._remember(session.pk, state)
+        return session.pk, dict(state)
+
+    def get(self, session_id, fresh=False):
+        """
+        Current state of a session; raises ``GameSession.DoesNotExist``.
+        ``fresh`` skips the in-process copy, which may trail other workers.
+        """
+        with self._lock:
+            state = None if fresh else self._entries.get(session_id)
+            if state is not None:
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return dict(state)
+            self.misses += 1
+        state = GameSession.objects.filter(pk=session_id).values(*STATE_FIELDS).first()
+        if state is None:
+            raise GameSession.DoesNotExist(f'Game session {session_id} does not exist.')
+        self._remember(session_id, state)
+        return dict(state)
+
+    def apply(self, session_id, events, expected_version=None, attempts=3):
+        """
+        Apply ``events`` and persist the result; returns the new state.
+
+        ``expected_version`` makes the update fail with ``VersionConflict``
+        unless the session is still at that version, so clients cannot apply
+        events on top of a state they have not seen.
+        """
+        fresh = False
+        for _ in range(attempts):
+            state = self.get(session_id, fresh=fresh)
+            if expected_version is not None and state['version'] != expected_version:
+                if fresh:
+                    raise VersionConflict(state['version'])
+                # The local copy may trail another worker; check the database first.
+                fresh = True
+                continue
+            new_state = apply_events(state, events)
+            changes = {name: new_state[name] for name in STATE_FIELDS if new_state[name] != state[name]}
+            updated = GameSession.objects.filter(pk=session_id, version=state['version']).update(
+                **changes, updated_at=timezone.now()
+            )
+            if updated:
+                self._remember(session_id, new_state)
+                return dict(new_state)
+            # Another worker moved the session on; reload and try again.
+            fresh = True
+        raise VersionConflict(None)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide store sized by ``PLAYCALLING_SESSION_CACHE_SIZE``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(getattr(settings, 'PLAYCALLING_SESSION_CACHE_SIZE', 1000))
+    return _store
+
+
+def session_store_stats():
+    return _store.stats() if _store is not None else None
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'PLAYCALLING_SESSION_CACHE_SIZE':
+        with _store_lock:
+            _store = None
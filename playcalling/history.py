@@ -0,0 +1,248 @@
+"""
+History-driven recommendation engine.
+
+Recorded outcomes are counted per base-out-count state, recommended pitch
+and outcome class (out, walk, hit or other) in an integer NumPy array of
+shape ``(BASE_OUT_COUNT_STATES, pitches, classes)``. The pitch axis lists the
+distinct calls the rules can make. The engine starts from the rules'
+recommendation. When one or more pitches have enough samples in the current
+situation, it calls the one that has produced outs most often, and it says
+so in ``key_points``. With too few samples the rules' answer is returned
+unchanged.
+
+The array is built from ``SituationOutcomeSummary`` rather than the play
+table, and it is kept current through ``analytics.apply_delta``. With
+``table_dir`` set it lives in a ``.npy`` file that every worker on the host
+memory-maps and updates in place, so new workers start without touching the
+database. Concurrent increments from different processes are not atomic, so
+schedule ``rebuild_history_table`` to reconcile the counts.
+
+Calls from the event loop do not build the table there: the first one starts
+a background load, and they are answered by the rules until it is ready.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+
+from .models import SituationOutcomeSummary
+from .recommendations import decision_table, lookup_recommendation
+from .rulepacks import in_event_loop
+from .sharding import play_databases
+from .situations import BASE_OUT_COUNT_STATES, context_base_out_state, pack_base_out_count, pack_count
+
+OUTCOME_CLASSES = ('out', 'walk', 'hit', 'other')
+OUT, WALK, HIT, OTHER = range(len(OUTCOME_CLASSES))
+
+# First match wins: "hit by pitch" is a walk, "double play" and "fielder's
+# choice" are outs even though they mention a hit, and a hit beats the
+# batted-ball words that usually describe an out.
+_OUTCOME_PATTERNS = (
+    (WALK, re.compile(r'\b(walk(ed|s)?|base on balls|hit by pitch|hbp|i?bb)\b')),
+    (OUT, re.compile(r"\b(double play|triple play|fielder'?s choice)\b")),
+    (HIT, re.compile(r'\b(single[sd]?|doubled?|tripled?|home run|homered|homer|hr|hit)\b')),
+    (OUT, re.compile(
+        r'\b(\w*outs?|struck|k|sac(rifice)? (fly|bunt)|flied|fly ?ball|grounded|grounder|popped|pop ?up|lined|line ?drive)\b'
+    )),
+)
+
+DEFAULT_HISTORY_ENGINE_SETTINGS = {
+    # Directory holding the memory-mapped table; None keeps it in process memory.
+    'table_dir': None,
+    # Fewer recorded outcomes than this for a pitch leaves the call to the rules.
+    'min_samples': 30,
+}
+
+
+def outcome_class(outcome):
+    """Bucket a free-text ``actual_outcome`` into one of ``OUTCOME_CLASSES``."""
+    text = (outcome or '').lower()
+    for index, pattern in _OUTCOME_PATTERNS:
+        if pattern.search(text):
+            return index
+    return OTHER
+
+
+def history_pitches():
+    """Every pitch call the rules can make, in a stable order."""
+    return tuple(sorted({entry[0] for entry in decision_table()}))
+
+
+def history_engine_options():
+    return {**DEFAULT_HISTORY_ENGINE_SETTINGS, **getattr(settings, 'PLAYCALLING_HISTORY_ENGINE', {})}
+
+
+def table_path(directory, pitches):
+    """The file name carries a digest of the pitch axis, so rule changes start a new table."""
+    digest = hashlib.sha256('\n'.join(pitches).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(directory, f'history-outcomes-{digest}.npy')
+
+
+def build_counts(pitches):
+    """Fresh count array from the summary tables of every play database, accumulated with one ``np.add.at``."""
+    pitch_index = {pitch: index for index, pitch in enumerate(pitches)}
+    situations, pitch_column, classes, totals = [], [], [], []
+    for alias in play_databases():
+        rows = SituationOutcomeSummary.objects.using(alias).filter(recommended_pitch__in=pitch_index).values_list(
+            'base_out_state', 'balls', 'strikes', 'recommended_pitch', 'outcome', 'count'
+        )
+        for base_out_state, balls, strikes, pitch, outcome, count in rows.iterator():
+            situations.append(pack_base_out_count(base_out_state, pack_count(balls, strikes)))
+            pitch_column.append(pitch_index[pitch])
+            classes.append(outcome_class(outcome))
+            totals.append(count)
+    counts = np.zeros((BASE_OUT_COUNT_STATES, len(pitches), len(OUTCOME_CLASSES)), dtype=np.int64)
+    np.add.at(counts, (np.array(situations, dtype=np.intp), np.array(pitch_column, dtype=np.intp),
+                       np.array(classes, dtype=np.intp)), np.array(totals, dtype=np.int64))
+    return counts
+
+
+class OutcomeTable:
+    def __init__(self, counts, pitches):
+        self.counts = counts
+        self.pitches = pitches
+        self.pitch_index = {pitch: index for index, pitch in enumerate(pitches)}
+
+    def add(self, base_out_state, balls, strikes, pitch, outcome, delta):
+        index = self.pitch_index.get(pitch)
+        if index is None:
+            return
+        cell = (pack_base_out_count(base_out_state, pack_count(balls, strikes)), index, outcome_class(outcome))
+        self.counts[cell] = max(0, int(self.counts[cell]) + delta)
+
+    def refill(self):
+        self.counts[...] = build_counts(self.pitches)
+        if isinstance(self.counts, np.memmap):
+            self.counts.flush()
+
+
+_table = None
+_loading = False
+_table_lock = threading.Lock()
+
+
+def _load_table():
+    """``(table, built)``; ``built`` is True when the counts were just read from the database."""
+    global _table
+    with _table_lock:
+        if _table is not None:
+            return _table, False
+        pitches = history_pitches()
+        directory = history_engine_options()['table_dir']
+        built = True
+        if directory is None:
+            counts = build_counts(pitches)
+        else:
+            path = table_path(directory, pitches)
+            if os.path.exists(path):
+                built = False
+            else:
+                os.makedirs(directory, exist_ok=True)
+                # Write under a temporary name so other workers never map a partial file.
+                descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.npy')
+                with os.fdopen(descriptor, 'wb') as handle:
+                    np.save(handle, build_counts(pitches))
+                os.replace(temporary, path)
+            counts = np.lib.format.open_memmap(path, mode='r+')
+        _table = OutcomeTable(counts, pitches)
+        return _table, built
+
+
+def get_outcome_table():
+    return _load_table()[0]
+
+
+def _load_in_background():
+    global _loading
+    try:
+        _load_table()
+    finally:
+        _loading = False
+        connections.close_all()
+
+
+def loaded_outcome_table():
+    """``get_outcome_table``, or None from async code until a background thread has loaded it."""
+    global _loading
+    if _table is not None or not in_event_loop():
+        return get_outcome_table()
+    with _table_lock:
+        if _loading:
+            return None
+        _loading = True
+    threading.Thread(target=_load_in_background, name='history-table-load', daemon=True).start()
+    return None
+
+
+def record_outcome(key, delta):
+    """Mirror a summary change (see ``analytics.apply_delta``) into the table."""
+    table = _table
+    if table is None:
+        if history_engine_options()['table_dir'] is None:
+            # Nothing loaded yet; the first build reads the summary, change included.
+            return
+        table, built = _load_table()
+        if built:
+            return
+    with _table_lock:
+        table.add(*key, delta)
+
+
+def rebuild_history_table():
+    """Recount the table from the summary, in place so mapped copies see the result."""
+    table, built = _load_table()
+    if not built:
+        with _table_lock:
+            table.refill()
+    return table
+
+
+def summary_rebuilt():
+    """Recount after ``analytics.rebuild_summary``, if this process or the host uses the table."""
+    if _table is not None or history_engine_options()['table_dir'] is not None:
+        rebuild_history_table()
+
+
+def history_recommendation(context):
+    """``generate_recommendation`` contract; rules output adjusted by recorded outcomes."""
+    recommendation = lookup_recommendation(context)
+    table = loaded_outcome_table()
+    if table is None:
+        return recommendation
+    situation = pack_base_out_count(
+        context_base_out_state(context),
+        pack_count(context['balls'], context['strikes']),
+    )
+    counts = np.asarray(table.counts[situation])
+    totals = counts.sum(axis=1)
+    eligible = totals >= history_engine_options()['min_samples']
+    if not eligible.any():
+        return recommendation
+
+    out_rates = np.where(eligible, counts[:, OUT] / np.maximum(totals, 1), -1.0)
+    best = int(out_rates.argmax())
+    current = table.pitch_index.get(recommendation['pitch_call'])
+    if current is not None and eligible[current] and out_rates[current] >= out_rates[best]:
+        best = current
+    recommendation['pitch_call'] = table.pitches[best]
+    recommendation['key_points'].append(
+        f'History: {out_rates[best]:.0%} of {int(totals[best])} recorded plays on this call '
+        f'in this count and base-out state ended in an out.'
+    )
+    return recommendation
+
+
+@receiver(setting_changed)
+def _reset_table(setting, **kwargs):
+    global _table
+    if setting == 'PLAYCALLING_HISTORY_ENGINE':
+        with _table_lock:
+            _table = None
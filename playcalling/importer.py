@@ -0,0 +1,177 @@
+"""
+Streaming bulk import of play logs.
+
+Rows are read one at a time from CSV or JSON Lines input, validated with
+``GamePlayValidator`` and inserted in ``bulk_create`` chunks, each in its own
+transaction, so memory use does not grow with the size of the file. Rows that
+fail validation are handed to a reject callback instead of aborting the load,
+and so are rows that are not valid UTF-8 or not valid CSV.
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import GamePlay
+from .recommendations import get_engine
+from .sharding import database_for
+from .validation import GamePlayValidator
+
+FORMATS = ('csv', 'jsonl')
+
+# Undecodable bytes become lone surrogates, so the rows holding them can be
+# rejected without losing the rest of the file.
+ENCODING = 'utf-8'
+ENCODING_ERRORS = 'surrogateescape'
+NOT_UTF8 = {'non_field_errors': [f'Not valid {ENCODING.upper()} text.']}
+
+RECOMMENDATION_COLUMNS = (
+    'recommended_pitch',
+    'defensive_alignment',
+    'catcher_instructions',
+    'offensive_sign',
+    'runner_instructions',
+)
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    rejected: int = 0
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def open_log(binary):
+    """Text stream over a binary play log, for ``read_rows``."""
+    return io.TextIOWrapper(binary, encoding=ENCODING, errors=ENCODING_ERRORS, newline='')
+
+
+def _undecodable(text):
+    try:
+        text.encode(ENCODING)
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, row, error)`` from a text stream, preferably one
+    from ``open_log``. ``row`` is ``None`` when the line could not be parsed.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                # The reader has not counted the line it failed on.
+                yield reader.line_num + 1, None, {'non_field_errors': [f'Invalid CSV: {exc}']}
+                continue
+            row = {key: value for key, value in row.items() if key is not None}
+            if any(isinstance(text, str) and _undecodable(text) for text in (*row, *row.values())):
+                yield reader.line_num, None, NOT_UTF8
+                continue
+            if row.get('defensive_alignment'):
+                try:
+                    row['defensive_alignment'] = json.loads(row['defensive_alignment'])
+                except ValueError as exc:
+                    yield reader.line_num, row, {'defensive_alignment': [f'Invalid JSON: {exc}']}
+                    continue
+            else:
+                row.pop('defensive_alignment', None)
+            # Empty CSV cells mean "not provided", matching omitted JSON keys.
+            yield reader.line_num, {key: value for key, value in row.items() if value != ''}, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            if _undecodable(line):
+                yield line_number, None, NOT_UTF8
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, {'non_field_errors': ['Expected a JSON object.']}
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unknown import format {fmt!r}; choose from {FORMATS}.')
+
+
+def _backfill(play, engine):
+    if all(getattr(play, column) for column in RECOMMENDATION_COLUMNS):
+        return
+    recommendation = engine({
+        'offense_team': play.offense_team,
+        'defense_team': play.defense_team,
+        'inning': play.inning,
+        'half_inning': play.half_inning,
+        'outs': play.outs,
+        'balls': play.balls,
+        'strikes': play.strikes,
+        'runners_on_first': play.runners_on_first,
+        'runners_on_second': play.runners_on_second,
+        'runners_on_third': play.runners_on_third,
+        'score_difference': play.score_difference,
+    })
+    play.recommended_pitch = play.recommended_pitch or recommendation['pitch_call']
+    play.defensive_alignment = play.defensive_alignment or recommendation['defensive_alignment']
+    play.catcher_instructions = play.catcher_instructions or recommendation['catcher_plan']
+    play.offensive_sign = play.offensive_sign or recommendation['offensive_signs'].get('hitter', '')
+    play.runner_instructions = play.runner_instructions or recommendation['offensive_signs'].get('runner', '')
+
+
+def import_plays(rows, chunk_size=1000, backfill=False, reject=None, organization=''):
+    """
+    Insert validated rows from ``read_rows`` output as plays of ``organization``.
+
+    ``reject(line_number, row, errors)`` is called for every invalid row.
+    Returns an ``ImportResult`` with the number of imported and rejected rows.
+    """
+    validator = GamePlayValidator()
+    engine = get_engine(getattr(settings, 'PLAYCALLING_ENGINE', 'rules')) if backfill else None
+    result = ImportResult()
+    chunk = []
+    database = database_for(organization)
+
+    def flush():
+        with transaction.atomic(using=database):
+            GamePlay.objects.bulk_create(chunk)
+        result.imported += len(chunk)
+        chunk.clear()
+
+    for line_number, row, errors in rows:
+        if errors is None:
+            validated, errors = validator.validate(row)
+        if errors:
+            result.rejected += 1
+            if reject is not None:
+                reject(line_number, row, errors)
+            continue
+        play = GamePlay(organization=organization, **validated)
+        if engine is not None:
+            _backfill(play, engine)
+        chunk.append(play)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
@@ -0,0 +1,165 @@
+"""
+Interned recommendation texts.
+
+The engine produces a few dozen distinct combinations of pitch call,
+alignment, catcher plan and signs, so a ``GamePlay`` stores a reference to a
+shared ``RecommendationText`` row instead of repeating the text. Saving a play
+interns its texts: ``intern_texts`` finds or creates the row for them in the
+play's database.
+
+Each process remembers up to ``PLAYCALLING_RECOMMENDATION_TEXT_CACHE_SIZE``
+rows per database, by digest and by id, so saving a play usually costs no
+extra query and reading one often needs no join. Rows are remembered only
+after the transaction that saw them commits. The cache of a database is
+cleared whenever it is migrated or flushed.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import RECOMMENDATION_TEXT_FIELDS, GamePlay, RecommendationText, blank_recommendation_texts
+from .replicas import primary_database
+
+
+def text_digest(texts):
+    """Stable digest of ``texts``; alignment keys keep their order so plays read back exactly as written."""
+    values = [texts[field] for field in RECOMMENDATION_TEXT_FIELDS]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class TextCache:
+    """Bounded LRU of ``RecommendationText`` rows by ``(database, digest)`` and ``(database, id)``."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._by_digest = OrderedDict()
+        self._by_id = {}
+        self._lock = threading.Lock()
+
+    def by_digest(self, alias, digest):
+        with self._lock:
+            text = self._by_digest.get((alias, digest))
+            if text is not None:
+                self._by_digest.move_to_end((alias, digest))
+            return text
+
+    def by_id(self, alias, pk):
+        with self._lock:
+            return self._by_id.get((alias, pk))
+
+    def add(self, alias, text):
+        with self._lock:
+            self._by_digest[alias, text.digest] = text
+            self._by_digest.move_to_end((alias, text.digest))
+            self._by_id[alias, text.pk] = text
+            while len(self._by_digest) > self.max_entries:
+                (evicted_alias, _), evicted = self._by_digest.popitem(last=False)
+                self._by_id.pop((evicted_alias, evicted.pk), None)
+
+    def clear(self, alias=None):
+        with self._lock:
+            if alias is None:
+                self._by_digest.clear()
+                self._by_id.clear()
+                return
+            for key in [key for key in self._by_digest if key[0] == alias]:
+                self._by_id.pop((alias, self._by_digest.pop(key).pk), None)
+
+    def __len__(self):
+        return len(self._by_digest)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TextCache(getattr(settings, 'PLAYCALLING_RECOMMENDATION_TEXT_CACHE_SIZE', 4096))
+    return _cache
+
+
+def cached_text(alias, pk):
+    """The cached row ``pk`` of ``alias`` (a replica reads like its primary), or None."""
+    if alias is None:
+        return None
+    return get_text_cache().by_id(primary_database(alias), pk)
+
+
+# Digests per lookup, well below SQLite's limit on query parameters.
+LOOKUP_BATCH_SIZE = 500
+
+
+def intern_many(texts_list, using):
+    """``{digest: RecommendationText}`` in ``using`` for every texts dict of ``texts_list``, created if needed."""
+    cache = get_text_cache()
+    found, missing = {}, {}
+    for texts in texts_list:
+        digest = text_digest(texts)
+        if digest in found or digest in missing:
+            continue
+        text = cache.by_digest(using, digest)
+        if text is not None:
+            found[digest] = text
+        else:
+            missing[digest] = texts
+    if not missing:
+        return found
+    rows = RecommendationText.objects.using(using)
+    loaded = _load(rows, list(missing))
+    new = [RecommendationText(digest=digest, **texts) for digest, texts in missing.items() if digest not in loaded]
+    if new:
+        # Another writer may intern the same texts first; keep its rows.
+        rows.bulk_create(new, ignore_conflicts=True)
+        loaded.update(_load(rows, [text.digest for text in new]))
+    for text in loaded.values():
+        # The row may still be rolled back with the caller's transaction.
+        transaction.on_commit(partial(cache.add, using, text), using=using)
+    return {**found, **loaded}
+
+
+def _load(rows, digests):
+    loaded = {}
+    for start in range(0, len(digests), LOOKUP_BATCH_SIZE):
+        loaded.update((text.digest, text) for text in rows.filter(digest__in=digests[start:start + LOOKUP_BATCH_SIZE]))
+    return loaded
+
+
+def intern_texts(texts, using):
+    """The ``RecommendationText`` in ``using`` holding ``texts``, created if needed."""
+    return intern_many([texts], using)[text_digest(texts)]
+
+
+def _texts_to_intern(play, using):
+    """The texts ``play`` must be pointed at in ``using``, or None if its reference is already right."""
+    if play._pending_texts is not None:
+        return play._pending_texts
+    if play.recommendation_text_id is None:
+        return blank_recommendation_texts()
+    if GamePlay.recommendation_text.is_cached(play) and play.recommendation_text._state.db != using:
+        # Copied from another database, e.g. by rebalance_shards.
+        return play.recommendation_text.texts()
+    return None
+
+
+def intern_play_texts(plays, using):
+    """Point ``plays`` at the interned rows of their texts in ``using`` before they are written there."""
+    wanted = [(play, texts) for play in plays if (texts := _texts_to_intern(play, using)) is not None]
+    interned = intern_many([texts for _, texts in wanted], using)
+    for play, texts in wanted:
+        play.recommendation_text = interned[text_digest(texts)]
+        play._pending_texts = None
+
+
+def clear_after_migrate(sender, using, **kwargs):
+    """``post_migrate`` receiver; ``flush`` sends it too, after deleting every row."""
+    get_text_cache().clear(using)
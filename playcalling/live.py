@@ -0,0 +1,177 @@
+"""
+Per-game live channels streamed to coach devices over Server-Sent Events.
+
+The scorer's device publishes each new situation to a game channel, and every
+subscribed device receives the resulting document (``situation`` plus
+``recommendation``). A subscriber gets the full document when it connects and
+after that only JSON merge patches (RFC 7396) of the fields that changed since
+the document it last received.
+
+Subscribers are coroutines waiting on the channel's event, not threads, so a
+process can hold hundreds of idle streams. Channels live in the process
+that serves them. Run a single ASGI worker for live games, or pin each game
+to one worker.
+
+Django 4.2 does not tell a streaming response that its client went away, so a
+dropped subscriber would wait on its channel forever. Every stream is closed
+after a maximum duration instead; EventSource clients reconnect on their own
+and start again from a snapshot.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_missing = object()
+
+
+def merge_patch(previous, current):
+    """RFC 7396 merge patch turning ``previous`` into ``current``; ``{}`` when they are equal."""
+    patch = {}
+    for key, value in current.items():
+        old = previous.get(key, _missing)
+        if old == value:
+            continue
+        if isinstance(old, dict) and isinstance(value, dict):
+            patch[key] = merge_patch(old, value)
+        else:
+            patch[key] = value
+    for key in previous.keys() - current.keys():
+        patch[key] = None
+    return patch
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+class GameChannel:
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.version = 0
+        self.document = None
+        self.subscribers = 0
+        # Patch from version - 1 to version, shared by every up-to-date subscriber.
+        self.patch = None
+        self._changed = asyncio.Event()
+
+    def publish(self, situation, recommendation):
+        """Replace the document and wake every subscriber; returns the new version."""
+        document = {'situation': situation, 'recommendation': recommendation}
+        self.patch = merge_patch(self.document, document) if self.document is not None else document
+        self.document = document
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return self.version
+
+    async def wait(self, version, timeout):
+        """Wait until the channel moves past ``version``; False if ``timeout`` passed first."""
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def events(self, keepalive, max_duration):
+        """
+        Server-Sent Events for one subscriber: a snapshot, then deltas and
+        keep-alive comments, until ``max_duration`` seconds have passed.
+        """
+        self.subscribers += 1
+        try:
+            yield f'retry: {int(keepalive * 1000)}\n\n'
+            deadline = time.monotonic() + max_duration
+            sent_version, sent = 0, None
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if self.version != sent_version and self.document is not None:
+                    if sent is None:
+                        event = format_event('snapshot', self.document, self.version)
+                    else:
+                        patch = self.patch if sent_version == self.version - 1 else merge_patch(sent, self.document)
+                        event = format_event('delta', patch, self.version) if patch else None
+                    # Record what was sent before yielding; publishers may run while suspended.
+                    sent_version, sent = self.version, self.document
+                    if event is not None:
+                        yield event
+                elif not await self.wait(sent_version, min(keepalive, remaining)) and remaining > keepalive:
+                    # Keeps proxies from closing an idle stream.
+                    yield ': keepalive\n\n'
+        finally:
+            self.subscribers -= 1
+
+
+class ChannelRegistry:
+    """Bounded set of game channels; idle channels without subscribers are evicted first."""
+
+    def __init__(self, max_games):
+        self.max_games = max_games
+        self._channels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game_id):
+        with self._lock:
+            channel = self._channels.get(game_id)
+            if channel is None:
+                channel = self._channels[game_id] = GameChannel(game_id)
+                self._evict()
+            self._channels.move_to_end(game_id)
+            return channel
+
+    def _evict(self):
+        # Never the newest channel: it is the one being handed out.
+        for game_id in list(self._channels)[:-1]:
+            if len(self._channels) <= self.max_games:
+                break
+            if self._channels[game_id].subscribers == 0:
+                del self._channels[game_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'games': len(self._channels),
+                'max_games': self.max_games,
+                'subscribers': sum(channel.subscribers for channel in self._channels.values()),
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_channels():
+    """Process-wide registry sized by ``PLAYCALLING_LIVE_MAX_GAMES``."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ChannelRegistry(getattr(settings, 'PLAYCALLING_LIVE_MAX_GAMES', 1000))
+    return _registry
+
+
+def live_channel_stats():
+    return _registry.stats() if _registry is not None else None
+
+
+@receiver(setting_changed)
+def _reset_registry(setting, **kwargs):
+    global _registry
+    if setting == 'PLAYCALLING_LIVE_MAX_GAMES':
+        with _registry_lock:
+            _registry = None
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from playcalling.archive import archive_options, archive_plays
+from playcalling.sharding import play_databases
+
+
+class Command(BaseCommand):
+    help = (
+        'Move plays recorded before a cutoff from every play database into per-season columnar '
+        'files under PLAYCALLING_ARCHIVE["path"]. Analytics and run expectancy keep reading them.'
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument('--before', help='Archive plays recorded before this date (YYYY-MM-DD, UTC).')
+        cutoff.add_argument('--older-than', type=int, metavar='DAYS', help='Archive plays older than DAYS days.')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Plays read from the database at a time.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many plays would move.')
+
+    def handle(self, *args, **options):
+        if archive_options()['path'] is None:
+            raise CommandError('Set PLAYCALLING_ARCHIVE["path"] to the directory for archived seasons.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        if options['older_than'] is not None:
+            if options['older_than'] < 0:
+                raise CommandError('--older-than cannot be negative.')
+            before = timezone.now() - timedelta(days=options['older_than'])
+        else:
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"--before must be a date like 2024-01-01, not {options['before']!r}.")
+            before = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        total = 0
+        for alias in play_databases():
+            seasons = archive_plays(alias, before, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+            for season, plays in seasons.items():
+                self.stdout.write(f'{verb} {plays} plays of {season} from {alias}.')
+            total += sum(seasons.values())
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} plays recorded before {before.isoformat()}.'))
@@ -0,0 +1,138 @@
+import json
+import platform
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from playcalling.benchmarking import benchmark_database, compare_to_baseline, run_benchmark, seed_plays
+from playcalling.models import GamePlay
+from playcalling.recommendations import generate_recommendation
+from playcalling.serializers import RecommendationRequestSerializer, RecommendationResponseSerializer
+from playcalling.views import _persist_history, _recommend
+
+SITUATION = {
+    'offense_team': 'Visitors',
+    'defense_team': 'Home',
+    'inning': 7,
+    'half_inning': 'top',
+    'outs': 2,
+    'balls': 1,
+    'strikes': 1,
+    'runners_on_first': True,
+    'runners_on_second': False,
+    'runners_on_third': True,
+    'score_difference': 0,
+    'context_notes': 'Tie game, late inning leverage.',
+}
+
+
+def build_benchmarks():
+    """Name -> zero-argument callable for every hot path worth tracking."""
+    client = Client()
+    recommendation_url = reverse('recommendation')
+    list_url = reverse('plays-list')
+    detail_url = reverse('plays-detail', args=[GamePlay.objects.order_by('id').values_list('id', flat=True).first()])
+    validated = {**SITUATION, 'save_to_history': True}
+    recommendation = generate_recommendation(SITUATION)
+    payload = json.dumps(SITUATION)
+
+    def serializer_round_trip():
+        serializer = RecommendationRequestSerializer(data=SITUATION)
+        serializer.is_valid(raise_exception=True)
+        return RecommendationResponseSerializer(_recommend(serializer.validated_data)).data
+
+    return {
+        'engine.rules': lambda: generate_recommendation(SITUATION),
+        'engine.configured': lambda: _recommend(SITUATION),
+        'serializers.round_trip': serializer_round_trip,
+        'api.recommendation': lambda: client.post(recommendation_url, payload, content_type='application/json'),
+        'history.persist': lambda: _persist_history(validated, recommendation),
+        'api.plays_list': lambda: client.get(list_url),
+        'api.plays_detail': lambda: client.get(detail_url),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the recommendation and history hot paths on a seeded throwaway '
+        'database and optionally compare against a stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Plays to seed before timing.')
+        parser.add_argument('--warmup', type=int, default=50, help='Untimed calls before each benchmark.')
+        parser.add_argument('--repetitions', type=int, default=500, help='Timed calls per benchmark.')
+        parser.add_argument('--only', help='Comma-separated benchmark names (prefixes allowed).')
+        parser.add_argument('--output', help='Write machine-readable results to this JSON file.')
+        parser.add_argument('--baseline', help='JSON results from an earlier run to compare against.')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=10.0,
+            help='Fail when p50 latency is more than this many percent above the baseline.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows must be at least 1; the detail benchmark reads a seeded play.')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+
+        selected = [name.strip() for name in (options['only'] or '').split(',') if name.strip()]
+        results = {}
+        with benchmark_database():
+            seed_plays(options['rows'])
+            for name, func in build_benchmarks().items():
+                if selected and not any(name.startswith(prefix) for prefix in selected):
+                    continue
+                results[name] = run_benchmark(func, options['warmup'], options['repetitions'])
+                self._write_row(name, results[name])
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'rows': options['rows'],
+            'settings': {
+                'engine': getattr(settings, 'PLAYCALLING_ENGINE', 'rules'),
+                'fast_path': getattr(settings, 'PLAYCALLING_FAST_PATH', False),
+                'response_cache': getattr(settings, 'PLAYCALLING_RESPONSE_CACHE', None),
+                'history_write_behind': getattr(settings, 'PLAYCALLING_HISTORY_WRITE_BEHIND', False),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            self._compare(results, baseline, options['threshold'])
+
+    def _write_row(self, name, result):
+        self.stdout.write(
+            f"{name:<24} {result['ops_per_sec']:>12.1f} ops/s  "
+            f"p50 {result['p50_ms']:>9.4f} ms  p95 {result['p95_ms']:>9.4f} ms  p99 {result['p99_ms']:>9.4f} ms"
+        )
+
+    def _compare(self, results, baseline, threshold):
+        regressions = []
+        self.stdout.write(f'\nCompared with baseline (p50, threshold {threshold:.1f}%):')
+        for name, before, after, change, regressed in compare_to_baseline(results, baseline, threshold):
+            line = f'{name:<24} {before:>9.4f} -> {after:>9.4f} ms  {change:+6.1f}%'
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{line}  REGRESSION'))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"Performance regression in: {', '.join(regressions)}")
@@ -0,0 +1,100 @@
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from playcalling.benchmarking import async_views, benchmark_database, run_concurrent, run_threaded, seed_plays
+
+from .bench import SITUATION
+
+MODES = ('wsgi', 'asgi.sync', 'asgi.async')
+ENDPOINTS = ('recommendation', 'plays_list')
+
+
+def threaded_request(endpoint, payload):
+    """Zero-argument callable issuing one request through the WSGI handler from any thread."""
+    local = threading.local()
+    url = reverse('recommendation' if endpoint == 'recommendation' else 'plays-list')
+
+    def request():
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        if endpoint == 'recommendation':
+            return client.post(url, payload, content_type='application/json')
+        return client.get(url)
+
+    return request
+
+
+def async_request(endpoint, payload):
+    """Coroutine function issuing one request through the ASGI handler."""
+    client = AsyncClient()
+    url = reverse('recommendation' if endpoint == 'recommendation' else 'plays-list')
+
+    async def request():
+        if endpoint == 'recommendation':
+            return await client.post(url, payload, content_type='application/json')
+        return await client.get(url)
+
+    return request
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent request throughput of the WSGI path, the sync views '
+        'under ASGI and the native async views, on a seeded throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Plays to seed before timing.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode and endpoint.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--modes', default=','.join(MODES), help=f'Comma-separated subset of {MODES}.')
+        parser.add_argument(
+            '--endpoints',
+            default=','.join(ENDPOINTS),
+            help=f'Comma-separated subset of {ENDPOINTS}.',
+        )
+        parser.add_argument(
+            '--save-to-history',
+            action='store_true',
+            help='Ask the recommendation endpoint to persist every request.',
+        )
+        parser.add_argument('--output', help='Write machine-readable results to this JSON file.')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        endpoints = [endpoint.strip() for endpoint in options['endpoints'].split(',') if endpoint.strip()]
+        unknown = sorted(set(modes) - set(MODES)) + sorted(set(endpoints) - set(ENDPOINTS))
+        if unknown:
+            raise CommandError(f"Unknown mode or endpoint: {', '.join(unknown)}")
+
+        payload = json.dumps({**SITUATION, 'save_to_history': options['save_to_history']})
+        requests, concurrency = options['requests'], options['concurrency']
+        results = {}
+        with benchmark_database(on_disk=True):
+            seed_plays(options['rows'])
+            for mode in modes:
+                with async_views(enabled=mode == 'asgi.async'):
+                    for endpoint in endpoints:
+                        if mode == 'wsgi':
+                            result = run_threaded(threaded_request(endpoint, payload), requests, concurrency)
+                        else:
+                            result = run_concurrent(async_request(endpoint, payload), requests, concurrency)
+                        name = f'{mode}.{endpoint}'
+                        results[name] = result
+                        self._write_row(name, result)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({'rows': options['rows'], 'results': results}, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+    def _write_row(self, name, result):
+        self.stdout.write(
+            f"{name:<28} {result['ops_per_sec']:>10.1f} req/s  "
+            f"p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms"
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from playcalling.benchmarking import benchmark_database, measure, median_ms, seed_plays
+
+
+class Command(BaseCommand):
+    help = (
+        'Walk GET /api/plays/ page by page on a seeded throwaway database and report '
+        'the latency of pages at increasing depth.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=60000, help='Number of plays to seed.')
+        parser.add_argument('--pages', type=int, default=1000, help='Deepest page to reach.')
+        parser.add_argument('--repetitions', type=int, default=5, help='Timed fetches per reported page.')
+
+    def handle(self, *args, **options):
+        checkpoints = sorted({1, 10, 100, options['pages']} | {page for page in (250, 500) if page < options['pages']})
+        with benchmark_database():
+            seed_plays(options['rows'])
+            client = Client()
+            url = reverse('plays-list')
+
+            self.stdout.write(f"{'page':>6}  {'median ms':>10}")
+            for page in range(1, options['pages'] + 1):
+                if page in checkpoints:
+                    timings = measure(lambda: client.get(url), options['repetitions'])
+                    self.stdout.write(f'{page:>6}  {median_ms(timings):>10.2f}')
+                next_url = client.get(url).json()['next']
+                if next_url is None:
+                    if page < options['pages']:
+                        self.stderr.write(f'History ran out after {page} pages; seed more rows.')
+                    break
+                url = next_url
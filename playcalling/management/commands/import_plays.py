@@ -0,0 +1,53 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playcalling.importer import FORMATS, detect_format, import_plays, open_log, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSON Lines play log into the play history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Play log to import, or "-" for standard input.')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (defaults to the file extension).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk insert transaction.')
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Fill missing recommendation columns from the recommendation engine.',
+        )
+        parser.add_argument('--organization', default='', help='Store the plays for this organization.')
+        parser.add_argument(
+            '--reject-file',
+            help='Write invalid rows with their errors to this JSON Lines file.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        reject_file = open(options['reject_file'], 'w', encoding='utf-8') if options['reject_file'] else None
+
+        def reject(line_number, row, errors):
+            if reject_file is not None:
+                reject_file.write(json.dumps({'line': line_number, 'row': row, 'errors': errors}, default=str) + '\n')
+
+        try:
+            stream = open_log(sys.stdin.buffer if path == '-' else open(path, 'rb'))
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        try:
+            with stream:
+                result = import_plays(
+                    read_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    backfill=options['backfill'],
+                    reject=reject,
+                    organization=options['organization'],
+                )
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.imported} plays, rejected {result.rejected}.'))
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playcalling.models import RulePack
+from playcalling.rulepacks import RulePackError, compile_pack
+
+
+class Command(BaseCommand):
+    help = (
+        'Validate a JSON rule pack and store it as a RulePack. Running workers '
+        'pick it up without a restart.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON rule pack (see playcalling/packs/default.json).')
+        parser.add_argument('--name', help='Pack name; defaults to the "name" in the file.')
+        parser.add_argument('--team', default='', help='Use the pack for this team\'s games.')
+        parser.add_argument('--inactive', action='store_true', help='Store the pack without using it.')
+        parser.add_argument('--check', action='store_true', help='Only validate the file.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8') as handle:
+                definition = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+        try:
+            compiled = compile_pack(definition)
+        except RulePackError as exc:
+            raise CommandError(f'Invalid rule pack: {exc}')
+
+        applicable = sum(map(len, compiled.index)) / len(compiled.index)
+        summary = f"{len(definition['rules'])} rules, {applicable:.1f} applicable per situation on average"
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS(f'Valid: {summary}.'))
+            return
+
+        name = options['name'] or definition.get('name')
+        if not name:
+            raise CommandError('Give the pack a name with --name or a "name" in the file.')
+        pack, created = RulePack.objects.update_or_create(
+            name=name,
+            defaults={'team': options['team'], 'definition': definition, 'active': not options['inactive']},
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Created' if created else 'Updated'} rule pack {pack} ({summary}, digest {compiled.digest})."
+        ))
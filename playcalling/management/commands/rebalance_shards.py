@@ -0,0 +1,71 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from playcalling.models import GamePlay
+from playcalling.sharding import database_for, shard_databases
+
+
+class Command(BaseCommand):
+    help = (
+        'Migrate every play history database, then move plays in batches to the database '
+        'of their organization (PLAYCALLING_SHARDS). Moved plays get new ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Plays moved per transaction.')
+        parser.add_argument('--skip-migrate', action='store_true', help='Do not run migrate on the databases first.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many plays would move.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        databases = shard_databases()
+        if not options['skip_migrate'] and not options['dry_run']:
+            for alias in databases:
+                call_command('migrate', database=alias, interactive=False, verbosity=max(options['verbosity'] - 1, 0))
+
+        moved = 0
+        for source in databases:
+            organizations = (
+                GamePlay.objects.using(source).order_by().values_list('organization', flat=True).distinct()
+            )
+            for organization in list(organizations):
+                target = database_for(organization)
+                if target == source:
+                    continue
+                plays = GamePlay.objects.using(source).filter(organization=organization)
+                if options['dry_run']:
+                    count = plays.count()
+                else:
+                    count = self._move(plays, source, target, options['batch_size'])
+                moved += count
+                self.stdout.write(
+                    f"{'Would move' if options['dry_run'] else 'Moved'} {count} plays of "
+                    f"{organization or '(no organization)'} from {source} to {target}."
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would move' if options['dry_run'] else 'Moved'} {moved} plays across {len(databases)} databases."
+        ))
+
+    def _move(self, plays, source, target, batch_size):
+        """
+        Copy a batch into ``target`` and delete it from ``source``. The target
+        commits first, so an interruption can duplicate a batch but never lose one.
+        """
+        moved = 0
+        while True:
+            # The texts come along so the target can intern them in its own table.
+            batch = list(plays.select_related('recommendation_text').order_by('id')[:batch_size])
+            if not batch:
+                return moved
+            ids = [play.pk for play in batch]
+            for play in batch:
+                play.pk = None
+                play._state.adding = True
+                play._state.db = None
+            with transaction.atomic(using=source), transaction.atomic(using=target):
+                GamePlay.objects.using(target).bulk_create(batch)
+                # A model delete, so the source summary is decremented through the signals.
+                GamePlay.objects.using(source).filter(pk__in=ids).delete()
+            moved += len(batch)
@@ -0,0 +1,33 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from playcalling.history import OUTCOME_CLASSES, history_engine_options, rebuild_history_table, table_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the history engine's outcome table from the situation summary, "
+        'rewriting the memory-mapped file in place when one is configured.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        table = rebuild_history_table()
+        elapsed = time.perf_counter() - started
+
+        counts = np.asarray(table.counts)
+        per_pitch = counts.sum(axis=(0, 2))
+        directory = history_engine_options()['table_dir']
+        location = table_path(directory, table.pitches) if directory else 'process memory'
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {int(counts.sum())} outcomes in {elapsed * 1000:.1f} ms ({location}).'
+        ))
+        for pitch, total in zip(table.pitches, per_pitch):
+            self.stdout.write(f'  {int(total):>8}  {pitch}')
+        by_class = counts.sum(axis=(0, 1))
+        self.stdout.write('  ' + ', '.join(f'{name}: {int(total)}' for name, total in zip(OUTCOME_CLASSES, by_class)))
+        if getattr(settings, 'PLAYCALLING_ENGINE', 'rules') != 'history':
+            self.stdout.write("PLAYCALLING_ENGINE is not 'history'; the table is not used for recommendations.")
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playcalling.benchmarking import benchmark_database, seed_plays, synthetic_sequence
+from playcalling.runexpectancy import (
+    RunExpectancy,
+    load_sequence,
+    rebuild_run_expectancy,
+    run_expectancy_options,
+)
+from playcalling.situations import BASE_STATES, base_out_state_label
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the RE24 and count-aware run expectancy matrices from the play '
+        'history and write the artifact, or time the computation with --benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Artifact to write; defaults to PLAYCALLING_RUN_EXPECTANCY["path"].')
+        parser.add_argument(
+            '--if-stale',
+            action='store_true',
+            help='Keep the existing artifact when no play was added, changed or deleted since it was built.',
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            metavar='ROWS',
+            help='Time the computation on ROWS synthetic plays instead of rebuilding.',
+        )
+        parser.add_argument(
+            '--from-database',
+            action='store_true',
+            help='With --benchmark, seed a throwaway database and include loading the plays in the timing.',
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options['benchmark'], options['from_database'])
+            return
+
+        path = options['path'] or run_expectancy_options()['path']
+        started = time.perf_counter()
+        artifact, rebuilt = rebuild_run_expectancy(path, if_stale=options['if_stale'])
+        elapsed = time.perf_counter() - started
+        if not rebuilt:
+            self.stdout.write(f'{path} is current (version {artifact.version}); nothing to do.')
+            return
+        location = path or 'not saved; set PLAYCALLING_RUN_EXPECTANCY["path"] or pass --path'
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed run expectancy from {int(artifact.plays.sum())} plays in {elapsed * 1000:.1f} ms "
+            f"(version {artifact.version}, {location})."
+        ))
+        self._write_matrix(artifact)
+
+    def _benchmark(self, rows, from_database):
+        if rows < 1:
+            raise CommandError('--benchmark needs at least one row.')
+        if from_database:
+            with benchmark_database():
+                seed_plays(rows)
+                started = time.perf_counter()
+                columns = load_sequence()
+                loaded = time.perf_counter()
+                self.stdout.write(f'load      {rows:>10} plays  {(loaded - started) * 1000:>10.1f} ms')
+        else:
+            columns = synthetic_sequence(rows)
+        started = time.perf_counter()
+        artifact = RunExpectancy.from_sequence(columns)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'compute   {rows:>10} plays  {elapsed * 1000:>10.1f} ms  '
+            f'({rows / elapsed if elapsed else 0:,.0f} plays/s)'
+        )
+        self._write_matrix(artifact)
+
+    def _write_matrix(self, artifact):
+        matrix = artifact.matrix()
+        self.stdout.write('  ' + ' ' * 8 + ''.join(f'{outs} out'.rjust(7) for outs in range(3)))
+        for state in range(BASE_STATES):
+            cells = ''.join(f'{matrix[outs * BASE_STATES + state]:>7.2f}' for outs in range(3))
+            label = base_out_state_label(state).split(', ')[1]
+            self.stdout.write(f'  {label:<8}{cells}')
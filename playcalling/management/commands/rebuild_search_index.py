@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from playcalling.search import rebuild_search_index
+from playcalling.sharding import play_databases
+
+
+class Command(BaseCommand):
+    help = 'Create the play full-text index where it is missing and re-index every play in every play database.'
+
+    def handle(self, *args, **options):
+        for alias in play_databases():
+            rebuild_search_index(connections[alias])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the play search index in {alias}.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from playcalling.analytics import rebuild_summary
+from playcalling.sharding import play_databases
+
+
+class Command(BaseCommand):
+    help = 'Recompute the situation/outcome summary table from the play history in every play database.'
+
+    def handle(self, *args, **options):
+        for alias in play_databases():
+            rows = rebuild_summary(alias)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} situation outcome rows in {alias}.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playcalling.replicas import replica_options, sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy each primary SQLite database onto its replica (PLAYCALLING_REPLICAS) with the '
+        'online backup API. For local setups; production replicas use the database\'s replication.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep copying every INTERVAL seconds until interrupted.',
+        )
+
+    def handle(self, *args, **options):
+        databases = replica_options()['databases']
+        if not databases:
+            raise CommandError('No replicas configured; set PLAYCALLING_REPLICAS["databases"].')
+        try:
+            while True:
+                for primary, replica in databases.items():
+                    try:
+                        elapsed = sync_replica(primary, replica)
+                    except ValueError as exc:
+                        raise CommandError(str(exc))
+                    self.stdout.write(self.style.SUCCESS(f'Copied {primary} to {replica} in {elapsed * 1000:.1f} ms.'))
+                if options['interval'] is None:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['-created_at', '-id'], name='gameplay_created_id_idx'),
+        ),
+    ]
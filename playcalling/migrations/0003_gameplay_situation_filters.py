@@ -0,0 +1,52 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:24
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+def populate_base_out_state(apps, schema_editor):
+    GamePlay = apps.get_model('playcalling', 'GamePlay')
+    GamePlay.objects.update(
+        base_out_state=(
+            F('outs') * 8
+            + Case(When(runners_on_first=True, then=Value(1)), default=Value(0))
+            + Case(When(runners_on_second=True, then=Value(2)), default=Value(0))
+            + Case(When(runners_on_third=True, then=Value(4)), default=Value(0))
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0002_gameplay_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameplay',
+            name='base_out_state',
+            field=models.PositiveSmallIntegerField(choices=[(0, '0 out, empty'), (1, '0 out, 1'), (2, '0 out, 2'), (3, '0 out, 1-2'), (4, '0 out, 3'), (5, '0 out, 1-3'), (6, '0 out, 2-3'), (7, '0 out, 1-2-3'), (8, '1 out, empty'), (9, '1 out, 1'), (10, '1 out, 2'), (11, '1 out, 1-2'), (12, '1 out, 3'), (13, '1 out, 1-3'), (14, '1 out, 2-3'), (15, '1 out, 1-2-3'), (16, '2 out, empty'), (17, '2 out, 1'), (18, '2 out, 2'), (19, '2 out, 1-2'), (20, '2 out, 3'), (21, '2 out, 1-3'), (22, '2 out, 2-3'), (23, '2 out, 1-2-3')], default=0, editable=False, help_text='Outs and runners packed as outs * 8 + base mask (first=1, second=2, third=4).'),
+        ),
+        migrations.RunPython(populate_base_out_state, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['base_out_state', 'balls', 'strikes', '-created_at'], name='gameplay_situation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['inning', 'half_inning'], name='gameplay_inning_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['offense_team', '-created_at'], name='gameplay_offense_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['defense_team', '-created_at'], name='gameplay_defense_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['generated_from_engine', '-created_at'], name='gameplay_engine_idx'),
+        ),
+    ]
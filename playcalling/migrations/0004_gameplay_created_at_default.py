@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0003_gameplay_situation_filters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameplay',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0004_gameplay_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SituationOutcomeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_out_state', models.PositiveSmallIntegerField(choices=[(0, '0 out, empty'), (1, '0 out, 1'), (2, '0 out, 2'), (3, '0 out, 1-2'), (4, '0 out, 3'), (5, '0 out, 1-3'), (6, '0 out, 2-3'), (7, '0 out, 1-2-3'), (8, '1 out, empty'), (9, '1 out, 1'), (10, '1 out, 2'), (11, '1 out, 1-2'), (12, '1 out, 3'), (13, '1 out, 1-3'), (14, '1 out, 2-3'), (15, '1 out, 1-2-3'), (16, '2 out, empty'), (17, '2 out, 1'), (18, '2 out, 2'), (19, '2 out, 1-2'), (20, '2 out, 3'), (21, '2 out, 1-3'), (22, '2 out, 2-3'), (23, '2 out, 1-2-3')])),
+                ('balls', models.PositiveSmallIntegerField()),
+                ('strikes', models.PositiveSmallIntegerField()),
+                ('recommended_pitch', models.CharField(blank=True, max_length=128)),
+                ('outcome', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['base_out_state', 'balls', 'strikes', 'recommended_pitch', '-count'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='situationoutcomesummary',
+            constraint=models.UniqueConstraint(fields=('base_out_state', 'balls', 'strikes', 'recommended_pitch', 'outcome'), name='situation_outcome_unique'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0005_situation_outcome_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offense_team', models.CharField(max_length=128)),
+                ('defense_team', models.CharField(max_length=128)),
+                ('inning', models.PositiveSmallIntegerField(default=1)),
+                ('half_inning', models.CharField(choices=[('top', 'Top'), ('bottom', 'Bottom')], default='top', max_length=6)),
+                ('outs', models.PositiveSmallIntegerField(default=0)),
+                ('balls', models.PositiveSmallIntegerField(default=0)),
+                ('strikes', models.PositiveSmallIntegerField(default=0)),
+                ('runners_on_first', models.BooleanField(default=False)),
+                ('runners_on_second', models.BooleanField(default=False)),
+                ('runners_on_third', models.BooleanField(default=False)),
+                ('score_difference', models.IntegerField(default=0, help_text='Offense score minus defense score.')),
+                ('context_notes', models.TextField(blank=True)),
+                ('save_to_history', models.BooleanField(default=False, help_text='Store the recommendation for every event in the play history.')),
+                ('version', models.PositiveIntegerField(default=0, help_text='Number of events applied.')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
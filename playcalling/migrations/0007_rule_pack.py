@@ -0,0 +1,33 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0006_game_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RulePack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=64, unique=True)),
+                ('team', models.CharField(blank=True, help_text='Use this pack for games of this team (defense first, then offense). Blank: not team-specific.', max_length=128)),
+                ('definition', models.JSONField(help_text='Defaults and ordered rules.')),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rulepack',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True), models.Q(('team', ''), _negated=True)), fields=('team',), name='rulepack_one_active_per_team'),
+        ),
+    ]
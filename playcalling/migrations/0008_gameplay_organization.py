@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0007_rule_pack'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameplay',
+            name='organization',
+            field=models.SlugField(blank=True, db_index=False, help_text='Owning organization; selects the database the play is stored in (see sharding.py).', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='gameplay',
+            index=models.Index(fields=['organization', '-created_at'], name='gameplay_organization_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    # The index as this migration introduced it; 0012 replaces it.
+    from playcalling.search import install_legacy_search_index
+
+    install_legacy_search_index(schema_editor.connection)
+
+
+def drop(apps, schema_editor):
+    from playcalling.search import drop_search_index
+
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Full-text index over the play text columns; see playcalling/search.py."""
+
+    dependencies = [
+        ('playcalling', '0008_gameplay_organization'),
+    ]
+
+    operations = [
+        # The hint lets shard databases, which only hold the history tables, run it too.
+        migrations.RunPython(install, drop, hints={'model_name': 'gameplay'}),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def restore_legacy_index(apps, schema_editor):
+    # Removing the column rebuilds the SQLite play table, which drops the index triggers.
+    from playcalling.search import install_legacy_search_index
+
+    install_legacy_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playcalling', '0009_gameplay_search_index'),
+    ]
+
+    operations = [
+        # Reversed last, after the play table is back to its 0009 shape.
+        migrations.RunPython(migrations.RunPython.noop, restore_legacy_index, hints={'model_name': 'gameplay'}),
+        migrations.CreateModel(
+            name='RecommendationText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='SHA-256 of the texts.', max_length=64, unique=True)),
+                ('recommended_pitch', models.CharField(blank=True, max_length=128)),
+                ('defensive_alignment', models.JSONField(blank=True, default=dict)),
+                ('catcher_instructions', models.TextField(blank=True)),
+                ('offensive_sign', models.TextField(blank=True)),
+                ('runner_instructions', models.TextField(blank=True)),
+            ],
+        ),
+        # Nullable until 0011 has pointed every existing play at its texts.
+        migrations.AddField(
+            model_name='gameplay',
+            name='recommendation_text',
+            field=models.ForeignKey(editable=False, help_text='Interned recommendation texts; read and set them through the attributes below.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='playcalling.recommendationtext'),
+        ),
+    ]
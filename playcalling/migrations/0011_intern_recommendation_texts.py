@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+TEXT_FIELDS = (
+    'recommended_pitch',
+    'defensive_alignment',
+    'catcher_instructions',
+    'offensive_sign',
+    'runner_instructions',
+)
+CHUNK_SIZE = 2000
+# Ids per UPDATE, well below SQLite's limit on query parameters.
+UPDATE_BATCH_SIZE = 1000
+
+
+def _update(plays, pending):
+    for text_id, ids in pending.items():
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            plays.filter(pk__in=ids[start:start + UPDATE_BATCH_SIZE]).update(recommendation_text_id=text_id)
+    pending.clear()
+
+
+def intern_texts(apps, schema_editor):
+    from playcalling.interning import text_digest
+
+    alias = schema_editor.connection.alias
+    GamePlay = apps.get_model('playcalling', 'GamePlay')
+    RecommendationText = apps.get_model('playcalling', 'RecommendationText')
+    plays = GamePlay.objects.using(alias)
+    texts = RecommendationText.objects.using(alias)
+    text_ids = {}
+    pending = defaultdict(list)
+    rows = plays.filter(recommendation_text__isnull=True).order_by('id').values_list('id', *TEXT_FIELDS)
+    for count, (pk, *values) in enumerate(rows.iterator(chunk_size=CHUNK_SIZE), 1):
+        values = dict(zip(TEXT_FIELDS, values))
+        digest = text_digest(values)
+        if digest not in text_ids:
+            text_ids[digest] = texts.get_or_create(digest=digest, defaults=values)[0].pk
+        pending[text_ids[digest]].append(pk)
+        if count % CHUNK_SIZE == 0:
+            _update(plays, pending)
+    _update(plays, pending)
+
+
+def restore_texts(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    GamePlay = apps.get_model('playcalling', 'GamePlay')
+    RecommendationText = apps.get_model('playcalling', 'RecommendationText')
+    for text in RecommendationText.objects.using(alias).iterator():
+        GamePlay.objects.using(alias).filter(recommendation_text=text).update(
+            **{field: getattr(text, field) for field in TEXT_FIELDS}
+        )
+
+
+class Migration(migrations.Migration):
+    """Point every play at the interned row of its recommendation texts."""
+
+    dependencies = [
+        ('playcalling', '0010_recommendation_text'),
+    ]
+
+    operations = [
+        # The hint lets shard databases, which only hold the history tables, run it too.
+        migrations.RunPython(intern_texts, restore_texts, hints={'model_name': 'gameplay'}),
+    ]
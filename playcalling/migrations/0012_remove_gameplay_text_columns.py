@@ -0,0 +1,62 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def drop_index(apps, schema_editor):
+    from playcalling.search import drop_search_index
+
+    drop_search_index(schema_editor.connection)
+
+
+def restore_legacy_index(apps, schema_editor):
+    # Runs once the text columns are back; 0011's reverse then fills them through the triggers.
+    from playcalling.search import install_legacy_search_index
+
+    install_legacy_search_index(schema_editor.connection)
+
+
+def rebuild_index(apps, schema_editor):
+    from playcalling.search import rebuild_search_index
+
+    rebuild_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Drop the play text columns; search now indexes RecommendationText too (see playcalling/search.py)."""
+
+    dependencies = [
+        ('playcalling', '0011_intern_recommendation_texts'),
+    ]
+
+    operations = [
+        # The old index reads the columns being removed; PostgreSQL refuses to drop them under it.
+        migrations.RunPython(drop_index, restore_legacy_index, hints={'model_name': 'gameplay'}),
+        migrations.RemoveField(
+            model_name='gameplay',
+            name='catcher_instructions',
+        ),
+        migrations.RemoveField(
+            model_name='gameplay',
+            name='defensive_alignment',
+        ),
+        migrations.RemoveField(
+            model_name='gameplay',
+            name='offensive_sign',
+        ),
+        migrations.RemoveField(
+            model_name='gameplay',
+            name='recommended_pitch',
+        ),
+        migrations.RemoveField(
+            model_name='gameplay',
+            name='runner_instructions',
+        ),
+        migrations.AlterField(
+            model_name='gameplay',
+            name='recommendation_text',
+            field=models.ForeignKey(editable=False, help_text='Interned recommendation texts; read and set them through the attributes below.', on_delete=django.db.models.deletion.PROTECT, related_name='+', to='playcalling.recommendationtext'),
+        ),
+        migrations.RunPython(rebuild_index, drop_index, hints={'model_name': 'gameplay'}),
+    ]
@@ -1,5 +1,84 @@
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .situations import BASE_OUT_STATES, base_out_state_label, pack_base_out_state
+
+
+# GamePlay attributes stored once per distinct value in RecommendationText.
+RECOMMENDATION_TEXT_FIELDS = (
+    'recommended_pitch',
+    'defensive_alignment',
+    'catcher_instructions',
+    'offensive_sign',
+    'runner_instructions',
+)
+
+
+def blank_recommendation_texts():
+    return {field: {} if field == 'defensive_alignment' else '' for field in RECOMMENDATION_TEXT_FIELDS}
+
+
+def play_lookups(fields):
+    """ORM lookups for ``GamePlay`` attribute names, following the recommendation texts to their table."""
+    return [f'recommendation_text__{field}' if field in RECOMMENDATION_TEXT_FIELDS else field for field in fields]
+
+
+class RecommendationText(models.Model):
+    """
+    One distinct set of recommendation texts, shared by every play that
+    received it (see ``interning.py``). Rows are never changed or deleted.
+    """
+
+    digest = models.CharField(max_length=64, unique=True, help_text='SHA-256 of the texts.')
+    recommended_pitch = models.CharField(max_length=128, blank=True)
+    defensive_alignment = models.JSONField(default=dict, blank=True)
+    catcher_instructions = models.TextField(blank=True)
+    offensive_sign = models.TextField(blank=True)
+    runner_instructions = models.TextField(blank=True)
+
+    def texts(self):
+        return {field: getattr(self, field) for field in RECOMMENDATION_TEXT_FIELDS}
+
+    def __str__(self) -> str:
+        return self.recommended_pitch or self.digest[:12]
+
+
+def _text_property(field):
+    def getter(self):
+        return self.recommendation_texts()[field]
+
+    def setter(self, value):
+        self._pending_texts = {**self.recommendation_texts(), field: value}
+
+    return property(getter, setter, doc=f'``{field}`` of the play\'s ``RecommendationText``.')
+
+
+class GamePlayQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        from .analytics import record_new_plays
+        from .interning import intern_play_texts
+
+        objs = list(objs)
+        for play in objs:
+            play.refresh_situation_fields()
+        if self._db is None:
+            # Plays of different organizations may belong in different databases.
+            groups = {}
+            for play in objs:
+                groups.setdefault(router.db_for_write(self.model, instance=play), []).append(play)
+            if len(groups) > 1 or (groups and self.db not in groups):
+                created = []
+                for alias, group in groups.items():
+                    with transaction.atomic(using=alias):
+                        created.extend(self.using(alias).bulk_create(group, *args, **kwargs))
+                return created
+        intern_play_texts(objs, self.db)
+        created = super().bulk_create(objs, *args, **kwargs)
+        # bulk_create sends no signals, so keep the outcome summary current here.
+        record_new_plays(created, using=self.db)
+        return created
 
 
 class GamePlay(models.Model):
@@ -9,7 +88,15 @@ class GamePlay(models.Model):
         ('top', 'Top'),
         ('bottom', 'Bottom'),
     ]
+    BASE_OUT_STATE_CHOICES = [(state, base_out_state_label(state)) for state in range(BASE_OUT_STATES)]
 
+    organization = models.SlugField(
+        max_length=64,
+        blank=True,
+        # Covered by gameplay_organization_idx.
+        db_index=False,
+        help_text='Owning organization; selects the database the play is stored in (see sharding.py).',
+    )
     offense_team = models.CharField(max_length=128)
     defense_team = models.CharField(max_length=128)
     inning = models.PositiveSmallIntegerField(default=1)
@@ -29,28 +116,111 @@ class GamePlay(models.Model):
     runners_on_first = models.BooleanField(default=False)
     runners_on_second = models.BooleanField(default=False)
     runners_on_third = models.BooleanField(default=False)
+    base_out_state = models.PositiveSmallIntegerField(
+        choices=BASE_OUT_STATE_CHOICES,
+        default=0,
+        editable=False,
+        help_text='Outs and runners packed as outs * 8 + base mask (first=1, second=2, third=4).',
+    )
     score_difference = models.IntegerField(
         default=0,
         help_text='Offense score minus defense score before the play.',
     )
     context_notes = models.TextField(blank=True)
 
-    recommended_pitch = models.CharField(max_length=128, blank=True)
-    defensive_alignment = models.JSONField(default=dict, blank=True)
-    catcher_instructions = models.TextField(blank=True)
-    offensive_sign = models.TextField(blank=True)
-    runner_instructions = models.TextField(blank=True)
+    recommendation_text = models.ForeignKey(
+        RecommendationText,
+        on_delete=models.PROTECT,
+        related_name='+',
+        editable=False,
+        help_text='Interned recommendation texts; read and set them through the attributes below.',
+    )
+    recommended_pitch = _text_property('recommended_pitch')
+    defensive_alignment = _text_property('defensive_alignment')
+    catcher_instructions = _text_property('catcher_instructions')
+    offensive_sign = _text_property('offensive_sign')
+    runner_instructions = _text_property('runner_instructions')
     actual_outcome = models.TextField(blank=True)
 
     generated_from_engine = models.BooleanField(
         default=False,
         help_text='True when this record was created from the recommendation engine.',
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so imports can keep source timestamps.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = GamePlayQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the play history walks (created_at, id).
+            models.Index(fields=['-created_at', '-id'], name='gameplay_created_id_idx'),
+            # Situation filters on the history API and admin.
+            models.Index(fields=['base_out_state', 'balls', 'strikes', '-created_at'], name='gameplay_situation_idx'),
+            models.Index(fields=['inning', 'half_inning'], name='gameplay_inning_idx'),
+            models.Index(fields=['offense_team', '-created_at'], name='gameplay_offense_idx'),
+            models.Index(fields=['defense_team', '-created_at'], name='gameplay_defense_idx'),
+            models.Index(fields=['generated_from_engine', '-created_at'], name='gameplay_engine_idx'),
+            models.Index(fields=['organization', '-created_at'], name='gameplay_organization_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .analytics import snapshot_summary_key
+
+        instance = super().from_db(db, field_names, values)
+        snapshot_summary_key(instance)
+        return instance
+
+    # Texts assigned since the play was loaded; interned when it is saved.
+    _pending_texts = None
+
+    def loaded_recommendation_texts(self):
+        """The play's recommendation texts if they are known without a query, else None."""
+        if self._pending_texts is not None:
+            return self._pending_texts
+        if self.recommendation_text_id is None:
+            return blank_recommendation_texts()
+        if GamePlay.recommendation_text.is_cached(self):
+            return self.recommendation_text.texts()
+        from .interning import cached_text
+
+        text = cached_text(self._state.db, self.recommendation_text_id)
+        if text is None:
+            return None
+        GamePlay.recommendation_text.field.set_cached_value(self, text)
+        return text.texts()
+
+    def recommendation_texts(self):
+        """``RECOMMENDATION_TEXT_FIELDS`` -> value; prefetch ``recommendation_text`` when loading many plays."""
+        texts = self.loaded_recommendation_texts()
+        return texts if texts is not None else self.recommendation_text.texts()
+
+    def refresh_situation_fields(self) -> None:
+        """Recompute columns derived from the situation (``bulk_create`` skips ``save``)."""
+        self.base_out_state = pack_base_out_state(
+            self.outs,
+            self.runners_on_first,
+            self.runners_on_second,
+            self.runners_on_third,
+        )
+
+    def save(self, *args, **kwargs):
+        from .interning import intern_play_texts
+
+        self.refresh_situation_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            texts = set(update_fields) & set(RECOMMENDATION_TEXT_FIELDS)
+            kwargs['update_fields'] = {
+                *(set(update_fields) - texts),
+                'base_out_state',
+                *(['recommendation_text'] if texts else []),
+            }
+        intern_play_texts([self], kwargs.get('using') or router.db_for_write(type(self), instance=self))
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         base_state = ''.join([
@@ -62,3 +232,116 @@ class GamePlay(models.Model):
             f"{self.offense_team} vs {self.defense_team} | "
             f"{self.half_inning.title()} {self.inning} | Outs: {self.outs} | Bases: {base_state}"
         )
+
+
+class SituationOutcomeSummary(models.Model):
+    """
+    Running count of recorded outcomes per situation and recommended pitch.
+
+    Maintained incrementally from ``GamePlay`` writes (see ``analytics.py``) so
+    that historical questions never have to scan the play table.
+    """
+
+    base_out_state = models.PositiveSmallIntegerField(choices=GamePlay.BASE_OUT_STATE_CHOICES)
+    balls = models.PositiveSmallIntegerField()
+    strikes = models.PositiveSmallIntegerField()
+    recommended_pitch = models.CharField(max_length=128, blank=True)
+    outcome = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['base_out_state', 'balls', 'strikes', 'recommended_pitch', '-count']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['base_out_state', 'balls', 'strikes', 'recommended_pitch', 'outcome'],
+                name='situation_outcome_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.get_base_out_state_display()} {self.balls}-{self.strikes} | "
+            f"{self.recommended_pitch or 'no pitch'} | {self.outcome}: {self.count}"
+        )
+
+
+class GameSession(models.Model):
+    """
+    Current situation of a game tracked server-side, advanced by pitch events.
+
+    ``version`` counts applied events and guards concurrent updates; see
+    ``gamesessions.py`` for the in-memory store in front of this table.
+    """
+
+    offense_team = models.CharField(max_length=128)
+    defense_team = models.CharField(max_length=128)
+    inning = models.PositiveSmallIntegerField(default=1)
+    half_inning = models.CharField(max_length=6, choices=GamePlay.HALF_INNING_CHOICES, default='top')
+    outs = models.PositiveSmallIntegerField(default=0)
+    balls = models.PositiveSmallIntegerField(default=0)
+    strikes = models.PositiveSmallIntegerField(default=0)
+    runners_on_first = models.BooleanField(default=False)
+    runners_on_second = models.BooleanField(default=False)
+    runners_on_third = models.BooleanField(default=False)
+    score_difference = models.IntegerField(
+        default=0,
+        help_text='Offense score minus defense score.',
+    )
+    context_notes = models.TextField(blank=True)
+    save_to_history = models.BooleanField(
+        default=False,
+        help_text='Store the recommendation for every event in the play history.',
+    )
+    version = models.PositiveIntegerField(default=0, help_text='Number of events applied.')
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self) -> str:
+        return (
+            f"{self.offense_team} vs {self.defense_team} | "
+            f"{self.half_inning.title()} {self.inning} | {self.balls}-{self.strikes}, {self.outs} out"
+        )
+
+
+class RulePack(models.Model):
+    """
+    Recommendation rules stored as data (see ``rulepacks.py`` for the format).
+
+    The pack named by ``PLAYCALLING_RULE_PACKS['default']`` replaces the
+    shipped default pack; a pack with a ``team`` is used for that team's games.
+    """
+
+    name = models.SlugField(max_length=64, unique=True)
+    team = models.CharField(
+        max_length=128,
+        blank=True,
+        help_text='Use this pack for games of this team (defense first, then offense). Blank: not team-specific.',
+    )
+    definition = models.JSONField(help_text='Defaults and ordered rules.')
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['team'],
+                condition=models.Q(active=True) & ~models.Q(team=''),
+                name='rulepack_one_active_per_team',
+            ),
+        ]
+
+    def clean(self):
+        from .rulepacks import RulePackError, compile_pack
+
+        try:
+            compile_pack(self.definition)
+        except RulePackError as exc:
+            raise ValidationError({'definition': str(exc)})
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.team})" if self.team else self.name
@@ -0,0 +1,166 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PlayHistoryCursorPagination(BasePagination):
+    """
+    Keyset pagination over ``(created_at, id)``, newest first.
+
+    Each page is fetched with an indexed range scan starting at the cursor
+    position, so deep pages cost the same as the first one. Cursors are opaque
+    base64 tokens holding the boundary row and the direction of travel.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self):
+        return getattr(settings, 'PLAYCALLING_HISTORY_PAGE_SIZE', 50)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, cursor = self._page_queryset(queryset, request)
+        return self._finish_page(list(queryset), cursor)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching the page with async iteration."""
+        queryset, cursor = self._page_queryset(queryset, request)
+        return self._finish_page([play async for play in queryset], cursor)
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size()
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).exclude(
+                    Q(created_at=created_at) & Q(id__lte=pk)
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).exclude(
+                    Q(created_at=created_at) & Q(id__gte=pk)
+                ).order_by('-created_at', '-id')
+        return queryset[:self.page_size + 1], cursor
+
+    def _finish_page(self, results, cursor):
+        reverse = cursor is not None and cursor[2]
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = cursor is not None, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_position = results[-1] if has_next and results else None
+        self.previous_position = results[0] if has_previous and results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            created_at = parse_datetime(tokens['c'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
+
+    def encode_cursor(self, play, reverse):
+        tokens = {'c': play.created_at.isoformat(), 'i': play.pk}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens, doseq=True).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class PlaySearchPagination(PlayHistoryCursorPagination):
+    """
+    Pages of ranked search results (``?q=``). Ranks are not a stable sort key
+    for keyset pagination, so the opaque cursor holds an offset instead.
+    """
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size()
+        encoded = request.query_params.get(self.cursor_query_param)
+        self.offset = 0
+        if encoded is not None:
+            try:
+                tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'))
+                self.offset = int(tokens['o'][0])
+            except (TypeError, ValueError, KeyError, UnicodeError):
+                raise NotFound(self.invalid_cursor_message)
+            if self.offset < 0:
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[self.offset:self.offset + self.page_size + 1], None
+
+    def _finish_page(self, results, cursor):
+        self.has_next = len(results) > self.page_size
+        return results[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._offset_link(self.offset + self.page_size)
+
+    def get_previous_link(self):
+        if self.offset == 0:
+            return None
+        return self._offset_link(max(self.offset - self.page_size, 0))
+
+    def _offset_link(self, offset):
+        encoded = b64encode(parse.urlencode({'o': offset}).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
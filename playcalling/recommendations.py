@@ -1,6 +1,18 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import hashlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+from .situations import (
+    BASE_OUT_COUNT_STATES,
+    COUNTS,
+    context_base_out_state,
+    pack_base_out_count,
+    pack_count,
+    unpack_base_out_state,
+    unpack_count,
+)
 
 
 def _high_leverage(inning: int, score_difference: int) -> bool:
@@ -16,6 +28,13 @@ def _base_state(context: Dict[str, object]) -> Dict[str, bool]:
     }
 
 
+def situation_header(context: Dict[str, object]) -> str:
+    return (
+        f"{str(context['half_inning']).title()} of the {int(context['inning'])} inning, "
+        f"count {int(context['balls'])}-{int(context['strikes'])} with {int(context['outs'])} out(s)."
+    )
+
+
 def generate_recommendation(context: Dict[str, object]) -> Dict[str, object]:
     """
     Produce a blended defensive and offensive plan given the current situation.
@@ -24,7 +43,6 @@ def generate_recommendation(context: Dict[str, object]) -> Dict[str, object]:
     or replace them with learned models.
     """
     inning = int(context['inning'])
-    half_inning = str(context['half_inning'])
     outs = int(context['outs'])
     balls = int(context['balls'])
     strikes = int(context['strikes'])
@@ -38,9 +56,7 @@ def generate_recommendation(context: Dict[str, object]) -> Dict[str, object]:
     }
     pitch_call = 'Four-seam fastball on the outer half.'
     catcher_plan = 'Set up on the outer third and be ready with a quick pop time.'
-    key_points: List[str] = [
-        f"{half_inning.title()} of the {inning} inning, count {balls}-{strikes} with {outs} out(s)."
-    ]
+    key_points: List[str] = [situation_header(context)]
 
     if strikes >= 2 and balls <= 1:
         pitch_call = 'Slider breaking off the plate to induce chase.'
@@ -126,3 +142,212 @@ def generate_recommendation(context: Dict[str, object]) -> Dict[str, object]:
         'offensive_signs': offensive_signs,
         'key_points': key_points,
     }
+
+
+# Precompiled engine -----------------------------------------------------------
+#
+# The rules above only look at outs, count, base state, leverage and the sign of
+# the score difference; the inning and half inning merely feed the header line.
+# That space is small enough (1,728 situations) to evaluate once and replace the
+# rule chain with a list lookup.
+
+DecisionEntry = Tuple[str, str, Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...], Tuple[str, ...]]
+
+DECISION_TABLE_SIZE = BASE_OUT_COUNT_STATES * 2 * 3
+
+
+def _score_sign(score_difference: int) -> int:
+    return (score_difference > 0) - (score_difference < 0)
+
+
+def pack_situation(
+    base_out_count: int,
+    high_leverage: bool,
+    score_sign: int,
+) -> int:
+    """Pack the engine inputs into an index of the decision table."""
+    return (base_out_count * 2 + int(high_leverage)) * 3 + score_sign + 1
+
+
+def situation_key(context: Dict[str, object]) -> int:
+    """Decision-table index for a request context."""
+    score_difference = int(context['score_difference'])
+    return pack_situation(
+        pack_base_out_count(
+            context_base_out_state(context),
+            pack_count(context['balls'], context['strikes']),
+        ),
+        _high_leverage(int(context['inning']), score_difference),
+        _score_sign(score_difference),
+    )
+
+
+def representative_context(key: int) -> Dict[str, object]:
+    """Smallest request context that maps onto the given decision-table index."""
+    rest, sign = divmod(key, 3)
+    base_out_count, leverage = divmod(rest, 2)
+    base_out_state, count = divmod(base_out_count, COUNTS)
+    outs, first, second, third = unpack_base_out_state(base_out_state)
+    balls, strikes = unpack_count(count)
+    return {
+        'inning': 7 if leverage else 1,
+        'half_inning': 'top',
+        'outs': outs,
+        'balls': balls,
+        'strikes': strikes,
+        'runners_on_first': first,
+        'runners_on_second': second,
+        'runners_on_third': third,
+        'score_difference': sign - 1,
+    }
+
+
+def _compile_entry(recommendation: Dict[str, object]) -> DecisionEntry:
+    return (
+        recommendation['pitch_call'],
+        recommendation['catcher_plan'],
+        tuple(recommendation['defensive_alignment'].items()),
+        tuple(recommendation['offensive_signs'].items()),
+        # The header is the only situation-specific line and is never
+        # duplicated by the rules, so it is safe to drop and re-add later.
+        tuple(recommendation['key_points'][1:]),
+    )
+
+
+def build_decision_table(
+    engine: Callable[[Dict[str, object]], Dict[str, object]] = generate_recommendation,
+) -> List[DecisionEntry]:
+    """Evaluate ``engine`` once for every packed situation."""
+    return [_compile_entry(engine(representative_context(key))) for key in range(DECISION_TABLE_SIZE)]
+
+
+@lru_cache(maxsize=None)
+def decision_table() -> Tuple[DecisionEntry, ...]:
+    return tuple(build_decision_table())
+
+
+def lookup_recommendation(context: Dict[str, object]) -> Dict[str, object]:
+    """
+    Same contract and output as ``generate_recommendation`` backed by the
+    precompiled decision table.
+    """
+    pitch_call, catcher_plan, alignment, signs, key_points = decision_table()[situation_key(context)]
+    return {
+        'pitch_call': pitch_call,
+        'catcher_plan': catcher_plan,
+        'defensive_alignment': dict(alignment),
+        'offensive_signs': dict(signs),
+        'key_points': [situation_header(context), *key_points],
+    }
+
+
+def _history_recommendation(context: Dict[str, object]) -> Dict[str, object]:
+    # Imported on first use: the history engine needs the ORM and NumPy.
+    from .history import history_recommendation
+
+    return history_recommendation(context)
+
+
+def _rule_pack_recommendation(context: Dict[str, object]) -> Dict[str, object]:
+    # Imported on first use: rule packs are stored in the database.
+    from .rulepacks import rule_pack_recommendation
+
+    return rule_pack_recommendation(context)
+
+
+ENGINES: Dict[str, Callable[[Dict[str, object]], Dict[str, object]]] = {
+    'rules': generate_recommendation,
+    'precompiled': lookup_recommendation,
+    'history': _history_recommendation,
+    'packs': _rule_pack_recommendation,
+}
+
+# Engines whose answer depends only on the request and ``engine_cache_key``,
+# so responses can be cached.
+DETERMINISTIC_ENGINES = frozenset({'rules', 'precompiled', 'packs'})
+
+
+def get_engine(name: str) -> Callable[[Dict[str, object]], Dict[str, object]]:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown recommendation engine {name!r}; choose from {sorted(ENGINES)}.") from None
+
+
+@lru_cache(maxsize=None)
+def engine_fingerprint(name: str) -> str:
+    """
+    Short hash of everything an engine can answer, for cache keys and ETags.
+
+    Changes whenever the rules produce a different recommendation anywhere.
+    """
+    engine = get_engine(name)
+    digest = hashlib.sha256(repr(build_decision_table(engine)).encode('utf-8'))
+    digest.update(situation_header(representative_context(0)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def engine_cache_key(name: str, context: Dict[str, object]) -> str:
+    """
+    Identifies the answers ``name`` gives, for cache keys: the engine
+    fingerprint, or for rule packs the digest of the pack that answers ``context``.
+    """
+    if name == 'packs':
+        from .rulepacks import pack_cache_key
+
+        return pack_cache_key(context)
+    return engine_fingerprint(name)
+
+
+# Engines whose every answer is in their decision table: the inputs are the
+# packed situation plus the header line. Rule packs and the history engine can
+# also read the inning, the size of the lead or recorded outcomes.
+TABULAR_ENGINES = frozenset({'rules', 'precompiled'})
+
+# Bump when the layout of compact_decision_table changes.
+COMPACT_TABLE_FORMAT = 1
+
+
+@lru_cache(maxsize=None)
+def compact_decision_table(name: str) -> Dict[str, object]:
+    """
+    The decision table of a tabular engine with every string stored once.
+
+    ``entries`` are the distinct recommendations as indexes into ``strings``:
+    ``[pitch_call, catcher_plan, [alignment key, value, ...], [sign key,
+    value, ...], [key point, ...]]``. ``grid[situation_key(context)]`` is the
+    entry for a situation; its key points follow ``situation_header``.
+    """
+    if name not in TABULAR_ENGINES:
+        raise ValueError(f'The {name!r} engine has no complete decision table; use one of {sorted(TABULAR_ENGINES)}.')
+    strings: Dict[str, int] = {}
+    entries: Dict[Tuple[object, ...], int] = {}
+
+    def intern(text: str) -> int:
+        return strings.setdefault(text, len(strings))
+
+    grid = []
+    for pitch_call, catcher_plan, alignment, signs, key_points in decision_table():
+        entry = (
+            intern(pitch_call),
+            intern(catcher_plan),
+            tuple(intern(text) for pair in alignment for text in pair),
+            tuple(intern(text) for pair in signs for text in pair),
+            tuple(intern(text) for text in key_points),
+        )
+        grid.append(entries.setdefault(entry, len(entries)))
+    return {
+        'format': COMPACT_TABLE_FORMAT,
+        'engine': name,
+        'version': engine_fingerprint(name),
+        'situation_key': (
+            '((((outs * 8 + bases) * 12 + balls * 3 + strikes) * 2 + high_leverage) * 3 '
+            '+ sign(score_difference) + 1, where bases = first 1 + second 2 + third 4 and '
+            'high_leverage = inning >= 7 and |score_difference| <= 2'
+        ),
+        'header': '{Half} of the {inning} inning, count {balls}-{strikes} with {outs} out(s).',
+        'strings': list(strings),
+        'entries': [[pitch, catcher, list(alignment), list(signs), list(points)]
+                    for pitch, catcher, alignment, signs, points in entries],
+        'grid': grid,
+    }
@@ -0,0 +1,173 @@
+"""
+Play history reads from replica databases.
+
+``PLAYCALLING_REPLICAS['databases']`` maps a primary alias (``default`` or a
+shard, see ``sharding.py``) to a replica alias. ``ReplicaRouter`` sends reads
+of the history tables to the replica: the history list and detail, exports,
+situation analytics and the admin changelists. Writes always go to the
+primary, even for plays loaded from the replica.
+
+Reads stay on the primary when they could miss a write the client just made:
+
+* inside a transaction on the primary;
+* for the whole of an unsafe request (POST, PATCH, DELETE, ...), so a play it
+  loads and saves back is not the replica's possibly stale copy;
+* for the rest of a request that has written to the history;
+* for ``pin_seconds`` after such a request. ``ReadAfterWriteMiddleware`` sets
+  a short-lived cookie for this, so clients need to keep cookies.
+
+Production replicas are kept current by the database's own replication. For
+local SQLite files, ``sync_replicas`` copies each primary onto its replica
+with SQLite's online backup API. ``PLAYCALLING_SQLITE_PRAGMAS`` is applied to
+every new SQLite connection, so WAL journaling lets the copy and other
+readers run alongside a writer.
+"""
+
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .sharding import PlayHistoryRouter
+
+DEFAULT_REPLICA_SETTINGS = {
+    # Primary alias -> replica alias.
+    'databases': {},
+    # Seconds a client keeps reading from the primary after a write.
+    'pin_seconds': 5,
+}
+
+PIN_COOKIE = 'playcalling_primary'
+
+_request = contextvars.ContextVar('playcalling_replica_request', default=None)
+
+
+def replica_options():
+    return {**DEFAULT_REPLICA_SETTINGS, **getattr(settings, 'PLAYCALLING_REPLICAS', {})}
+
+
+class RequestState:
+    """Whether the current request must read from the primary, and whether it wrote."""
+
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def read_database(alias):
+    """Where to read ``alias``'s history: its replica unless that could miss a recent write."""
+    replica = replica_options()['databases'].get(alias)
+    if replica is None:
+        return alias
+    state = _request.get()
+    if (state is not None and (state.pinned or state.wrote)) or connections[alias].in_atomic_block:
+        return alias
+    return replica
+
+
+def primary_database(alias):
+    """The primary behind ``alias``, which may be a replica."""
+    for primary, replica in replica_options()['databases'].items():
+        if replica == alias:
+            return primary
+    return alias
+
+
+class ReplicaRouter(PlayHistoryRouter):
+    """``PlayHistoryRouter`` with history reads served by replicas."""
+
+    def db_for_read(self, model, **hints):
+        alias = super().db_for_read(model, **hints)
+        return None if alias is None else read_database(alias)
+
+    def db_for_write(self, model, **hints):
+        alias = super().db_for_write(model, **hints)
+        if alias is None:
+            return None
+        state = _request.get()
+        if state is not None:
+            state.wrote = True
+        return primary_database(alias)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A play read from a replica may point at a text row of its primary.
+        if obj1._state.db != obj2._state.db and primary_database(obj1._state.db) == primary_database(obj2._state.db):
+            return True
+        return None
+
+
+class ReadAfterWriteMiddleware:
+    """
+    Keep a client on the primary for ``pin_seconds`` after it wrote to the
+    history. Removed at startup when no replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_options()['databases']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self._state(request)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        state = self._state(request)
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self._finish(response, state)
+
+    @staticmethod
+    def _state(request):
+        return RequestState(pinned=PIN_COOKIE in request.COOKIES or request.method not in SAFE_METHODS)
+
+    def _finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=replica_options()['pin_seconds'], httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def sync_replica(primary, replica):
+    """Copy the SQLite database ``primary`` onto ``replica``; returns the seconds taken."""
+    source, target = connections[primary], connections[replica]
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+        raise ValueError(f'{primary} -> {replica}: only SQLite databases can be copied; use replication.')
+    source.ensure_connection()
+    target.ensure_connection()
+    started = time.perf_counter()
+    source.connection.backup(target.connection)
+    return time.perf_counter() - started
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver applying ``PLAYCALLING_SQLITE_PRAGMAS``."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'PLAYCALLING_SQLITE_PRAGMAS', {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,430 @@
+"""
+Recommendation rules as data, compiled into a per-situation dispatch index.
+
+A pack is a JSON document::
+
+    {
+      "name": "default",
+      "defaults": {"pitch_call": "...", "catcher_plan": "...",
+                   "defensive_alignment": {...}, "offensive_signs": {...}},
+      "rules": [
+        {"name": "three balls", "group": "count", "when": {"balls": 3},
+         "set": {"pitch_call": "..."}, "key_point": "..."},
+        ...
+      ]
+    }
+
+Rules run in order, and each one that matches applies ``set`` and appends its
+``key_point``. Within a ``group`` only the first matching rule applies, which
+is how an ``if``/``elif`` chain is written. ``when`` tests the situation
+(``outs``, ``balls``, ``strikes``, ``first``, ``second``, ``third``,
+``inning``, ``score_difference``, ``high_leverage``). A test is a value or
+an operator object (``{"gte": 2}``), ``any`` holds a list of alternatives,
+and ``output`` tests what earlier rules have set, such as
+``{"offensive_signs.hitter": "..."}``.
+
+``compile_pack`` validates a pack and resolves every test on outs, count and
+runners against each of the 288 base-out-count states up front. A request
+only walks the rules that can apply in its state, and checks only their
+remaining tests.
+
+``packs/default.json`` is the shipped pack, equivalent to
+``generate_recommendation``. ``RulePack`` rows override it or add team packs.
+The compiled set is rebuilt when a pack is saved, and other workers notice
+within ``reload_interval`` seconds. The new set replaces the old one in a
+single assignment, so a request always sees one consistent set.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import operator
+import os
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.models import Count, Max
+from django.dispatch import receiver
+
+from .recommendations import _high_leverage, situation_header
+from .situations import BASE_OUT_COUNT_STATES, COUNTS, context_base_out_state, pack_base_out_count, pack_count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_PATH = os.path.join(os.path.dirname(__file__), 'packs', 'default.json')
+
+DEFAULT_RULE_PACK_SETTINGS = {
+    # A RulePack with this name replaces the shipped default pack.
+    'default': 'default',
+    # Seconds between checks for packs changed by other workers.
+    'reload_interval': 5,
+}
+
+OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'in': lambda value, options: value in options,
+    'not_in': lambda value, options: value not in options,
+}
+
+# Known from the base-out-count state, so resolved when the pack is compiled.
+STATE_FIELDS = ('outs', 'balls', 'strikes', 'first', 'second', 'third')
+REQUEST_FIELDS = ('inning', 'score_difference', 'high_leverage')
+TEXT_FIELDS = ('pitch_call', 'catcher_plan')
+MAPPING_FIELDS = ('defensive_alignment', 'offensive_signs')
+
+
+class RulePackError(ValueError):
+    """A pack that does not follow the format; the message names the offending path."""
+
+
+def _state_values(situation):
+    base_out_state, count = divmod(situation, COUNTS)
+    outs, bases = divmod(base_out_state, 8)
+    balls, strikes = divmod(count, 3)
+    return {
+        'outs': outs,
+        'balls': balls,
+        'strikes': strikes,
+        'first': bool(bases & 1),
+        'second': bool(bases & 2),
+        'third': bool(bases & 4),
+    }
+
+
+def _check_output_path(path, where):
+    head, _, key = path.partition('.')
+    if (head in TEXT_FIELDS and not key) or (head in MAPPING_FIELDS and key):
+        return
+    raise RulePackError(f'{where}: unknown output {path!r}.')
+
+
+def _read_output(output, path):
+    head, _, key = path.partition('.')
+    return output[head].get(key) if key else output[head]
+
+
+def _compile_test(where, field, spec):
+    """``test(value)`` checking one field against ``spec``."""
+    if isinstance(spec, dict):
+        if len(spec) != 1:
+            raise RulePackError(f'{where}.{field}: use exactly one operator.')
+        ((name, operand),) = spec.items()
+        if name not in OPERATORS:
+            raise RulePackError(f'{where}.{field}: unknown operator {name!r}.')
+        if name in ('in', 'not_in') and not isinstance(operand, list):
+            raise RulePackError(f'{where}.{field}: {name!r} needs a list.')
+        if isinstance(operand, list):
+            operand = tuple(operand)
+    else:
+        name, operand = 'eq', spec
+    compare = OPERATORS[name]
+    return lambda value: compare(value, operand)
+
+
+def _compile_condition(where, when):
+    """
+    ``(state_tests, request_tests)``. State tests take the state values; request
+    tests take ``(values, output)``, where ``values`` also holds the state
+    values, and are left for request time.
+    """
+    if not isinstance(when, dict):
+        raise RulePackError(f'{where}: must be an object.')
+    state_tests, request_tests = [], []
+    for field, spec in when.items():
+        if field == 'any':
+            if not isinstance(spec, list) or not spec:
+                raise RulePackError(f'{where}.any: must be a non-empty list of conditions.')
+            alternatives = [_compile_condition(f'{where}.any[{index}]', item) for index, item in enumerate(spec)]
+            if all(not request for _, request in alternatives):
+                state_tests.append(lambda state, alternatives=alternatives: any(
+                    all(test(state) for test in tests) for tests, _ in alternatives
+                ))
+            else:
+                request_tests.append(lambda values, output, alternatives=alternatives: any(
+                    all(test(values) for test in state) and all(test(values, output) for test in request)
+                    for state, request in alternatives
+                ))
+        elif field == 'output':
+            if not isinstance(spec, dict):
+                raise RulePackError(f'{where}.output: must be an object.')
+            for path, value in spec.items():
+                _check_output_path(path, f'{where}.output')
+                test = _compile_test(f'{where}.output', path, value)
+                request_tests.append(lambda values, output, path=path, test=test: test(_read_output(output, path)))
+        elif field in STATE_FIELDS:
+            test = _compile_test(where, field, spec)
+            state_tests.append(lambda state, field=field, test=test: test(state[field]))
+        elif field in REQUEST_FIELDS:
+            test = _compile_test(where, field, spec)
+            request_tests.append(lambda values, output, field=field, test=test: test(values[field]))
+        else:
+            raise RulePackError(f'{where}: unknown field {field!r}.')
+    return state_tests, request_tests
+
+
+class CompiledRule:
+    __slots__ = ('name', 'group', 'tests', 'changes', 'key_point')
+
+    def __init__(self, name, group, tests, changes, key_point):
+        self.name = name
+        self.group = group
+        self.tests = tests
+        self.changes = changes
+        self.key_point = key_point
+
+
+def _compile_defaults(defaults):
+    if not isinstance(defaults, dict):
+        raise RulePackError('defaults: must be an object.')
+    for field in TEXT_FIELDS:
+        if not isinstance(defaults.get(field), str):
+            raise RulePackError(f'defaults.{field}: must be a string.')
+    for field in MAPPING_FIELDS:
+        mapping = defaults.get(field)
+        if not isinstance(mapping, dict) or not all(isinstance(value, str) for value in mapping.values()):
+            raise RulePackError(f'defaults.{field}: must be an object of strings.')
+    return {field: defaults[field] for field in TEXT_FIELDS + MAPPING_FIELDS}
+
+
+class CompiledPack:
+    """A validated pack with, per base-out-count state, the rules that can apply there."""
+
+    def __init__(self, definition):
+        if not isinstance(definition, dict):
+            raise RulePackError('The pack must be an object.')
+        self.name = definition.get('name', '')
+        self.defaults = _compile_defaults(definition.get('defaults'))
+        rules = definition.get('rules')
+        if not isinstance(rules, list):
+            raise RulePackError('rules: must be a list.')
+
+        compiled = []
+        for index, rule in enumerate(rules):
+            where = f'rules[{index}]'
+            if not isinstance(rule, dict):
+                raise RulePackError(f'{where}: must be an object.')
+            unknown = set(rule) - {'name', 'group', 'when', 'set', 'key_point'}
+            if unknown:
+                raise RulePackError(f'{where}: unknown keys {sorted(unknown)}.')
+            state_tests, request_tests = _compile_condition(f'{where}.when', rule.get('when', {}))
+            changes = rule.get('set', {})
+            if not isinstance(changes, dict) or not all(isinstance(value, str) for value in changes.values()):
+                raise RulePackError(f'{where}.set: must be an object of strings.')
+            for path in changes:
+                _check_output_path(path, f'{where}.set')
+            key_point = rule.get('key_point')
+            if key_point is not None and not isinstance(key_point, str):
+                raise RulePackError(f'{where}.key_point: must be a string.')
+            compiled.append((state_tests, CompiledRule(
+                rule.get('name', where),
+                rule.get('group'),
+                tuple(request_tests),
+                tuple((path.partition('.')[0], path.partition('.')[2], value) for path, value in changes.items()),
+                key_point,
+            )))
+
+        self.states = tuple(map(_state_values, range(BASE_OUT_COUNT_STATES)))
+        self.index = tuple(self._applicable(compiled, state) for state in self.states)
+        canonical = json.dumps(definition, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        self.digest = hashlib.sha256(canonical).hexdigest()[:16]
+
+    @staticmethod
+    def _applicable(compiled, state):
+        """Rules that can match in ``state``, minus group members after one that always matches."""
+        rules, settled = [], set()
+        for state_tests, rule in compiled:
+            if rule.group in settled or not all(test(state) for test in state_tests):
+                continue
+            rules.append(rule)
+            if rule.group is not None and not rule.tests:
+                settled.add(rule.group)
+        return tuple(rules)
+
+    def recommend(self, context):
+        """``generate_recommendation`` contract."""
+        situation = pack_base_out_count(
+            context_base_out_state(context),
+            pack_count(context['balls'], context['strikes']),
+        )
+        inning, score_difference = int(context['inning']), int(context['score_difference'])
+        values = {
+            **self.states[situation],
+            'inning': inning,
+            'score_difference': score_difference,
+            'high_leverage': _high_leverage(inning, score_difference),
+        }
+        output = {
+            'pitch_call': self.defaults['pitch_call'],
+            'catcher_plan': self.defaults['catcher_plan'],
+            'defensive_alignment': dict(self.defaults['defensive_alignment']),
+            'offensive_signs': dict(self.defaults['offensive_signs']),
+        }
+        key_points = [situation_header(context)]
+        decided = set()
+        for rule in self.index[situation]:
+            group = rule.group
+            if group is not None and group in decided:
+                continue
+            if rule.tests and not all(test(values, output) for test in rule.tests):
+                continue
+            for field, key, value in rule.changes:
+                if key:
+                    output[field][key] = value
+                else:
+                    output[field] = value
+            if rule.key_point is not None:
+                key_points.append(rule.key_point)
+            if group is not None:
+                decided.add(group)
+        output['key_points'] = list(dict.fromkeys(key_points))
+        return output
+
+
+def compile_pack(definition):
+    return CompiledPack(definition)
+
+
+def rule_pack_options():
+    return {**DEFAULT_RULE_PACK_SETTINGS, **getattr(settings, 'PLAYCALLING_RULE_PACKS', {})}
+
+
+def load_default_pack():
+    with open(DEFAULT_PACK_PATH, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+@lru_cache(maxsize=None)
+def shipped_pack():
+    return compile_pack(load_default_pack())
+
+
+class PackSet:
+    """Compiled packs in use: the default pack and the team packs."""
+
+    def __init__(self, default, teams, revision):
+        self.default = default
+        self.teams = teams
+        self.revision = revision
+
+    def select(self, context):
+        teams = self.teams
+        return teams.get(context.get('defense_team')) or teams.get(context.get('offense_team')) or self.default
+
+
+def _revision():
+    from .models import RulePack
+
+    revision = RulePack.objects.aggregate(rows=Count('id'), updated=Max('updated_at'))
+    return revision['rows'], revision['updated']
+
+
+def build_pack_set():
+    """Compile the shipped pack and every active ``RulePack``; broken stored packs are logged and skipped."""
+    from .models import RulePack
+
+    revision = _revision()
+    default = shipped_pack()
+    teams = {}
+    default_name = rule_pack_options()['default']
+    for pack in RulePack.objects.filter(active=True):
+        try:
+            compiled = compile_pack(pack.definition)
+        except RulePackError as exc:
+            logger.error('Rule pack %s is invalid and was skipped: %s', pack.name, exc)
+            continue
+        if pack.name == default_name:
+            default = compiled
+        if pack.team:
+            teams[pack.team] = compiled
+    return PackSet(default, teams, revision)
+
+
+_packs = None
+_checked_at = None
+_stale = False
+_reloading = False
+_packs_lock = threading.Lock()
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _reload():
+    global _packs, _checked_at, _stale, _reloading
+    try:
+        stale, _stale = _stale, False
+        if stale or _packs is None or _revision() != _packs.revision:
+            _packs = build_pack_set()
+        _checked_at = time.monotonic()
+    finally:
+        _reloading = False
+
+
+def _reload_in_background():
+    try:
+        _reload()
+    finally:
+        # Each reload runs on a new thread; do not leak its connections.
+        connections.close_all()
+
+
+def get_pack_set():
+    """
+    The compiled packs, rebuilt when a ``RulePack`` changed. From async code
+    the database is not touched on the event loop: the check runs on a
+    background thread and the current set is used meanwhile (the shipped pack
+    alone before the first load).
+    """
+    global _packs, _reloading
+    interval = rule_pack_options()['reload_interval']
+    packs = _packs
+    if packs is not None and _checked_at is not None and time.monotonic() - _checked_at < interval:
+        return packs
+    with _packs_lock:
+        if _reloading:
+            return _packs or PackSet(shipped_pack(), {}, None)
+        _reloading = True
+    if in_event_loop():
+        threading.Thread(target=_reload_in_background, name='rule-pack-reload', daemon=True).start()
+        return packs or PackSet(shipped_pack(), {}, None)
+    _reload()
+    return _packs
+
+
+def packs_changed(**kwargs):
+    """``RulePack`` saved or deleted in this process: rebuild on the next request."""
+    global _checked_at, _stale
+    _stale = True
+    _checked_at = None
+
+
+def pack_cache_key(context):
+    """Digest of the pack that would answer ``context``, for response cache keys."""
+    return get_pack_set().select(context).digest
+
+
+def rule_pack_recommendation(context):
+    return get_pack_set().select(context).recommend(context)
+
+
+@receiver(setting_changed)
+def _reset_packs(setting, **kwargs):
+    global _packs, _checked_at
+    if setting == 'PLAYCALLING_RULE_PACKS':
+        with _packs_lock:
+            _packs, _checked_at = None, None
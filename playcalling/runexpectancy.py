@@ -0,0 +1,329 @@
+"""
+Run expectancy matrices computed from the recorded play sequence.
+
+For every stored play, the runs the offense went on to score before the end of
+its half inning are the change in ``score_difference`` from that play to the
+last recorded play of the same half inning. Averaging those runs per base-out
+state gives the classic RE24 matrix, and per base-out-count state the
+count-aware matrix (288 states). Both are computed with a handful of sorts and
+``np.bincount`` passes over column arrays, so millions of plays take seconds.
+
+Runs scored on the final recorded play of a half inning are not stored with
+the play, so a half inning whose last plays were not recorded is
+undercounted. The matrices are only as complete as the history.
+
+The result is written by ``rebuild_run_expectancy`` to an ``.npz`` artifact at
+``PLAYCALLING_RUN_EXPECTANCY['path']``. Workers load it once and look again
+only after ``reload_interval`` seconds, so reading it costs nothing on the
+request path. Schedule the command (``--if-stale`` skips the rebuild when no
+play changed) to keep it current.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Count, Max
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .archive import archive_source, play_chunks, queryset_chunks
+from .models import GamePlay
+from .sharding import play_databases
+from .situations import (
+    BASE_OUT_COUNT_STATES,
+    BASE_OUT_STATES,
+    BASE_STATES,
+    COUNTS,
+    base_out_state_label,
+    context_base_out_state,
+    pack_base_out_count,
+    pack_count,
+)
+
+# Bump when the computation changes so old artifacts are not mistaken for current ones.
+ALGORITHM_VERSION = 1
+
+DEFAULT_RUN_EXPECTANCY_SETTINGS = {
+    # .npz artifact written by rebuild_run_expectancy; None turns the key points off.
+    'path': None,
+    # States with fewer recorded plays than this are left out of key_points.
+    'min_samples': 20,
+    # Seconds between checks for a newer artifact.
+    'reload_interval': 60,
+}
+
+SEQUENCE_FIELDS = (
+    'offense_team',
+    'defense_team',
+    'inning',
+    'half_inning',
+    'base_out_state',
+    'balls',
+    'strikes',
+    'score_difference',
+    'created_at',
+)
+
+# Plays of one half inning further apart than this belong to different games.
+MAX_PLAY_GAP_SECONDS = 3600
+
+
+def run_expectancy_options():
+    return {**DEFAULT_RUN_EXPECTANCY_SETTINGS, **getattr(settings, 'PLAYCALLING_RUN_EXPECTANCY', {})}
+
+
+def load_sequence(queryset=None, chunk_size=50000):
+    """
+    Column arrays for ``queryset`` (every play in every play database,
+    archived seasons included, by default) in recording order within each
+    database. Team names are replaced by integer codes; ``created_at`` becomes
+    epoch seconds.
+    """
+    if queryset is None:
+        chunks = (chunk for alias in play_databases() for chunk in play_chunks(SEQUENCE_FIELDS, alias, chunk_size))
+    else:
+        chunks = queryset_chunks(queryset.order_by('created_at', 'id'), SEQUENCE_FIELDS, chunk_size)
+    teams = {}
+    arrays = [_sequence_chunk(chunk, teams) for chunk in chunks]
+    matrix = np.concatenate(arrays, axis=1) if arrays else np.zeros((len(SEQUENCE_FIELDS), 0), dtype=np.int64)
+    return dict(zip(SEQUENCE_FIELDS, matrix))
+
+
+def _team_codes(names, teams):
+    distinct, inverse = np.unique(names, return_inverse=True)
+    return np.array([teams.setdefault(team, len(teams)) for team in distinct], dtype=np.int64)[inverse]
+
+
+def _sequence_chunk(columns, teams):
+    return np.array(
+        [
+            _team_codes(columns['offense_team'], teams),
+            _team_codes(columns['defense_team'], teams),
+            columns['inning'],
+            columns['half_inning'] == 'bottom',
+            columns['base_out_state'],
+            columns['balls'],
+            columns['strikes'],
+            columns['score_difference'],
+            columns['created_at'].astype('datetime64[s]').astype(np.int64),
+        ],
+        dtype=np.int64,
+    )
+
+
+def runs_to_end_of_half(columns, max_gap=MAX_PLAY_GAP_SECONDS):
+    """
+    ``(order, runs)``: a stable order grouping the plays by half inning, and
+    the runs scored from each play (in that order) to the end of its half.
+    """
+    count = len(columns['score_difference'])
+    position = np.arange(count)
+    order = np.lexsort((
+        position,
+        columns['half_inning'],
+        columns['inning'],
+        columns['defense_team'],
+        columns['offense_team'],
+    ))
+    offense, defense = columns['offense_team'][order], columns['defense_team'][order]
+    inning, half = columns['inning'][order], columns['half_inning'][order]
+    outs = columns['base_out_state'][order] // BASE_STATES
+    created, score = columns['created_at'][order], columns['score_difference'][order]
+
+    starts = np.ones(count, dtype=bool)
+    # A new half inning: other teams or inning, fewer outs than the play before, or a long gap.
+    starts[1:] = (
+        (offense[1:] != offense[:-1])
+        | (defense[1:] != defense[:-1])
+        | (inning[1:] != inning[:-1])
+        | (half[1:] != half[:-1])
+        | (outs[1:] < outs[:-1])
+        | (created[1:] - created[:-1] > max_gap)
+    )
+    segment = np.cumsum(starts) - 1
+    last = np.append(np.flatnonzero(starts)[1:] - 1, count - 1) if count else np.zeros(0, dtype=np.intp)
+    runs = np.maximum(score[last][segment] - score, 0)
+    return order, runs
+
+
+class RunExpectancy:
+    """Run sums and play counts per base-out and base-out-count state."""
+
+    def __init__(self, runs, plays, count_runs, count_plays, source=None, computed_at=None):
+        self.runs = runs
+        self.plays = plays
+        self.count_runs = count_runs
+        self.count_plays = count_plays
+        self.source = source or {}
+        self.computed_at = computed_at
+        digest = hashlib.sha256()
+        for array in (runs, plays, count_runs, count_plays):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        self.version = f'{ALGORITHM_VERSION}-{digest.hexdigest()[:12]}'
+
+    @classmethod
+    def from_sequence(cls, columns, source=None):
+        order, runs = runs_to_end_of_half(columns)
+        state = columns['base_out_state'][order]
+        situation = state * COUNTS + columns['balls'][order] * 3 + columns['strikes'][order]
+        return cls(
+            np.bincount(state, weights=runs, minlength=BASE_OUT_STATES),
+            np.bincount(state, minlength=BASE_OUT_STATES),
+            np.bincount(situation, weights=runs, minlength=BASE_OUT_COUNT_STATES),
+            np.bincount(situation, minlength=BASE_OUT_COUNT_STATES),
+            source=source,
+            computed_at=timezone.now().isoformat(),
+        )
+
+    def matrix(self):
+        """RE24 as a ``(24,)`` float array; NaN where no play was recorded."""
+        return np.divide(self.runs, self.plays, out=np.full(BASE_OUT_STATES, np.nan), where=self.plays > 0)
+
+    def count_matrix(self):
+        """Count-aware run expectancy as a ``(288,)`` float array; NaN where no play was recorded."""
+        return np.divide(
+            self.count_runs, self.count_plays, out=np.full(BASE_OUT_COUNT_STATES, np.nan), where=self.count_plays > 0
+        )
+
+    def key_points(self, context, min_samples):
+        state = context_base_out_state(context)
+        plays = int(self.plays[state])
+        if plays < min_samples:
+            return []
+        point = (
+            f'Run expectancy: {self.runs[state] / plays:.2f} runs from {base_out_state_label(state)} '
+            f'({plays} recorded plays)'
+        )
+        situation = pack_base_out_count(state, pack_count(context['balls'], context['strikes']))
+        count_plays = int(self.count_plays[situation])
+        if count_plays >= min_samples:
+            point += f"; {self.count_runs[situation] / count_plays:.2f} at {context['balls']}-{context['strikes']}"
+        return [point + '.']
+
+    def save(self, path):
+        """Write atomically, so workers never load a partial file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        metadata = {'algorithm': ALGORITHM_VERSION, 'source': self.source, 'computed_at': self.computed_at}
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.npz')
+        with os.fdopen(descriptor, 'wb') as handle:
+            np.savez(
+                handle,
+                runs=self.runs,
+                plays=self.plays,
+                count_runs=self.count_runs,
+                count_plays=self.count_plays,
+                metadata=np.array(json.dumps(metadata)),
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """The artifact at ``path``, or None when it is missing or from another algorithm version."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                metadata = json.loads(str(data['metadata']))
+                if metadata.get('algorithm') != ALGORITHM_VERSION:
+                    return None
+                return cls(
+                    data['runs'],
+                    data['plays'],
+                    data['count_runs'],
+                    data['count_plays'],
+                    source=metadata['source'],
+                    computed_at=metadata['computed_at'],
+                )
+        except FileNotFoundError:
+            return None
+
+
+def history_source():
+    """Cheap fingerprint of the play tables and archives; unchanged means a rebuild gives the same matrices."""
+    stats = [
+        GamePlay.objects.using(alias).aggregate(rows=Count('id'), last_id=Max('id'), last_update=Max('updated_at'))
+        for alias in play_databases()
+    ]
+    last_update = max((row['last_update'] for row in stats if row['last_update']), default=None)
+    return {
+        'rows': sum(row['rows'] for row in stats),
+        'last_id': max((row['last_id'] for row in stats if row['last_id'] is not None), default=None),
+        'last_update': last_update.isoformat() if last_update else None,
+        'archive': archive_source(play_databases()),
+    }
+
+
+def compute_run_expectancy(queryset=None):
+    source = history_source() if queryset is None else None
+    return RunExpectancy.from_sequence(load_sequence(queryset), source=source)
+
+
+def rebuild_run_expectancy(path=None, if_stale=False):
+    """
+    Recompute from every play and write the artifact; returns ``(artifact, rebuilt)``.
+    With ``if_stale`` the existing artifact is kept when the play table has not changed.
+    """
+    path = path or run_expectancy_options()['path']
+    if if_stale and path:
+        current = RunExpectancy.load(path)
+        if current is not None and current.source == history_source():
+            return current, False
+    artifact = compute_run_expectancy()
+    if path:
+        artifact.save(path)
+    return artifact, True
+
+
+_artifact = None
+_artifact_mtime = None
+_checked_at = None
+_artifact_lock = threading.Lock()
+
+
+def get_run_expectancy():
+    """The configured artifact, reloaded when the file changes; None when there is none."""
+    global _artifact, _artifact_mtime, _checked_at
+    options = run_expectancy_options()
+    if options['path'] is None:
+        return None
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < options['reload_interval']:
+        return _artifact
+    with _artifact_lock:
+        if _checked_at is None or now - _checked_at >= options['reload_interval']:
+            try:
+                mtime = os.stat(options['path']).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != _artifact_mtime:
+                _artifact = RunExpectancy.load(options['path']) if mtime is not None else None
+                _artifact_mtime = mtime
+            _checked_at = now
+        return _artifact
+
+
+def run_expectancy_version():
+    artifact = get_run_expectancy()
+    return artifact.version if artifact is not None else '-'
+
+
+def annotate_run_expectancy(recommendation, context):
+    """Append run expectancy for the situation to ``key_points`` in place."""
+    artifact = get_run_expectancy()
+    if artifact is not None:
+        recommendation['key_points'].extend(artifact.key_points(context, run_expectancy_options()['min_samples']))
+    return recommendation
+
+
+@receiver(setting_changed)
+def _reset_artifact(setting, **kwargs):
+    global _artifact, _artifact_mtime, _checked_at
+    if setting == 'PLAYCALLING_RUN_EXPECTANCY':
+        with _artifact_lock:
+            _artifact, _artifact_mtime, _checked_at = None, None, None
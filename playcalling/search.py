@@ -0,0 +1,235 @@
+"""
+Full-text search over the play history's team names, notes and instructions.
+
+The instructions are interned in ``RecommendationText`` (see
+``interning.py``), so there are two indexes: one over the play table's team
+names and notes and one over the interned texts. A play matches when every
+word of the query is found in either. On SQLite each index is an
+external-content FTS5 table next to its table, filled by insert, update and
+delete triggers, so every write path (``save``, ``bulk_create``,
+``QuerySet.update``) keeps it current. The triggers only read their own
+table, which keeps SQLite's table rebuilds working. On PostgreSQL each table
+has a stored, generated ``tsvector`` column with a GIN index. None of these
+are model fields; queries reach them through SQL fragments. Other databases
+fall back to ``icontains`` without ranking.
+
+Rebuilding a table is how SQLite migrations alter it, and that drops the
+triggers, so ``install_search_index`` runs again after every ``migrate``.
+``rebuild_search_index`` re-indexes existing rows. Until migration 0012 the
+texts were play columns with a single index over them;
+``install_legacy_search_index`` restores that one when migrating back.
+"""
+
+import re
+
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import RECOMMENDATION_TEXT_FIELDS, GamePlay, RecommendationText, play_lookups
+
+SEARCH_FIELDS = (
+    'offense_team',
+    'defense_team',
+    'context_notes',
+    'catcher_instructions',
+    'offensive_sign',
+    'runner_instructions',
+)
+PLAY_SEARCH_FIELDS = tuple(field for field in SEARCH_FIELDS if field not in RECOMMENDATION_TEXT_FIELDS)
+TEXT_SEARCH_FIELDS = tuple(field for field in SEARCH_FIELDS if field in RECOMMENDATION_TEXT_FIELDS)
+
+TABLE = GamePlay._meta.db_table
+TEXT_TABLE = RecommendationText._meta.db_table
+FTS_TABLE = 'playcalling_gameplay_fts'
+TEXT_FTS_TABLE = 'playcalling_recommendationtext_fts'
+# Team names weigh most, then the coaching instructions, then free-form notes.
+POSTGRES_WEIGHTS = {
+    'offense_team': 'A',
+    'defense_team': 'A',
+    'catcher_instructions': 'B',
+    'offensive_sign': 'B',
+    'runner_instructions': 'B',
+    'context_notes': 'C',
+}
+
+
+def _sqlite_index(table, fts_table, fields):
+    columns = ', '.join(fields)
+    new = ', '.join(f'new.{field}' for field in fields)
+    old = ', '.join(f'old.{field}' for field in fields)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+
+
+def _sqlite_drop(fts_table):
+    return [
+        f'DROP TRIGGER IF EXISTS {fts_table}_insert',
+        f'DROP TRIGGER IF EXISTS {fts_table}_delete',
+        f'DROP TRIGGER IF EXISTS {fts_table}_update',
+        f'DROP TABLE IF EXISTS {fts_table}',
+    ]
+
+
+SQLITE_INDEX = [
+    *_sqlite_index(TABLE, FTS_TABLE, PLAY_SEARCH_FIELDS),
+    *_sqlite_index(TEXT_TABLE, TEXT_FTS_TABLE, TEXT_SEARCH_FIELDS),
+]
+SQLITE_DROP = [*_sqlite_drop(FTS_TABLE), *_sqlite_drop(TEXT_FTS_TABLE)]
+
+
+def _postgres_index(table, fields):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({field}, '')), '{POSTGRES_WEIGHTS[field]}')" for field in fields
+    )
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING gin (search_vector)',
+    ]
+
+
+def _postgres_drop(table):
+    return [
+        f'DROP INDEX IF EXISTS {table}_search_idx',
+        f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+    ]
+
+
+POSTGRES_INDEX = [*_postgres_index(TABLE, PLAY_SEARCH_FIELDS), *_postgres_index(TEXT_TABLE, TEXT_SEARCH_FIELDS)]
+POSTGRES_DROP = [*_postgres_drop(TABLE), *_postgres_drop(TEXT_TABLE)]
+
+
+def _indexable(connection):
+    """Whether both tables exist; migrations before the one adding the texts table have nothing to index."""
+    tables = connection.introspection.table_names()
+    return TABLE in tables and TEXT_TABLE in tables
+
+
+def install_search_index(connection):
+    """Create the indexes and their triggers on ``connection`` if they are missing."""
+    if not _indexable(connection):
+        return
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(connection):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(connection):
+    """Re-index every play and text; generated PostgreSQL columns are always current."""
+    if not _indexable(connection):
+        return
+    install_search_index(connection)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for fts_table in (FTS_TABLE, TEXT_FTS_TABLE):
+                cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def install_legacy_search_index(connection):
+    """Migration 0009's index over all ``SEARCH_FIELDS`` as play columns, filled from the existing rows."""
+    statements = {
+        'sqlite': [
+            *_sqlite_index(TABLE, FTS_TABLE, SEARCH_FIELDS),
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ],
+        'postgresql': _postgres_index(TABLE, SEARCH_FIELDS),
+    }.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_words(text):
+    return re.findall(r'\w+', text)
+
+
+def fts5_query(text):
+    """Every word of ``text`` as a quoted prefix term, so user input cannot use the FTS5 query syntax."""
+    return ' '.join(f'"{word}"*' for word in search_words(text))
+
+
+def _fallback_filter(words):
+    condition = Q()
+    for word in words:
+        condition &= Q(*[Q(**{f'{field}__icontains': word}) for field in play_lookups(SEARCH_FIELDS)], _connector=Q.OR)
+    return condition
+
+
+def match_plays(queryset, text):
+    """Plays in ``queryset`` with every word of ``text`` in their own fields or their texts."""
+    words = search_words(text)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        condition = (
+            f'({TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) OR '
+            f'{TABLE}.recommendation_text_id IN (SELECT rowid FROM {TEXT_FTS_TABLE} WHERE {TEXT_FTS_TABLE} MATCH %s))'
+        )
+        params = [term for word in words for term in [fts5_query(word)] * 2]
+    elif vendor == 'postgresql':
+        # A stop word gives an empty query, which matches nothing; skip it like websearch_to_tsquery does.
+        condition = (
+            f"(numnode(plainto_tsquery('english', %s)) = 0 "
+            f"OR {TABLE}.search_vector @@ plainto_tsquery('english', %s) "
+            f'OR {TABLE}.recommendation_text_id IN '
+            f"(SELECT id FROM {TEXT_TABLE} WHERE search_vector @@ plainto_tsquery('english', %s)))"
+        )
+        params = [term for word in words for term in [word] * 3]
+    else:
+        return queryset.filter(_fallback_filter(words))
+    return queryset.filter(RawSQL(' AND '.join([condition] * len(words)), params, output_field=BooleanField()))
+
+
+def rank_plays(queryset, text):
+    """
+    Order plays already narrowed by ``match_plays`` best match first (ties
+    newest first), with the score in ``search_rank``; higher is better. The
+    score adds the play's and its texts' scores for the words of ``text``.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # bm25() is lower for better matches.
+        rank = RawSQL(
+            f'(COALESCE((SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id), 0) + '
+            f'COALESCE((SELECT -bm25({TEXT_FTS_TABLE}) FROM {TEXT_FTS_TABLE} '
+            f'WHERE {TEXT_FTS_TABLE} MATCH %s AND rowid = {TABLE}.recommendation_text_id), 0))',
+            # Either side may hold only some of the words.
+            [' OR '.join(fts5_query(word) for word in search_words(text)) or '""'] * 2,
+            output_field=FloatField(),
+        )
+    elif vendor == 'postgresql':
+        rank = RawSQL(
+            f"(ts_rank({TABLE}.search_vector, websearch_to_tsquery('english', %s)) + "
+            f"COALESCE((SELECT ts_rank(search_vector, websearch_to_tsquery('english', %s)) FROM {TEXT_TABLE} "
+            f'WHERE id = {TABLE}.recommendation_text_id), 0))',
+            [text, text],
+            output_field=FloatField(),
+        )
+    else:
+        rank = Value(0.0, output_field=FloatField())
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', '-created_at', '-id')
+
+
+def install_after_migrate(sender, using, **kwargs):
+    """``post_migrate`` receiver restoring triggers dropped by table rebuilds."""
+    if router.allow_migrate_model(using, GamePlay):
+        install_search_index(connections[using])
@@ -1,13 +1,26 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import GamePlay
+from .simulation import simulation_options
+
+
+TEXTAREA = {'base_template': 'textarea.html'}
 
 
 class GamePlaySerializer(serializers.ModelSerializer):
+    # Properties backed by RecommendationText, declared like the model fields they replace.
+    recommended_pitch = serializers.CharField(max_length=128, allow_blank=True, required=False)
+    defensive_alignment = serializers.JSONField(required=False)
+    catcher_instructions = serializers.CharField(allow_blank=True, required=False, style=TEXTAREA)
+    offensive_sign = serializers.CharField(allow_blank=True, required=False, style=TEXTAREA)
+    runner_instructions = serializers.CharField(allow_blank=True, required=False, style=TEXTAREA)
+
     class Meta:
         model = GamePlay
         fields = [
             'id',
+            'organization',
             'offense_team',
             'defense_team',
             'inning',
@@ -18,6 +31,7 @@ class GamePlaySerializer(serializers.ModelSerializer):
             'runners_on_first',
             'runners_on_second',
             'runners_on_third',
+            'base_out_state',
             'score_difference',
             'context_notes',
             'recommended_pitch',
@@ -32,6 +46,8 @@ class GamePlaySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             'id',
+            'organization',
+            'base_out_state',
             'generated_from_engine',
             'created_at',
             'updated_at',
@@ -60,3 +76,69 @@ class RecommendationResponseSerializer(serializers.Serializer):
     defensive_alignment = serializers.DictField(child=serializers.CharField())
     offensive_signs = serializers.DictField(child=serializers.CharField())
     key_points = serializers.ListField(child=serializers.CharField())
+
+
+class BatchRecommendationRequestSerializer(serializers.Serializer):
+    """
+    Many situations at once, either as a list of request objects (``situations``)
+    or column-wise (``columns``: field name -> list of values).
+    """
+
+    situations = serializers.ListField(child=serializers.DictField(), required=False)
+    columns = serializers.DictField(child=serializers.ListField(), required=False)
+    save_to_history = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ('situations' in attrs) == ('columns' in attrs):
+            raise serializers.ValidationError('Provide exactly one of "situations" or "columns".')
+
+        if 'columns' in attrs:
+            columns = attrs.pop('columns')
+            lengths = {len(values) for values in columns.values()}
+            if len(lengths) > 1:
+                raise serializers.ValidationError({'columns': ['All columns must have the same length.']})
+            size = lengths.pop() if lengths else 0
+            rows = [{name: values[index] for name, values in columns.items()} for index in range(size)]
+            field = 'columns'
+        else:
+            rows = attrs.pop('situations')
+            field = 'situations'
+
+        max_size = getattr(settings, 'PLAYCALLING_BATCH_MAX_SIZE', 10000)
+        if not rows:
+            raise serializers.ValidationError({field: ['Provide at least one situation.']})
+        if len(rows) > max_size:
+            raise serializers.ValidationError({field: [f'Ensure this batch has no more than {max_size} situations.']})
+
+        situations = RecommendationRequestSerializer(data=rows, many=True)
+        if not situations.is_valid():
+            raise serializers.ValidationError({field: situations.errors})
+        attrs['situations'] = situations.validated_data
+        return attrs
+
+
+class SimulationRequestSerializer(serializers.Serializer):
+    """Situations to simulate, with the number of ``trials`` per option and an optional ``seed``."""
+
+    situations = serializers.ListField(child=serializers.DictField())
+    trials = serializers.IntegerField(min_value=100, required=False)
+    seed = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        options = simulation_options()
+        if attrs.get('trials', 0) > options['max_trials']:
+            raise serializers.ValidationError(
+                {'trials': [f"Ensure this value is less than or equal to {options['max_trials']}."]}
+            )
+        rows = attrs['situations']
+        if not rows:
+            raise serializers.ValidationError({'situations': ['Provide at least one situation.']})
+        if len(rows) > options['max_situations']:
+            raise serializers.ValidationError(
+                {'situations': [f"Ensure this batch has no more than {options['max_situations']} situations."]}
+            )
+        situations = RecommendationRequestSerializer(data=rows, many=True)
+        if not situations.is_valid():
+            raise serializers.ValidationError({'situations': situations.errors})
+        attrs['situations'] = situations.validated_data
+        return attrs
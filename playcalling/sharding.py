@@ -0,0 +1,159 @@
+"""
+Play history sharded across databases by organization.
+
+``PLAYCALLING_SHARDS['organizations']`` maps an organization slug to the
+database alias holding its plays, their interned texts (``RecommendationText``)
+and their outcome summary; organizations not listed stay in ``default``.
+``PlayHistoryRouter`` sends a play to the database of its ``organization``
+and other queries on the history tables to the database of the current
+request's organization. ``OrganizationMiddleware`` takes that from the
+``X-Organization`` header or the ``organization`` query parameter, which the
+admin keeps in its preserved changelist filters. Code running outside a
+request, such as the write-behind thread, routes each play by its own field.
+
+Everything else lives in ``default``. Databases named in
+``PLAYCALLING_SHARDS['databases']`` only get the history tables from
+``migrate``. After changing the mapping, run ``rebalance_shards`` to migrate
+the shards and move plays to the database of their organization.
+
+Primary keys are allocated per database, so a play id is only meaningful
+together with its organization.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import DEFAULT_DB_ALIAS
+from django.http import JsonResponse, QueryDict
+
+DEFAULT_SHARD_SETTINGS = {
+    # Aliases that hold nothing but play history.
+    'databases': [],
+    # Organization slug -> database alias.
+    'organizations': {},
+}
+
+SHARDED_MODELS = ('gameplay', 'situationoutcomesummary', 'recommendationtext')
+ORGANIZATION_MAX_LENGTH = 64
+
+_organization = contextvars.ContextVar('playcalling_organization', default='')
+
+
+def shard_options():
+    return {**DEFAULT_SHARD_SETTINGS, **getattr(settings, 'PLAYCALLING_SHARDS', {})}
+
+
+def database_for(organization):
+    """Alias of the database holding ``organization``'s plays."""
+    return shard_options()['organizations'].get(organization or '', DEFAULT_DB_ALIAS)
+
+
+def current_organization():
+    return _organization.get()
+
+
+def play_database():
+    """Alias of the database holding the current organization's plays."""
+    return database_for(_organization.get())
+
+
+def play_databases():
+    """Every database that organizations' plays are routed to, ``default`` first."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *shard_options()['organizations'].values()]))
+
+
+def shard_databases():
+    """``play_databases`` plus shards that no organization uses (any more)."""
+    return list(dict.fromkeys([*play_databases(), *shard_options()['databases']]))
+
+
+@contextmanager
+def use_organization(organization):
+    """Route history queries in the block to ``organization``'s database."""
+    token = _organization.set(organization or '')
+    try:
+        yield
+    finally:
+        _organization.reset(token)
+
+
+def organization_plays(queryset):
+    """``queryset`` narrowed to the current organization's plays; the router picks their database."""
+    organization = _organization.get()
+    return queryset.filter(organization=organization) if organization else queryset
+
+
+def _is_sharded(model):
+    return model._meta.app_label == 'playcalling' and model._meta.model_name in SHARDED_MODELS
+
+
+class PlayHistoryRouter:
+    """Route the play history tables by organization; leave everything else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        return self._database(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._database(model, hints.get('instance'))
+
+    def _database(self, model, instance):
+        if not _is_sharded(model):
+            return None
+        if instance is not None:
+            if instance._state.db is not None:
+                return instance._state.db
+            if hasattr(instance, 'organization'):
+                return database_for(instance.organization)
+        return play_database()
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in shard_options()['databases']:
+            return None
+        return app_label == 'playcalling' and model_name in SHARDED_MODELS
+
+
+def request_organization(request):
+    """The organization named by ``request``; raises ``ValidationError`` for a malformed one."""
+    organization = request.headers.get('X-Organization') or request.GET.get('organization')
+    if not organization and '_changelist_filters' in request.GET:
+        organization = QueryDict(request.GET['_changelist_filters']).get('organization')
+    if not organization:
+        return ''
+    if len(organization) > ORGANIZATION_MAX_LENGTH:
+        raise ValidationError(f'Ensure this value has at most {ORGANIZATION_MAX_LENGTH} characters.')
+    validate_slug(organization)
+    return organization
+
+
+class OrganizationMiddleware:
+    """Route the request's history queries to its organization's database."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            organization = request_organization(request)
+        except ValidationError as exc:
+            return JsonResponse({'organization': exc.messages}, status=400)
+        with use_organization(organization):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        try:
+            organization = request_organization(request)
+        except ValidationError as exc:
+            return JsonResponse({'organization': exc.messages}, status=400)
+        with use_organization(organization):
+            return await self.get_response(request)
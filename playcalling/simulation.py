@@ -0,0 +1,383 @@
+"""
+Monte Carlo simulation of the rest of an inning, for tactical decisions.
+
+The rules engine gives fixed advice on the steal, the squeeze and the
+first-and-third throw. This module puts numbers on those choices. Every
+option is applied to many copies of the current situation, and each copy is
+played out to the third out with a league-average plate appearance model. The
+options are then compared on expected runs, or in high-leverage spots on the
+chance of scoring at all.
+
+A trial is one integer base-out state (``outs * 8 + bases``; 24 means the
+inning is over). Plate appearances are drawn for all live trials at once and
+applied through precomputed transition tables, so a pass over tens of
+thousands of trials is a few NumPy lookups.
+
+Trials run in fixed-size chunks, and each chunk has its own seed derived from
+the request seed. Results therefore do not depend on whether the chunks ran in
+this process or on the process pool that large requests fan out to. Every
+option in a situation shares the same random streams (common random numbers),
+so differences between options are not swamped by noise.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .recommendations import _high_leverage
+from .situations import BASE_OUT_STATES, BASE_STATES, context_base_out_state
+
+PA_OUTCOMES = ('strikeout', 'ground_out', 'fly_out', 'walk', 'single', 'double', 'triple', 'home_run')
+# Rough major-league rates per plate appearance.
+PA_PROBABILITIES = (0.225, 0.21, 0.255, 0.09, 0.14, 0.045, 0.004, 0.031)
+STRIKEOUT, GROUND_OUT, FLY_OUT, WALK, SINGLE, DOUBLE, TRIPLE, HOME_RUN = range(len(PA_OUTCOMES))
+# Drawn for a ground out; becomes a plain ground out when there is no force at second.
+DOUBLE_PLAY = len(PA_OUTCOMES)
+DOUBLE_PLAY_RATE = 0.45
+
+INNING_OVER = BASE_OUT_STATES
+# Run totals at or above this share the last bucket of the distribution.
+RUN_BUCKETS = 5
+# Plate appearances before a trial is cut off; no real inning gets close.
+MAX_PLATE_APPEARANCES = 60
+
+DEFAULT_SIMULATION_SETTINGS = {
+    'trials': 20000,
+    'max_trials': 200000,
+    'max_situations': 100,
+    # Trials per seeded chunk, the unit of work sent to the process pool.
+    'chunk_trials': 10000,
+    # Process pool size for large requests; None uses every CPU, 0 stays in process.
+    'workers': None,
+    # Total trials in one request above which chunks go to the pool.
+    'parallel_threshold': 200000,
+    # Seed for requests that do not send one; None draws fresh entropy.
+    'seed': None,
+    # Add the simulated comparison to every recommendation's key_points.
+    'merge_into_recommendations': False,
+    'steal_success': 0.72,
+    'squeeze_success': 0.6,
+    # First-and-third: runner from first thrown out at second, runner from third scoring on the throw.
+    'throw_out_rate': 0.6,
+    'delay_score_rate': 0.3,
+}
+
+
+def simulation_options():
+    return {**DEFAULT_SIMULATION_SETTINGS, **getattr(settings, 'PLAYCALLING_SIMULATION', {})}
+
+
+def _popcount(bases):
+    return bin(bases).count('1')
+
+
+def _state(outs, bases):
+    return INNING_OVER if outs >= 3 else outs * BASE_STATES + bases
+
+
+def _plate_appearance(outs, bases, event):
+    """``(outs, bases, runs)`` after one plate appearance; no run counts on the third out."""
+    if event == DOUBLE_PLAY and (not bases & 1 or outs == 2):
+        event = GROUND_OUT
+    if event == STRIKEOUT:
+        return outs + 1, bases, 0
+    if event == GROUND_OUT:
+        # Batter out, every runner moves up a base.
+        return outs + 1, (bases << 1) & 7, bases >> 2
+    if event == DOUBLE_PLAY:
+        return outs + 2, ((bases & 6) << 1) & 7, bases >> 2
+    if event == FLY_OUT:
+        # Runner on third tags and scores.
+        return outs + 1, bases & 3, bases >> 2
+    if event == WALK:
+        forced = bases | 1 if not bases & 1 else (bases | 2 if not bases & 2 else (bases | 4 if not bases & 4 else 7))
+        return outs, forced, int(bases == 7)
+    if event == SINGLE:
+        return outs, 1 | ((bases & 1) << 1), _popcount(bases & 6)
+    if event == DOUBLE:
+        return outs, 2 | ((bases & 1) << 2), _popcount(bases & 6)
+    if event == TRIPLE:
+        return outs, 4, _popcount(bases)
+    return outs, 0, _popcount(bases) + 1
+
+
+def _transition_tables():
+    """``(next_state, runs)``, each ``(states + 1, events)``; the last row keeps finished innings finished."""
+    events = len(PA_OUTCOMES) + 1
+    next_state = np.full((BASE_OUT_STATES + 1, events), INNING_OVER, dtype=np.int8)
+    runs = np.zeros((BASE_OUT_STATES + 1, events), dtype=np.int8)
+    for state in range(BASE_OUT_STATES):
+        outs, bases = divmod(state, BASE_STATES)
+        for event in range(events):
+            new_outs, new_bases, scored = _plate_appearance(outs, bases, event)
+            next_state[state, event] = _state(new_outs, new_bases)
+            runs[state, event] = scored if new_outs < 3 else 0
+    return next_state, runs
+
+
+NEXT_STATE, PA_RUNS = _transition_tables()
+_PA_THRESHOLDS = np.cumsum(PA_PROBABILITIES)
+
+
+# Tactics ------------------------------------------------------------------
+#
+# Each option maps the starting situation to weighted outcomes
+# ``(probability, outs, bases, runs)`` applied before the plate appearances.
+
+def _steal(outs, bases, rates):
+    success = rates['steal_success']
+    return [(success, outs, (bases & ~1) | 2, 0), (1 - success, outs + 1, bases & ~1, 0)]
+
+
+def _squeeze(outs, bases, rates):
+    success = rates['squeeze_success']
+    return [
+        # Sacrifice: batter out, the run scores and the other runners move up.
+        (success, outs + 1, ((bases & 3) << 1) & 7, 1),
+        # Bunt missed: the runner from third is tagged out, the batter keeps hitting.
+        (1 - success, outs + 1, bases & 3, 0),
+    ]
+
+
+def _throw_through(outs, bases, rates):
+    out, score = rates['throw_out_rate'], rates['delay_score_rate']
+    return [
+        # A run does not count when the tag at second is the third out.
+        (out * score, outs + 1, 0, 1 if outs < 2 else 0),
+        (out * (1 - score), outs + 1, 4, 0),
+        ((1 - out) * score, outs, 2, 1),
+        ((1 - out) * (1 - score), outs, 6, 0),
+    ]
+
+
+def _concede_second(outs, bases, rates):
+    # The runner from first takes second unchallenged.
+    return [(1.0, outs, (bases & ~1) | 2, 0)]
+
+
+class Decision:
+    def __init__(self, name, label, side, applies, options):
+        self.name = name
+        self.label = label
+        # 'offense' picks the most runs, 'defense' the fewest.
+        self.side = side
+        self.applies = applies
+        # Option name -> tactic; None plays the inning out unchanged.
+        self.options = options
+
+
+DECISIONS = (
+    Decision(
+        'steal',
+        'steal of second',
+        'offense',
+        lambda outs, bases: bases & 3 == 1 and outs < 2,
+        {'steal': _steal, 'stay': None},
+    ),
+    Decision(
+        'squeeze',
+        'squeeze',
+        'offense',
+        lambda outs, bases: bool(bases & 4) and outs < 2,
+        {'squeeze': _squeeze, 'swing_away': None},
+    ),
+    Decision(
+        'first_and_third',
+        'first-and-third throw',
+        'defense',
+        lambda outs, bases: bases == 5,
+        {'throw_through': _throw_through, 'hold': _concede_second},
+    ),
+)
+DECISIONS_BY_NAME = {decision.name: decision for decision in DECISIONS}
+
+
+def simulate_chunk(state, tactic, trials, seed_sequence, rates):
+    """
+    Histogram of runs scored in ``trials`` innings from ``state`` after
+    ``tactic`` (``(decision, option)`` or None). Plain NumPy, so it runs in pool workers.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    # Always drawn, so every option consumes the random stream the same way.
+    tactic_draws = rng.random(trials)
+    outs, bases = divmod(state, BASE_STATES)
+    outcomes = [(1.0, outs, bases, 0)]
+    if tactic is not None:
+        decision, option = tactic
+        outcomes = DECISIONS_BY_NAME[decision].options[option](outs, bases, rates)
+    thresholds = np.cumsum([outcome[0] for outcome in outcomes])
+    picked = np.minimum(np.searchsorted(thresholds, tactic_draws, side='right'), len(outcomes) - 1)
+    starts = np.array([_state(outcome[1], outcome[2]) for outcome in outcomes], dtype=np.int8)
+    states = starts[picked]
+    runs = np.array([outcome[3] for outcome in outcomes], dtype=np.int64)[picked]
+
+    live = np.flatnonzero(states != INNING_OVER)
+    for _ in range(MAX_PLATE_APPEARANCES):
+        if not live.size:
+            break
+        events = np.searchsorted(_PA_THRESHOLDS, rng.random(live.size), side='right')
+        np.minimum(events, len(PA_OUTCOMES) - 1, out=events)
+        events[(events == GROUND_OUT) & (rng.random(live.size) < DOUBLE_PLAY_RATE)] = DOUBLE_PLAY
+        current = states[live]
+        runs[live] += PA_RUNS[current, events]
+        states[live] = NEXT_STATE[current, events]
+        live = live[states[live] != INNING_OVER]
+    return np.bincount(np.minimum(runs, RUN_BUCKETS - 1), minlength=RUN_BUCKETS)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool for large requests, or None when ``workers`` is 0."""
+    global _pool
+    workers = simulation_options()['workers']
+    if workers == 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned, not forked: forking a threaded server can deadlock the children.
+                _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=get_context('spawn'))
+    return _pool
+
+
+def _run_chunk(job):
+    return simulate_chunk(*job)
+
+
+def _summary(histogram):
+    trials = int(histogram.sum())
+    distribution = histogram / trials
+    return {
+        'expected_runs': round(float(histogram @ np.arange(RUN_BUCKETS)) / trials, 4),
+        'score_probability': round(1 - float(distribution[0]), 4),
+        'runs_distribution': [round(float(share), 4) for share in distribution],
+    }
+
+
+# Drawn seeds stay below 2**53 so JavaScript clients can send them back unchanged.
+SEED_BITS = 53
+
+
+def _resolve_seed(seed):
+    if seed is None:
+        seed = simulation_options()['seed']
+    return secrets.randbits(SEED_BITS) if seed is None else int(seed)
+
+
+def simulate_situations(situations, trials=None, seed=None, parallel=None):
+    """
+    Simulate every applicable decision for each situation.
+
+    Returns ``(seed, results)``; passing the seed back reproduces the results.
+    ``parallel`` forces the process pool on or off instead of going by size.
+    """
+    options = simulation_options()
+    trials = trials or options['trials']
+    seed = _resolve_seed(seed)
+    chunk_trials = options['chunk_trials']
+    chunks = [min(chunk_trials, trials - start) for start in range(0, trials, chunk_trials)]
+
+    plans, jobs = [], []
+    for index, context in enumerate(situations):
+        state = context_base_out_state(context)
+        outs, bases = divmod(state, BASE_STATES)
+        decisions = [decision for decision in DECISIONS if decision.applies(outs, bases)]
+        tactics = [None] + [
+            (decision.name, option)
+            for decision in decisions
+            for option, apply in decision.options.items()
+            if apply is not None
+        ]
+        plans.append((context, decisions, tactics))
+        for tactic in tactics:
+            for chunk, size in enumerate(chunks):
+                jobs.append((state, tactic, size, np.random.SeedSequence(seed, spawn_key=(index, chunk)), options))
+
+    if parallel is None:
+        parallel = trials * len(jobs) / len(chunks) > options['parallel_threshold'] if jobs else False
+    pool = get_pool() if parallel else None
+    histograms = iter(pool.map(_run_chunk, jobs) if pool is not None else map(_run_chunk, jobs))
+
+    results = []
+    for context, decisions, tactics in plans:
+        totals = {tactic: sum(next(histograms) for _ in chunks) for tactic in tactics}
+        results.append(_situation_result(context, decisions, totals, trials))
+    return seed, results
+
+
+def _situation_result(context, decisions, totals, trials):
+    baseline = _summary(totals[None])
+    # Late and close, one run matters more than a big inning.
+    if _high_leverage(int(context['inning']), int(context['score_difference'])):
+        objective = 'score_probability'
+    else:
+        objective = 'expected_runs'
+    result = {'trials': trials, 'objective': objective, **baseline, 'decisions': []}
+    for decision in decisions:
+        outcomes = {
+            option: baseline if apply is None else _summary(totals[(decision.name, option)])
+            for option, apply in decision.options.items()
+        }
+        pick = max if decision.side == 'offense' else min
+        best = pick(outcomes, key=lambda option: outcomes[option][objective])
+        result['decisions'].append(
+            {'decision': decision.name, 'side': decision.side, 'best': best, 'options': outcomes}
+        )
+    return result
+
+
+def simulation_key():
+    """Part of the response cache key: merged simulations change the recommendation text."""
+    options = simulation_options()
+    if not options['merge_into_recommendations']:
+        return '-'
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+
+def annotate_simulation(recommendation, context):
+    """
+    Append the simulated comparison for each applicable decision to
+    ``key_points`` when ``merge_into_recommendations`` is on. Merged runs use
+    the configured seed (0 when unset) so responses stay cacheable.
+    """
+    options = simulation_options()
+    if not options['merge_into_recommendations']:
+        return recommendation
+    outs, bases = divmod(context_base_out_state(context), BASE_STATES)
+    if not any(decision.applies(outs, bases) for decision in DECISIONS):
+        return recommendation
+    _, (result,) = simulate_situations([context], seed=options['seed'] or 0, parallel=False)
+    metric = result['objective']
+    unit = 'expected runs' if metric == 'expected_runs' else 'chance to score'
+    for entry in result['decisions']:
+        label = DECISIONS_BY_NAME[entry['decision']].label
+        values = ', '.join(
+            f"{option.replace('_', ' ')} {summary[metric]:.2f}" for option, summary in entry['options'].items()
+        )
+        recommendation['key_points'].append(
+            f"Simulated {label} ({unit}, {result['trials']:,} innings): {values}; "
+            f"best: {entry['best'].replace('_', ' ')}."
+        )
+    return recommendation
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    global _pool
+    if setting == 'PLAYCALLING_SIMULATION':
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+# Situation space sizes used to pack a game state into a small integer.
+BASE_STATES = 8  # runner on first/second/third as a 3-bit mask
+BASE_OUT_STATES = 3 * BASE_STATES  # 0-2 outs for every base state
+COUNTS = 4 * 3  # 0-3 balls by 0-2 strikes
+BASE_OUT_COUNT_STATES = BASE_OUT_STATES * COUNTS
+
+
+def base_state_bits(first: object, second: object, third: object) -> int:
+    """Pack the occupied bases into a 3-bit mask (first=1, second=2, third=4)."""
+    return int(bool(first)) | (int(bool(second)) << 1) | (int(bool(third)) << 2)
+
+
+def pack_count(balls: int, strikes: int) -> int:
+    return int(balls) * 3 + int(strikes)
+
+
+def unpack_count(count: int) -> Tuple[int, int]:
+    return divmod(int(count), 3)
+
+
+def pack_base_out_state(outs: int, first: object, second: object, third: object) -> int:
+    """Encode outs and runners as one of the 24 classic base-out states."""
+    return int(outs) * BASE_STATES + base_state_bits(first, second, third)
+
+
+def unpack_base_out_state(state: int) -> Tuple[int, bool, bool, bool]:
+    outs, bits = divmod(int(state), BASE_STATES)
+    return outs, bool(bits & 1), bool(bits & 2), bool(bits & 4)
+
+
+def pack_base_out_count(base_out_state: int, count: int) -> int:
+    return int(base_out_state) * COUNTS + int(count)
+
+
+def base_out_state_label(state: int) -> str:
+    """Human readable label such as ``2 out, 1-3``."""
+    outs, first, second, third = unpack_base_out_state(state)
+    bases = '-'.join(str(base) for base, on in ((1, first), (2, second), (3, third)) if on)
+    return f"{outs} out, {bases or 'empty'}"
+
+
+def context_base_out_state(context: Dict[str, object]) -> int:
+    return pack_base_out_state(
+        context['outs'],
+        context.get('runners_on_first'),
+        context.get('runners_on_second'),
+        context.get('runners_on_third'),
+    )
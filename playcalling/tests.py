@@ -1,10 +1,53 @@
-from django.test import SimpleTestCase, TestCase
+import io
+import itertools
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import GamePlay
-from .recommendations import generate_recommendation
+from .analytics import rebuild_summary
+from .archive import SeasonBuilder, archived_chunks, archived_seasons
+from .benchmarking import async_views, compare_to_baseline, percentile, synthetic_sequence
+from .cache import get_response_cache
+from .filters import filter_plays
+from .gamesessions import apply_events
+from .history import get_outcome_table, history_pitches, outcome_class, table_path
+from .importer import import_plays, read_rows
+from .interning import get_text_cache, intern_texts
+from .live import get_channels, merge_patch
+from .models import GamePlay, GameSession, RecommendationText, RulePack, SituationOutcomeSummary
+from .recommendations import (
+    DECISION_TABLE_SIZE,
+    decision_table,
+    engine_fingerprint,
+    generate_recommendation,
+    lookup_recommendation,
+    representative_context,
+    situation_header,
+    situation_key,
+)
+from .replicas import PIN_COOKIE
+from .rulepacks import RulePackError, compile_pack, in_event_loop, load_default_pack, shipped_pack
+from .runexpectancy import RunExpectancy, load_sequence
+from .serializers import GamePlaySerializer
+from .simulation import DECISIONS_BY_NAME, DOUBLE_PLAY, INNING_OVER, NEXT_STATE, PA_RUNS, WALK
+from .timing import phase
+from .validation import GamePlayValidator
+from .views import _render_recommendation
+from .writebehind import WriteBehindBuffer
 
 
 class RecommendationEngineTests(SimpleTestCase):
@@ -55,6 +98,77 @@ class RecommendationEngineTests(SimpleTestCase):
         )
 
 
+class DecisionTableTests(SimpleTestCase):
+    def test_table_covers_every_packed_situation(self):
+        self.assertEqual(len(decision_table()), DECISION_TABLE_SIZE)
+
+    def test_lookup_matches_rules_engine_exhaustively(self):
+        situations = itertools.product(
+            range(3),
+            range(4),
+            range(3),
+            itertools.product([False, True], repeat=3),
+            [1, 6, 7, 9, 12],
+            ['top', 'bottom'],
+            range(-4, 5),
+        )
+        for outs, balls, strikes, (first, second, third), inning, half, score in situations:
+            context = {
+                'offense_team': 'Visitors',
+                'defense_team': 'Home',
+                'inning': inning,
+                'half_inning': half,
+                'outs': outs,
+                'balls': balls,
+                'strikes': strikes,
+                'runners_on_first': first,
+                'runners_on_second': second,
+                'runners_on_third': third,
+                'score_difference': score,
+            }
+            expected = generate_recommendation(context)
+            actual = lookup_recommendation(context)
+            if actual != expected or repr(actual) != repr(expected):
+                self.fail(f'Decision table diverges from the rules engine for {context}')
+
+    def test_lookup_returns_independent_copies(self):
+        context = {
+            'inning': 3,
+            'half_inning': 'top',
+            'outs': 0,
+            'balls': 0,
+            'strikes': 0,
+            'score_difference': 0,
+        }
+        first = lookup_recommendation(context)
+        first['defensive_alignment']['infield'] = 'changed'
+        first['key_points'].append('changed')
+
+        self.assertEqual(lookup_recommendation(context), generate_recommendation(context))
+
+
+class BenchmarkHelperTests(SimpleTestCase):
+    def test_percentiles_use_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_baseline_comparison_flags_regressions_over_threshold(self):
+        baseline = {'fast': {'p50_ms': 1.0}, 'slow': {'p50_ms': 1.0}, 'retired': {'p50_ms': 1.0}}
+        results = {'fast': {'p50_ms': 1.05}, 'slow': {'p50_ms': 1.5}, 'new': {'p50_ms': 9.0}}
+
+        comparison = {name: regressed for name, _, _, _, regressed in compare_to_baseline(results, baseline, 10)}
+
+        self.assertEqual(comparison, {'fast': False, 'slow': True})
+
+    def test_bench_needs_a_seeded_play(self):
+        with self.assertRaisesMessage(CommandError, '--rows must be at least 1'):
+            call_command('bench', '--rows', '0', stdout=io.StringIO())
+
+
 class RecommendationApiTests(APITestCase):
     def setUp(self):
         self.payload = {
@@ -93,29 +207,1657 @@ class RecommendationApiTests(APITestCase):
         self.assertTrue(play.offensive_sign)
         self.assertTrue(play.runner_instructions)
 
+    def test_precompiled_engine_returns_identical_response(self):
+        url = reverse('recommendation')
+        expected = self.client.post(url, data=self.payload, format='json')
 
-class GamePlayViewSetTests(APITestCase):
-    def test_list_endpoint_returns_saved_history(self):
-        GamePlay.objects.create(
-            offense_team='Visitors',
-            defense_team='Home',
-            inning=4,
-            half_inning='bottom',
-            outs=2,
-            balls=0,
-            strikes=2,
-            runners_on_first=False,
-            runners_on_second=True,
-            runners_on_third=False,
-            score_difference=-1,
-            offensive_sign='Aggressive approach.',
+        with override_settings(PLAYCALLING_ENGINE='precompiled'):
+            response = self.client.post(url, data=self.payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+
+
+class RecommendationCacheTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('recommendation')
+        self.payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 8,
+            'half_inning': 'bottom',
+            'outs': 1,
+            'balls': 0,
+            'strikes': 2,
+            'runners_on_first': True,
+            'runners_on_second': False,
+            'runners_on_third': True,
+            'score_difference': -1,
+        }
+
+    @override_settings(PLAYCALLING_RESPONSE_CACHE={'backend': 'local', 'max_entries': 2})
+    def test_cache_key_ignores_teams_notes_and_history_flag(self):
+        first = self.client.post(self.url, data=self.payload, format='json')
+        second = self.client.post(
+            self.url,
+            data={**self.payload, 'offense_team': 'Other', 'context_notes': 'Rain delay', 'save_to_history': True},
+            format='json',
         )
 
-        url = reverse('plays-list')
-        response = self.client.get(url)
+        stats = get_response_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(GamePlay.objects.get().offense_team, 'Other')
+
+    @override_settings(PLAYCALLING_RESPONSE_CACHE={'backend': 'local', 'max_entries': 1})
+    def test_local_cache_is_bounded(self):
+        self.client.post(self.url, data=self.payload, format='json')
+        self.client.post(self.url, data={**self.payload, 'outs': 2}, format='json')
+
+        stats = get_response_cache().stats()
+        self.assertEqual((stats['size'], stats['evictions']), (1, 1))
+
+    @override_settings(PLAYCALLING_RESPONSE_CACHE={'backend': 'django', 'alias': 'default'})
+    def test_django_cache_backend_and_metrics(self):
+        caches['default'].clear()
+        first = self.client.post(self.url, data=self.payload, format='json')
+        second = self.client.post(self.url, data=self.payload, format='json')
+
+        self.assertEqual(second.content, first.content)
+        metrics = self.client.get(reverse('metrics')).data['recommendation_cache']
+        self.assertEqual((metrics['hits'], metrics['alias']), (1, 'default'))
+
+    @override_settings(PLAYCALLING_RESPONSE_CACHE=None)
+    def test_get_revalidates_with_etag(self):
+        posted = self.client.post(self.url, data=self.payload, format='json')
+
+        fresh = self.client.get(self.url, self.payload)
+        revalidated = self.client.get(self.url, self.payload, HTTP_IF_NONE_MATCH=posted['ETag'])
+
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(fresh.content, posted.content)
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated['ETag'], posted['ETag'])
+        self.assertEqual(GamePlay.objects.count(), 0)
+
+
+@override_settings(PLAYCALLING_FAST_PATH=True)
+class FastPathRecommendationApiTests(RecommendationApiTests):
+    """Re-run the recommendation API tests through the fast validation path."""
+
+    def test_fast_path_matches_serializer_path(self):
+        url = reverse('recommendation')
+        payloads = [
+            self.payload,
+            {**self.payload, 'outs': '2', 'balls': 3.0, 'runners_on_third': 'true', 'context_notes': '  Late  '},
+            {**self.payload, 'half_inning': 'middle', 'outs': 3, 'inning': 0, 'runners_on_first': 'maybe'},
+            {**self.payload, 'offense_team': '', 'defense_team': None, 'score_difference': 'tied', 'strikes': True},
+            {key: value for key, value in self.payload.items() if key not in ('outs', 'balls', 'runners_on_first')},
+            {**self.payload, 'offense_team': 'x' * 129, 'save_to_history': 'sometimes'},
+            ['not', 'a', 'dict'],
+        ]
+        for payload in payloads:
+            with override_settings(PLAYCALLING_FAST_PATH=False):
+                expected = self.client.post(url, data=payload, format='json')
+            actual = self.client.post(url, data=payload, format='json')
+
+            self.assertEqual(actual.status_code, expected.status_code, payload)
+            self.assertEqual(actual.content, expected.content, payload)
+
+    def test_fast_path_accepts_form_encoded_payloads(self):
+        url = reverse('recommendation')
+        with override_settings(PLAYCALLING_FAST_PATH=False):
+            expected = self.client.post(url, data=self.payload)
+        actual = self.client.post(url, data=self.payload)
+
+        self.assertEqual(actual.content, expected.content)
+
+    def test_browsable_api_keeps_serializers(self):
+        response = self.client.post(reverse('recommendation'), data=self.payload, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'<html', response.content)
+
+
+@override_settings(PLAYCALLING_FAST_PATH=True)
+class FastPathRecommendationCacheTests(RecommendationCacheTests):
+    """Re-run the cache and ETag tests through the fast validation path."""
+
+
+@override_settings(PLAYCALLING_SERVER_TIMING=True, PLAYCALLING_SLOW_REQUEST_MS=None)
+class ServerTimingTests(APITestCase):
+    def test_recommendation_reports_phases_and_queries(self):
+        payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 2,
+            'half_inning': 'top',
+            'outs': 0,
+            'balls': 0,
+            'strikes': 0,
+            'score_difference': 3,
+            'save_to_history': True,
+        }
+
+        with override_settings(PLAYCALLING_RESPONSE_CACHE=None):
+            # The first play interns the recommendation's texts.
+            self.addCleanup(get_text_cache().clear)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('recommendation'), data=payload, format='json')
+            response = self.client.post(reverse('recommendation'), data=payload, format='json')
+
+        metrics = {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+        self.assertEqual(
+            list(metrics),
+            ['parse', 'validate', 'engine', 'serialize', 'history', 'db', 'total'],
+        )
+        self.assertIn('desc="1 queries"', metrics['db'])
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(PLAYCALLING_SLOW_REQUEST_MS=0):
+            # Middleware reads its settings when a new client loads it.
+            client = self.client_class()
+            with self.assertLogs('playcalling.timing', 'WARNING') as logs:
+                client.get(reverse('plays-list'))
+
+        self.assertIn('Slow request GET /api/plays/', logs.output[0])
+
+    @override_settings(PLAYCALLING_SERVER_TIMING=False)
+    def test_disabled_timing_removes_middleware(self):
+        response = self.client_class().get(reverse('plays-list'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    def test_phase_is_noop_outside_timed_requests(self):
+        with phase('engine') as timed:
+            pass
+
+        self.assertFalse(hasattr(timed, 'timings'))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 3,
+            'half_inning': 'top',
+            'outs': 1,
+            'balls': 2,
+            'strikes': 1,
+            'runners_on_first': True,
+            'runners_on_second': False,
+            'runners_on_third': False,
+            'score_difference': 1,
+        }
+        self.sync_recommendation = self.client.post(
+            reverse('recommendation'), self.payload, content_type='application/json'
+        )
+        for index in range(3):
+            GamePlay.objects.create(offense_team='Visitors', defense_team='Home', outs=index, balls=0, strikes=0)
+        self.sync_list = self.client.get(reverse('plays-list'), {'outs': 2})
+
+        self.enterContext(async_views())
+
+    async def test_recommendation_matches_sync_view_and_saves_history(self):
+        response = await self.async_client.post(
+            reverse('recommendation'),
+            {**self.payload, 'save_to_history': True},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.sync_recommendation.content)
+        self.assertEqual(response['ETag'], self.sync_recommendation['ETag'])
+        self.assertTrue(await GamePlay.objects.filter(generated_from_engine=True).aexists())
+
+    @override_settings(PLAYCALLING_RESPONSE_CACHE=None)
+    async def test_recommendations_are_rendered_off_the_event_loop(self):
+        on_event_loop = []
+
+        def render(validated):
+            on_event_loop.append(in_event_loop())
+            return _render_recommendation(validated)
+
+        with mock.patch('playcalling.async_views._render_recommendation', render):
+            response = await self.async_client.post(reverse('recommendation'), self.payload,
+                                                    content_type='application/json')
+
+        self.assertEqual(response.content, self.sync_recommendation.content)
+        self.assertEqual(on_event_loop, [False])
+
+    async def test_recommendation_get_honours_if_none_match(self):
+        response = await self.async_client.get(
+            reverse('recommendation'),
+            self.payload,
+            headers={'If-None-Match': self.sync_recommendation['ETag']},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_recommendation_errors_match_sync_view(self):
+        invalid = await self.async_client.post(
+            reverse('recommendation'), {**self.payload, 'outs': 3}, content_type='application/json'
+        )
+        malformed = await self.async_client.post(reverse('recommendation'), '{', content_type='application/json')
+
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(invalid.content), {'outs': ['Ensure this value is less than or equal to 2.']})
+        self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', json.loads(malformed.content)['detail'])
+
+    async def test_history_reads_match_sync_views(self):
+        listing = await self.async_client.get(reverse('plays-list'), {'outs': 2})
+        play_id = json.loads(listing.content)['results'][0]['id']
+        detail = await self.async_client.get(reverse('plays-detail', args=[play_id]))
+        missing = await self.async_client.get(reverse('plays-detail', args=[play_id + 1000]))
+
+        self.assertEqual(json.loads(listing.content), json.loads(self.sync_list.content))
+        self.assertEqual(json.loads(detail.content)['outs'], 2)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_history_writes_are_delegated_to_the_viewset(self):
+        response = await self.async_client.post(
+            reverse('plays-list'),
+            {'offense_team': 'Visitors', 'defense_team': 'Home', 'outs': 1, 'balls': 0, 'strikes': 0},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(await GamePlay.objects.acount(), 4)
+
+
+class LiveGameTests(TestCase):
+    def setUp(self):
+        self.payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 7,
+            'half_inning': 'top',
+            'outs': 2,
+            'balls': 1,
+            'strikes': 1,
+            'runners_on_first': True,
+            'runners_on_second': False,
+            'runners_on_third': True,
+            'score_difference': 0,
+        }
+
+    def test_merge_patch_keeps_only_changes(self):
+        previous = {'a': 1, 'b': {'x': 1, 'y': 2}, 'c': [1], 'gone': True}
+        current = {'a': 1, 'b': {'x': 1, 'y': 3}, 'c': [1, 2], 'new': 'value'}
+
+        self.assertEqual(
+            merge_patch(previous, current),
+            {'b': {'y': 3}, 'c': [1, 2], 'new': 'value', 'gone': None},
+        )
+        self.assertEqual(merge_patch(current, current), {})
+
+    async def _post_state(self, game_id, **changes):
+        return await self.async_client.post(
+            reverse('live-game-state', args=[game_id]),
+            {**self.payload, **changes},
+            content_type='application/json',
+        )
+
+    async def _next_event(self, events):
+        chunk = await anext(events)
+        return chunk.decode() if isinstance(chunk, bytes) else chunk
+
+    async def test_subscribers_get_a_snapshot_then_deltas(self):
+        state = await self._post_state('game-1')
+        response = await self.async_client.get(reverse('live-game-stream', args=['game-1']))
+        events = aiter(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue((await self._next_event(events)).startswith('retry: '))
+        snapshot = await self._next_event(events)
+        self.assertIn('event: snapshot', snapshot)
+        document = json.loads(snapshot.split('data: ', 1)[1])
+        self.assertEqual(document['recommendation'], json.loads(state.content))
+        self.assertEqual(document['situation']['balls'], 1)
+
+        await self._post_state('game-1', balls=2)
+        delta = await self._next_event(events)
+        self.assertIn('id: 2\nevent: delta', delta)
+        patch = json.loads(delta.split('data: ', 1)[1])
+        self.assertEqual(patch['situation'], {'balls': 2})
+        await events.aclose()
+
+    @override_settings(PLAYCALLING_LIVE_KEEPALIVE=0.01)
+    async def test_idle_streams_send_keepalives(self):
+        response = await self.async_client.get(reverse('live-game-stream', args=['quiet-game']))
+        events = aiter(response.streaming_content)
+
+        await self._next_event(events)
+        self.assertEqual(await self._next_event(events), ': keepalive\n\n')
+        await events.aclose()
+
+    @override_settings(PLAYCALLING_LIVE_KEEPALIVE=0.01, PLAYCALLING_LIVE_MAX_DURATION=0.05)
+    async def test_streams_close_after_the_maximum_duration(self):
+        response = await self.async_client.get(reverse('live-game-stream', args=['long-game']))
+        events = [chunk async for chunk in response.streaming_content]
+
+        self.assertIn(': keepalive\n\n', [event.decode() if isinstance(event, bytes) else event for event in events])
+        self.assertEqual(get_channels().get('long-game').subscribers, 0)
+
+    def test_stream_needs_an_asgi_server(self):
+        response = self.client.get(reverse('live-game-stream', args=['game-3']))
+
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_invalid_state_is_rejected(self):
+        response = await self._post_state('game-2', strikes=3)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('strikes', json.loads(response.content))
+
+
+class GameSessionTests(APITestCase):
+    def setUp(self):
+        # A fresh store per test: ids are reused after each test's rollback.
+        self.enterContext(override_settings(PLAYCALLING_SESSION_CACHE_SIZE=100))
+        self.situation = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 9,
+            'half_inning': 'top',
+            'outs': 1,
+            'balls': 0,
+            'strikes': 0,
+            'runners_on_first': False,
+            'runners_on_second': False,
+            'runners_on_third': False,
+            'score_difference': 1,
+            'context_notes': '',
+            'save_to_history': False,
+        }
+
+    def _start(self, **changes):
+        response = self.client.post(reverse('game-session-list'), {**self.situation, **changes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def _events(self, session, body):
+        return self.client.post(reverse('game-session-events', args=[session['id']]), body, format='json')
+
+    def test_events_advance_the_situation(self):
+        session = self._start(save_to_history=True)
+
+        response = self._events(session, {'events': [
+            {'type': 'ball'},
+            {'type': 'foul'},
+            {'type': 'runner_advance', 'from': 0, 'to': 1},
+            {'type': 'ball'},
+            {'type': 'ball'},
+        ]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 5)
+        state = response.data['state']
+        self.assertEqual((state['balls'], state['strikes'], state['runners_on_first']), (2, 0, True))
+        full_request = self.client.post(reverse('recommendation'), {**state, 'save_to_history': False}, format='json')
+        self.assertEqual(response.data['recommendation'], full_request.data)
+        self.assertEqual(GamePlay.objects.count(), 1)
+        self.assertEqual(GameSession.objects.get(pk=session['id']).balls, 2)
+
+    def test_walks_force_runners_and_the_third_out_switches_sides(self):
+        state = {**self.situation, 'balls': 3, 'runners_on_first': True, 'runners_on_second': True,
+                 'runners_on_third': True, 'version': 0}
+
+        walked = apply_events(state, [{'type': 'ball'}])
+        retired = apply_events(walked, [{'type': 'out', 'runner': 3}, {'type': 'strike'}] + [{'type': 'strike'}] * 2)
+
+        self.assertEqual((walked['score_difference'], walked['balls'], walked['runners_on_third']), (2, 0, True))
+        self.assertEqual(retired['half_inning'], 'bottom')
+        self.assertEqual(retired['offense_team'], 'Home')
+        self.assertEqual(retired['score_difference'], -2)
+        self.assertEqual((retired['outs'], retired['runners_on_first'], retired['version']), (0, False, 5))
+
+    def test_impossible_event_is_rejected_with_its_index(self):
+        session = self._start()
+
+        response = self._events(session, {'events': [{'type': 'ball'}, {'type': 'runner_advance', 'from': 2, 'to': 3}]})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'events': [{}, {'from': ['No runner on second.']}]})
+        self.assertEqual(GameSession.objects.get(pk=session['id']).version, 0)
+
+    def test_stale_local_copy_is_reloaded_and_versions_are_checked(self):
+        session = self._start()
+        # Another worker applied two events behind this process's back.
+        GameSession.objects.filter(pk=session['id']).update(balls=2, version=2)
+
+        response = self._events(session, {'type': 'ball', 'version': 2})
+        conflict = self._events(session, {'type': 'ball', 'version': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['version'], response.data['state']['balls']), (3, 3))
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+
+    def test_unknown_session_is_not_found(self):
+        response = self.client.post(reverse('game-session-events', args=[999]), {'type': 'ball'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DecisionTableApiTests(APITestCase):
+    def test_table_reproduces_every_recommendation(self):
+        response = self.client.get(reverse('recommendation-table'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        table = response.json()
+        strings = table['strings']
+        self.assertEqual(len(strings), len(set(strings)))
+        self.assertEqual(len(table['grid']), DECISION_TABLE_SIZE)
+        for key in range(DECISION_TABLE_SIZE):
+            context = representative_context(key)
+            pitch, catcher, alignment, signs, points = table['entries'][table['grid'][situation_key(context)]]
+            self.assertEqual(
+                {
+                    'pitch_call': strings[pitch],
+                    'catcher_plan': strings[catcher],
+                    'defensive_alignment': {strings[k]: strings[v] for k, v in zip(alignment[::2], alignment[1::2])},
+                    'offensive_signs': {strings[k]: strings[v] for k, v in zip(signs[::2], signs[1::2])},
+                    'key_points': [situation_header(context), *(strings[point] for point in points)],
+                },
+                generate_recommendation(context),
+            )
+
+    def test_clients_revalidate_with_the_etag(self):
+        etag = self.client.get(reverse('recommendation-table'))['ETag']
+
+        response = self.client.get(reverse('recommendation-table'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn(engine_fingerprint('rules'), etag)
+
+    @override_settings(PLAYCALLING_ENGINE='history')
+    def test_engines_without_a_complete_table_are_refused(self):
+        response = self.client.get(reverse('recommendation-table'))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(PLAYCALLING_SIMULATION={'merge_into_recommendations': True})
+    def test_table_is_refused_while_simulations_are_merged(self):
+        response = self.client.get(reverse('recommendation-table'))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BatchRecommendationApiTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('recommendation-batch')
+        self.situations = [
+            {
+                'offense_team': 'Visitors',
+                'defense_team': 'Home',
+                'inning': inning,
+                'half_inning': half,
+                'outs': outs,
+                'balls': balls,
+                'strikes': strikes,
+                'runners_on_first': outs != 1,
+                'runners_on_second': balls == 2,
+                'runners_on_third': strikes == 1,
+                'score_difference': inning - 7,
+            }
+            for inning, half, outs, balls, strikes in itertools.product(
+                [2, 7, 9], ['top', 'bottom'], range(3), range(4), range(3)
+            )
+        ]
+
+    def test_batch_matches_single_recommendations(self):
+        response = self.client.post(self.url, data={'situations': self.situations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(self.situations))
+        for situation, result in zip(self.situations, response.data['results']):
+            self.assertEqual(result, generate_recommendation(situation))
+
+    def test_columnar_payload_matches_row_payload(self):
+        columns = {name: [row[name] for row in self.situations] for name in self.situations[0]}
+
+        by_rows = self.client.post(self.url, data={'situations': self.situations}, format='json')
+        by_columns = self.client.post(self.url, data={'columns': columns}, format='json')
+
+        self.assertEqual(by_columns.status_code, status.HTTP_200_OK)
+        self.assertEqual(by_columns.data, by_rows.data)
+
+    def test_batch_can_bulk_persist_history(self):
+        payload = {'situations': self.situations[:5], 'save_to_history': True}
+        # Once their texts are interned and cached, plays cost a single INSERT.
+        self.addCleanup(get_text_cache().clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, data=payload, format='json')
+        GamePlay.objects.all().delete()
+
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, data=payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(GamePlay.objects.filter(generated_from_engine=True).count(), 5)
+
+    def test_invalid_situation_reports_row_errors(self):
+        situations = [self.situations[0], {**self.situations[1], 'outs': 3}]
+
+        response = self.client.post(self.url, data={'situations': situations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('outs', response.data['situations'][1])
+        self.assertEqual(GamePlay.objects.count(), 0)
+
+
+class WriteBehindBufferTests(TestCase):
+    def _play(self):
+        return GamePlay(offense_team='Visitors', defense_team='Home', outs=1, balls=0, strikes=0)
+
+    def test_flush_writes_queued_rows_in_batches(self):
+        buffer = WriteBehindBuffer(batch_size=2)
+        for _ in range(5):
+            buffer.submit(self._play())
+
+        self.assertEqual(GamePlay.objects.count(), 0)
+        self.assertEqual(buffer.stats()['depth'], 5)
+
+        buffer.flush()
+
+        stats = buffer.stats()
+        self.assertEqual(GamePlay.objects.count(), 5)
+        self.assertEqual(GamePlay.objects.first().base_out_state, 8)
+        self.assertEqual((stats['depth'], stats['written'], stats['flushes']), (0, 5, 3))
+
+    def test_full_queue_follows_overflow_policy(self):
+        dropping = WriteBehindBuffer(max_size=1, overflow='drop')
+        inline = WriteBehindBuffer(max_size=1, overflow='sync')
+
+        self.assertTrue(dropping.submit(self._play()))
+        with self.assertLogs('playcalling.writebehind', 'WARNING'):
+            self.assertFalse(dropping.submit(self._play()))
+        inline.submit(self._play())
+        inline.submit(self._play())
+
+        self.assertEqual(dropping.stats()['dropped'], 1)
+        self.assertEqual(inline.stats()['written_inline'], 1)
+        self.assertEqual(GamePlay.objects.count(), 1)
+
+
+class WriteBehindThreadTests(TransactionTestCase):
+    def test_background_thread_flushes_on_stop(self):
+        buffer = WriteBehindBuffer(flush_interval=0.01)
+        buffer.start()
+        buffer.submit(GamePlay(offense_team='Visitors', defense_team='Home', outs=1, balls=0, strikes=0))
+        buffer.stop()
+
+        self.assertFalse(buffer.stats()['running'])
+        self.assertEqual(buffer.stats()['depth'], 0)
+        self.assertEqual(GamePlay.objects.count(), 1)
+
+    def test_failed_batch_only_loses_the_failing_rows(self):
+        buffer = WriteBehindBuffer()
+        for inning in (1, None, 3):
+            buffer.submit(GamePlay(offense_team='Visitors', defense_team='Home', inning=inning, outs=1, balls=0,
+                                   strikes=0))
+
+        with self.assertLogs('playcalling.writebehind', 'WARNING') as logs:
+            buffer.flush()
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual((buffer.stats()['written'], buffer.stats()['failed']), (2, 1))
+        self.assertEqual(sorted(GamePlay.objects.values_list('inning', flat=True)), [1, 3])
+
+    def test_restarting_registers_one_exit_hook(self):
+        buffer = WriteBehindBuffer(flush_interval=0.01)
+        with mock.patch('playcalling.writebehind.atexit.register') as register:
+            for _ in range(2):
+                buffer.start()
+                buffer.stop()
+
+        register.assert_called_once_with(buffer.stop)
+
+
+class PlayImportTests(APITestCase):
+    csv_log = (
+        'offense_team,defense_team,inning,half_inning,outs,balls,strikes,runners_on_first,'
+        'score_difference,actual_outcome,created_at\n'
+        'Visitors,Home,3,top,1,2,1,true,0,Ground out,2024-04-01T18:30:00Z\n'
+        'Visitors,Home,3,top,4,0,0,false,0,,\n'
+        'Visitors,Home,3,bottom,0,0,0,0,-1,Single,2024-04-01T18:40:00Z\n'
+    )
+
+    def test_csv_import_with_rejects_and_source_timestamps(self):
+        rejects = []
+        result = import_plays(
+            read_rows(io.StringIO(self.csv_log), 'csv'),
+            chunk_size=1,
+            reject=lambda line, row, errors: rejects.append((line, errors)),
+        )
+
+        self.assertEqual((result.imported, result.rejected), (2, 1))
+        self.assertEqual(rejects, [(3, {'outs': ['Ensure this value is less than or equal to 2.']})])
+        play = GamePlay.objects.get(actual_outcome='Ground out')
+        self.assertEqual(play.created_at.isoformat(), '2024-04-01T18:30:00+00:00')
+        self.assertEqual(play.base_out_state, 9)
+        self.assertEqual(play.recommended_pitch, '')
+
+    def test_jsonl_import_can_backfill_recommendations(self):
+        log = '\n'.join([
+            json.dumps({'offense_team': 'A', 'defense_team': 'B', 'outs': 2, 'balls': 3, 'strikes': 2}),
+            'not json',
+            '',
+        ])
+
+        result = import_plays(read_rows(io.StringIO(log), 'jsonl'), backfill=True)
+
+        self.assertEqual((result.imported, result.rejected), (1, 1))
+        play = GamePlay.objects.get()
+        expected = generate_recommendation({
+            'inning': 1, 'half_inning': 'top', 'outs': 2, 'balls': 3, 'strikes': 2, 'score_difference': 0,
+        })
+        self.assertEqual(play.recommended_pitch, expected['pitch_call'])
+        self.assertEqual(play.defensive_alignment, expected['defensive_alignment'])
+
+    def test_validator_matches_serializer_errors(self):
+        rows = [
+            {'offense_team': '', 'defense_team': 'B', 'outs': 'x', 'balls': 4, 'strikes': 1.5},
+            {'offense_team': 'A', 'defense_team': True, 'outs': 1, 'half_inning': 'middle', 'runners_on_first': 'maybe'},
+            {'offense_team': 'A', 'defense_team': 'B', 'outs': '2', 'balls': '3.0', 'strikes': 0, 'inning': None},
+        ]
+        for row in rows:
+            serializer = GamePlaySerializer(data=row)
+            serializer.is_valid()
+            _, errors = GamePlayValidator().validate(row)
+            self.assertEqual(errors, serializer.errors)
+
+    def test_management_command_writes_reject_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'log.csv')
+            reject_path = os.path.join(directory, 'rejects.jsonl')
+            with open(log_path, 'w', encoding='utf-8') as log:
+                log.write(self.csv_log)
+
+            call_command('import_plays', log_path, '--reject-file', reject_path, stdout=io.StringIO())
+
+            with open(reject_path, encoding='utf-8') as rejects:
+                lines = [json.loads(line) for line in rejects]
+
+        self.assertEqual(GamePlay.objects.count(), 2)
+        self.assertEqual([line['line'] for line in lines], [3])
+
+    def test_upload_endpoint_reports_rejects(self):
+        upload = SimpleUploadedFile('log.csv', self.csv_log.encode('utf-8'), content_type='text/csv')
+
+        response = self.client.post(reverse('plays-import-log'), {'file': upload}, format='multipart')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (2, 1))
+        self.assertEqual(response.data['rejects'][0]['line'], 3)
+        self.assertEqual(GamePlay.objects.count(), 2)
+
+    def test_undecodable_and_malformed_lines_are_rejected(self):
+        log = (
+            self.csv_log.encode('utf-8')
+            + 'Visitors,Home,4,top,0,0,0,false,0,Hit by pitch – Andr\u00e9,\n'.encode('latin-1', 'replace')
+            + f'Visitors,Home,4,top,0,0,0,false,0,{"x" * 200000},\n'.encode('utf-8')
+            + b'Visitors,Home,5,top,0,0,0,false,0,Walk,\n'
+        )
+        upload = SimpleUploadedFile('log.csv', log, content_type='text/csv')
+
+        response = self.client.post(reverse('plays-import-log'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (3, 3))
+        self.assertEqual([reject['line'] for reject in response.data['rejects']], [3, 5, 6])
+        self.assertEqual(response.data['rejects'][1]['errors'], {'non_field_errors': ['Not valid UTF-8 text.']})
+        self.assertIn('field larger than field limit', response.data['rejects'][2]['errors']['non_field_errors'][0])
+        self.assertTrue(GamePlay.objects.filter(actual_outcome='Walk').exists())
+
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'log.csv')
+            with open(log_path, 'wb') as handle:
+                handle.write(log)
+            out = io.StringIO()
+            call_command('import_plays', log_path, stdout=out)
+        self.assertIn('Imported 3 plays, rejected 3.', out.getvalue())
+
+
+class PlayExportTests(APITestCase):
+    def setUp(self):
+        self.plays = [
+            GamePlay.objects.create(
+                offense_team='Visitors',
+                defense_team='Home',
+                inning=inning,
+                outs=outs,
+                balls=1,
+                strikes=1,
+                runners_on_first=True,
+                defensive_alignment={'infield': 'Double-play depth'},
+            )
+            for inning, outs in [(2, 0), (5, 2), (8, 2)]
+        ]
+
+    def test_ndjson_export_matches_serializer_output(self):
+        response = self.client.get(reverse('plays-export'), {'format': 'ndjson'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        expected = json.loads(json.dumps(GamePlaySerializer(self.plays[::-1], many=True).data))
+        self.assertEqual(rows, expected)
+
+    def test_csv_export_applies_filters_and_round_trips_through_import(self):
+        response = self.client.get(reverse('plays-export'), {'format': 'csv', 'outs': 2, 'inning_min': 6})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(read_rows(io.StringIO(content), 'csv'))
+        self.assertEqual(len(rows), 1)
+        _, row, errors = rows[0]
+        self.assertIsNone(errors)
+        validated, errors = GamePlayValidator().validate(row)
+        self.assertEqual(errors, {})
+        self.assertEqual(validated['inning'], 8)
+        self.assertEqual(validated['defensive_alignment'], {'infield': 'Double-play depth'})
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get(reverse('plays-export'), {'format': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_filters_by_date(self):
+        response = self.client.get(reverse('plays-export'), {'created_before': '2000-01-01'})
+
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+
+class SituationSummaryTests(APITestCase):
+    def _play(self, **overrides):
+        fields = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'outs': 2,
+            'balls': 3,
+            'strikes': 2,
+            'runners_on_first': True,
+            'recommended_pitch': 'Slider',
+        }
+        fields.update(overrides)
+        return fields
+
+    def _counts(self):
+        return {
+            (row.base_out_state, row.recommended_pitch, row.outcome): row.count
+            for row in SituationOutcomeSummary.objects.all()
+        }
+
+    def test_summary_follows_creates_patches_and_deletes(self):
+        play = GamePlay.objects.create(**self._play())
+        GamePlay.objects.create(**self._play(actual_outcome='Strikeout'))
+        self.assertEqual(self._counts(), {(17, 'Slider', 'Strikeout'): 1})
+
+        response = self.client.patch(
+            reverse('plays-detail', args=[play.pk]), {'actual_outcome': '  Strikeout '}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._counts(), {(17, 'Slider', 'Strikeout'): 2})
+
+        self.client.patch(reverse('plays-detail', args=[play.pk]), {'actual_outcome': 'Walk'}, format='json')
+        self.assertEqual(self._counts(), {(17, 'Slider', 'Strikeout'): 1, (17, 'Slider', 'Walk'): 1})
+
+        GamePlay.objects.filter(actual_outcome='Strikeout').delete()
+        self.assertEqual(self._counts(), {(17, 'Slider', 'Walk'): 1})
+
+    def test_bulk_create_and_rebuild_agree(self):
+        GamePlay.objects.bulk_create([
+            GamePlay(**self._play(actual_outcome='Ground out')),
+            GamePlay(**self._play(actual_outcome='Ground out')),
+            GamePlay(**self._play(outs=0, actual_outcome='Single')),
+            GamePlay(**self._play()),
+        ])
+        incremental = self._counts()
+
+        rebuild_summary()
+
+        self.assertEqual(incremental, {(17, 'Slider', 'Ground out'): 2, (1, 'Slider', 'Single'): 1})
+        self.assertEqual(self._counts(), incremental)
+
+    def test_analytics_endpoint_reads_summary(self):
+        GamePlay.objects.create(**self._play(actual_outcome='Ground out'))
+        GamePlay.objects.create(**self._play(actual_outcome='Walk'))
+        GamePlay.objects.create(**self._play(outs=0, actual_outcome='Single'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('analytics-situations'), {'outs': 2, 'bases': '1', 'count': '3-2'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        result = response.data['results'][0]
+        self.assertEqual(result['situation'], '2 out, 1')
+        self.assertEqual(result['total'], 2)
+        self.assertEqual(result['outcomes'], {'Ground out': 1, 'Walk': 1})
+
+
+@override_settings(PLAYCALLING_ENGINE='history')
+class HistoryEngineTests(APITestCase):
+    def setUp(self):
+        # Per test, so every test starts without a loaded table.
+        self.enterContext(override_settings(PLAYCALLING_HISTORY_ENGINE={'table_dir': None, 'min_samples': 3}))
+        self.payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 2,
+            'half_inning': 'top',
+            'outs': 0,
+            'balls': 0,
+            'strikes': 0,
+            'score_difference': 0,
+        }
+        self.rules = generate_recommendation(self.payload)
+        self.alternative = next(pitch for pitch in history_pitches() if pitch != self.rules['pitch_call'])
+
+    def _record(self, pitch, outcome, times):
+        GamePlay.objects.bulk_create(
+            GamePlay(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0,
+                     recommended_pitch=pitch, actual_outcome=outcome)
+            for _ in range(times)
+        )
+
+    def _recommend(self):
+        response = self.client.post(reverse('recommendation'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_outcomes_are_classified(self):
+        classes = [outcome_class(text) for text in ('Groundout to short', 'Hit by pitch', 'Line drive single',
+                                                     'Grounded into double play', 'Reached on error')]
+
+        self.assertEqual(classes, [0, 1, 2, 0, 3])
+
+    def test_small_samples_fall_back_to_the_rules(self):
+        self._record(self.alternative, 'Strikeout', 2)
+
+        self.assertEqual(self._recommend(), self.rules)
+
+    def test_batch_uses_the_history_engine(self):
+        self._record(self.alternative, 'Strikeout', 3)
+
+        response = self.client.post(reverse('recommendation-batch'), {'situations': [self.payload]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['pitch_call'], self.alternative)
+        self.assertEqual(response.data['results'][0], self._recommend())
+
+    def test_pitch_with_the_best_recorded_out_rate_is_called(self):
+        self._record(self.rules['pitch_call'], 'Single to left', 3)
+        self._record(self.alternative, 'Strikeout', 2)
+        self.assertEqual(self._recommend()['pitch_call'], self.rules['pitch_call'])
+        # The callbacks also cache texts that the test's rollback removes.
+        self.addCleanup(get_text_cache().clear)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GamePlay.objects.create(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0,
+                                    recommended_pitch=self.alternative, actual_outcome='Flied out to center')
+        recommendation = self._recommend()
+
+        self.assertEqual(recommendation['pitch_call'], self.alternative)
+        self.assertIn('100% of 3 recorded plays', recommendation['key_points'][-1])
+        self.assertIsNone(get_response_cache())
+
+    def test_table_file_is_memory_mapped_by_later_workers(self):
+        self._record(self.alternative, 'Strikeout', 4)
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+
+        with override_settings(PLAYCALLING_HISTORY_ENGINE={'table_dir': directory, 'min_samples': 3}):
+            first = get_outcome_table()
+            self.assertTrue(os.path.exists(table_path(directory, history_pitches())))
+        with override_settings(PLAYCALLING_HISTORY_ENGINE={'table_dir': directory, 'min_samples': 3}):
+            with self.assertNumQueries(0):
+                second = get_outcome_table()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(int(second.counts.sum()), 4)
+
+
+
+@override_settings(PLAYCALLING_ENGINE='history', PLAYCALLING_HISTORY_ENGINE={'table_dir': None, 'min_samples': 3})
+class AsyncHistoryEngineTests(TransactionTestCase):
+    async def test_live_state_is_answered_while_the_table_loads(self):
+        payload = {'offense_team': 'Visitors', 'defense_team': 'Home', 'inning': 2, 'half_inning': 'top',
+                   'outs': 0, 'balls': 0, 'strikes': 0, 'score_difference': 0}
+        rules = generate_recommendation(payload)
+        alternative = next(pitch for pitch in history_pitches() if pitch != rules['pitch_call'])
+        await GamePlay.objects.abulk_create(
+            GamePlay(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0,
+                     recommended_pitch=alternative, actual_outcome='Strikeout')
+            for _ in range(3)
+        )
+
+        responses = []
+        for _ in range(2):
+            responses.append(await self.async_client.post(
+                reverse('live-game-state', args=['history-game']), payload, content_type='application/json'
+            ))
+            for thread in threading.enumerate():
+                if thread.name == 'history-table-load':
+                    thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 2)
+        self.assertEqual(json.loads(responses[-1].content)['pitch_call'], alternative)
+
+class RunExpectancyTests(APITestCase):
+    def setUp(self):
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 're.npz')
+        self.enterContext(override_settings(PLAYCALLING_RUN_EXPECTANCY={'path': self.path, 'min_samples': 2}))
+        start = timezone.now() - timedelta(hours=1)
+        # (outs, runner on first, score before the play) for two top-of-the-first half innings.
+        plays = [(0, False, 0), (1, True, 0), (1, False, 2), (2, False, 2), (0, False, 1), (2, False, 2)]
+        GamePlay.objects.bulk_create(
+            GamePlay(offense_team='Visitors', defense_team='Home', outs=outs, balls=0, strikes=index % 2,
+                     runners_on_first=first, score_difference=score,
+                     created_at=start + timedelta(minutes=index))
+            for index, (outs, first, score) in enumerate(plays)
+        )
+
+    def test_runs_are_counted_to_the_end_of_each_half_inning(self):
+        artifact = RunExpectancy.from_sequence(load_sequence())
+
+        self.assertEqual(artifact.plays[[0, 8, 9, 16]].tolist(), [2, 1, 1, 2])
+        self.assertEqual(artifact.matrix()[[0, 8, 9, 16]].tolist(), [1.5, 0.0, 2.0, 0.0])
+        self.assertEqual(artifact.count_plays[[0, 1]].tolist(), [2, 0])
+        self.assertEqual(artifact.count_matrix()[0], 1.5)
+
+    def test_synthetic_history_matches_the_usual_shape(self):
+        matrix = RunExpectancy.from_sequence(synthetic_sequence(20000)).matrix()
+
+        self.assertTrue((matrix[0:8] > matrix[8:16]).all())
+        self.assertTrue((matrix[8:16] > matrix[16:24]).all())
+
+    def test_key_points_come_from_the_saved_artifact(self):
+        payload = {'offense_team': 'Visitors', 'defense_team': 'Home', 'inning': 1, 'half_inning': 'top',
+                   'outs': 0, 'balls': 1, 'strikes': 1, 'score_difference': 0}
+        before = self.client.post(reverse('recommendation'), payload, format='json').data
+
+        out = io.StringIO()
+        call_command('rebuild_run_expectancy', stdout=out)
+        # A fresh override stands in for the reload interval passing.
+        with override_settings(PLAYCALLING_RUN_EXPECTANCY={'path': self.path, 'min_samples': 2}):
+            after = self.client.post(reverse('recommendation'), payload, format='json').data
+
+        self.assertIn('Computed run expectancy from 6 plays', out.getvalue())
+        self.assertEqual(after['key_points'][:-1], before['key_points'])
+        self.assertEqual(after['key_points'][-1], 'Run expectancy: 1.50 runs from 0 out, empty (2 recorded plays).')
+
+    def test_rebuild_if_stale_skips_unchanged_history(self):
+        call_command('rebuild_run_expectancy', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('rebuild_run_expectancy', '--if-stale', stdout=out)
+        self.assertIn('is current', out.getvalue())
+
+        GamePlay.objects.filter(outs=2).delete()
+        out = io.StringIO()
+        call_command('rebuild_run_expectancy', '--if-stale', stdout=out)
+        self.assertIn('Computed run expectancy from 4 plays', out.getvalue())
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PLAYCALLING_ARCHIVE={'path': self.directory}))
+        self.old = [
+            self._play(datetime(2023, 5, 1, 19, tzinfo=dt_timezone.utc), outs=0, outcome='Strikeout'),
+            self._play(datetime(2023, 5, 1, 19, 2, tzinfo=dt_timezone.utc), outs=1, outcome='Single to left'),
+            self._play(datetime(2024, 6, 1, 19, tzinfo=dt_timezone.utc), outs=2, outcome='Strikeout'),
+        ]
+        self.recent = self._play(timezone.now(), outs=0, outcome='Walk')
+
+    def _play(self, created_at, outs, outcome):
+        return GamePlay.objects.create(
+            offense_team='Visitors', defense_team='Home', outs=outs, balls=1, strikes=2, score_difference=outs,
+            recommended_pitch='Slider away', defensive_alignment={'infield': 'double play depth'},
+            actual_outcome=outcome, created_at=created_at,
+        )
+
+    def test_old_plays_move_into_season_files(self):
+        out = io.StringIO()
+        call_command('archive_plays', '--before', '2025-01-01', stdout=out)
+
+        self.assertIn('Archived 3 plays recorded before 2025-01-01', out.getvalue())
+        self.assertEqual(list(GamePlay.objects.all()), [self.recent])
+        seasons = archived_seasons('default')
+        self.assertEqual([(season.season, season.rows) for season in seasons], [(2023, 2), (2024, 1)])
+        self.assertEqual(seasons[0].dictionary('offense_team').tolist(), ['Visitors'])
+        chunk = next(archived_chunks(('id', 'defensive_alignment', 'actual_outcome', 'created_at'), 'default'))
+        self.assertEqual(chunk['id'].tolist(), [self.old[0].pk, self.old[1].pk])
+        self.assertEqual(chunk['actual_outcome'].tolist(), ['Strikeout', 'Single to left'])
+        self.assertEqual(chunk['defensive_alignment'][1], {'infield': 'double play depth'})
+        self.assertEqual(chunk['created_at'][0], np.datetime64('2023-05-01T19:00:00', 'us'))
+
+        # Late arrivals are merged into a new generation of the season.
+        late = self._play(datetime(2023, 4, 1, tzinfo=dt_timezone.utc), outs=0, outcome='Walk')
+        call_command('archive_plays', '--before', '2024-01-01', stdout=io.StringIO())
+        (season, _) = archived_seasons('default')
+        self.assertEqual((season.generation, season.rows), (2, 3))
+        self.assertEqual(season.array('id').tolist(), [late.pk, self.old[0].pk, self.old[1].pk])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'default'))), ['2023.2', '2024.1'])
+
+    def test_plays_changed_while_archiving_stay_live(self):
+        write = SeasonBuilder.write
+
+        def write_then_record_outcome(builder, *args, **kwargs):
+            season = write(builder, *args, **kwargs)
+            if builder.season == 2023 and not kwargs:
+                # A scorer fills in an outcome after the plays were read.
+                play = GamePlay.objects.get(pk=self.old[1].pk)
+                play.actual_outcome = 'Double to right'
+                play.save()
+            return season
+
+        out = io.StringIO()
+        with mock.patch.object(SeasonBuilder, 'write', write_then_record_outcome):
+            call_command('archive_plays', '--before', '2025-01-01', stdout=out)
+
+        self.assertIn('Archived 2 plays recorded before', out.getvalue())
+        self.assertEqual(GamePlay.objects.get(pk=self.old[1].pk).actual_outcome, 'Double to right')
+        (season, _) = archived_seasons('default')
+        self.assertEqual((season.generation, season.array('id').tolist()), (2, [self.old[0].pk]))
+
+        call_command('archive_plays', '--before', '2025-01-01', stdout=io.StringIO())
+        chunk = next(archived_chunks(('id', 'actual_outcome'), 'default'))
+        self.assertEqual(chunk['actual_outcome'].tolist(), ['Strikeout', 'Double to right'])
+        self.assertEqual(list(GamePlay.objects.all()), [self.recent])
+
+    def test_analytics_read_archived_and_live_plays_together(self):
+        sequence = load_sequence()
+        summary = list(SituationOutcomeSummary.objects.values_list('outcome', 'count'))
+
+        call_command('archive_plays', '--older-than', '30', stdout=io.StringIO())
+
+        self.assertEqual(GamePlay.objects.count(), 1)
+        self.assertEqual(list(SituationOutcomeSummary.objects.values_list('outcome', 'count')), summary)
+        rebuild_summary()
+        self.assertEqual(list(SituationOutcomeSummary.objects.values_list('outcome', 'count')), summary)
+        archived = load_sequence()
+        for field, column in sequence.items():
+            self.assertEqual(archived[field].tolist(), column.tolist(), field)
+
+    def test_dry_run_and_missing_directory(self):
+        out = io.StringIO()
+        call_command('archive_plays', '--before', '2024-01-01', '--dry-run', stdout=out)
+        self.assertIn('Would archive 2 plays of 2023 from default.', out.getvalue())
+        self.assertEqual(GamePlay.objects.count(), 4)
+        self.assertEqual(archived_seasons('default'), [])
+
+        with override_settings(PLAYCALLING_ARCHIVE={'path': None}):
+            with self.assertRaises(CommandError):
+                call_command('archive_plays', '--before', '2024-01-01')
+
+
+class SimulationTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('simulate')
+        self.situation = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 3,
+            'half_inning': 'top',
+            'outs': 1,
+            'balls': 2,
+            'strikes': 0,
+            'runners_on_first': True,
+            'runners_on_third': True,
+            'score_difference': 0,
+        }
+
+    def test_transition_tables(self):
+        # Bases loaded walk forces in a run; a double play from first ends a one-out inning.
+        self.assertEqual((NEXT_STATE[7, WALK], PA_RUNS[7, WALK]), (7, 1))
+        self.assertEqual(NEXT_STATE[1, DOUBLE_PLAY], 16)
+        self.assertEqual(NEXT_STATE[9, DOUBLE_PLAY], INNING_OVER)
+
+    def test_tactic_outcome_states(self):
+        rates = {'steal_success': 0.7, 'squeeze_success': 0.6, 'throw_out_rate': 0.4, 'delay_score_rate': 0.3}
+
+        def states(decision, option, outs, bases):
+            return [outcome[1:] for outcome in DECISIONS_BY_NAME[decision].options[option](outs, bases, rates)]
+
+        # (outs, bases, runs); bases are a bit mask: 1 first, 2 second, 4 third.
+        self.assertEqual(states('steal', 'steal', 0, 5), [(0, 6, 0), (1, 4, 0)])
+        self.assertEqual(states('squeeze', 'squeeze', 1, 5), [(2, 2, 1), (2, 1, 0)])
+        self.assertEqual(states('first_and_third', 'throw_through', 1, 5), [(2, 0, 1), (2, 4, 0), (1, 2, 1), (1, 6, 0)])
+        self.assertEqual(states('first_and_third', 'hold', 1, 5), [(1, 6, 0)])
+
+    def test_seeded_simulation_is_reproducible(self):
+        first = self.client.post(self.url, {**self.situation, 'trials': 2000, 'seed': 7}, format='json')
+        second = self.client.post(self.url, {**self.situation, 'trials': 2000, 'seed': 7}, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first.data['seed'], 7)
+        self.assertEqual([entry['decision'] for entry in first.data['decisions']],
+                         ['steal', 'squeeze', 'first_and_third'])
+        steal = first.data['decisions'][0]
+        # Staying put is the baseline inning.
+        self.assertEqual(steal['options']['stay']['expected_runs'], first.data['expected_runs'])
+        self.assertAlmostEqual(sum(steal['options']['steal']['runs_distribution']), 1, places=3)
+
+    def test_process_pool_matches_in_process_results(self):
+        payload = {'situations': [self.situation, {**self.situation, 'runners_on_third': False}], 'seed': 3}
+        with override_settings(PLAYCALLING_SIMULATION={'workers': 0, 'chunk_trials': 500, 'trials': 2000}):
+            local = self.client.post(self.url, payload, format='json')
+        with override_settings(PLAYCALLING_SIMULATION={'workers': 2, 'chunk_trials': 500, 'trials': 2000,
+                                                       'parallel_threshold': 0}):
+            pooled = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(local.data['count'], 2)
+        self.assertEqual(local.data, pooled.data)
+
+    def test_invalid_requests(self):
+        too_many = self.client.post(self.url, {**self.situation, 'trials': 10 ** 7}, format='json')
+        bad_field = self.client.post(self.url, {**self.situation, 'outs': 3}, format='json')
+
+        self.assertEqual(too_many.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('trials', too_many.data)
+        self.assertEqual(bad_field.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('outs', bad_field.data)
+        not_an_object = self.client.post(self.url, [self.situation], format='json')
+        self.assertEqual(not_an_object.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', not_an_object.data)
+
+    def test_drawn_seed_is_safe_for_javascript(self):
+        response = self.client.post(self.url, {**self.situation, 'trials': 100}, format='json')
+
+        self.assertLess(response.data['seed'], 2 ** 53)
+        replay = self.client.post(self.url, {**self.situation, 'trials': 100, 'seed': response.data['seed']},
+                                  format='json')
+        self.assertEqual(replay.data, response.data)
+
+    @override_settings(PLAYCALLING_SIMULATION={'merge_into_recommendations': True, 'trials': 1000})
+    def test_simulation_can_be_merged_into_recommendations(self):
+        response = self.client.post(reverse('recommendation'), self.situation, format='json')
+        rules = generate_recommendation(self.situation)
+
+        self.assertEqual(response.data['key_points'][:len(rules['key_points'])], rules['key_points'])
+        self.assertEqual(len(response.data['key_points']), len(rules['key_points']) + 3)
+        self.assertTrue(
+            response.data['key_points'][-3].startswith('Simulated steal of second (expected runs, 1,000 innings)')
+        )
+        batch = self.client.post(reverse('recommendation-batch'), {'situations': [self.situation]}, format='json')
+        self.assertEqual(batch.data['results'][0], response.data)
+
+
+@override_settings(PLAYCALLING_ENGINE='packs')
+class RulePackTests(APITestCase):
+    def setUp(self):
+        # Per test, so packs compiled in one test are not reused by the next.
+        self.enterContext(override_settings(PLAYCALLING_RULE_PACKS={'default': 'default', 'reload_interval': 60}))
+        self.payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 8,
+            'half_inning': 'top',
+            'outs': 1,
+            'balls': 1,
+            'strikes': 2,
+            'runners_on_first': True,
+            'score_difference': -1,
+        }
+
+    def _pack(self, pitch_call):
+        definition = load_default_pack()
+        definition['defaults']['pitch_call'] = pitch_call
+        definition['rules'] = [rule for rule in definition['rules'] if 'pitch_call' not in rule['set']]
+        return definition
+
+    def test_shipped_pack_matches_the_rules(self):
+        pack = shipped_pack()
+        for key in range(DECISION_TABLE_SIZE):
+            context = representative_context(key)
+            for inning in (context['inning'], 1):
+                context = {**context, 'inning': inning}
+                self.assertEqual(pack.recommend(context), generate_recommendation(context))
+
+    def test_only_rules_that_can_apply_are_indexed(self):
+        pack = shipped_pack()
+
+        # Bases empty, 0-0: only the high leverage and score rules can match.
+        self.assertEqual([rule.name for rule in pack.index[0]], ['high leverage', 'trailing', 'leading'])
+        # Runner on first, 2-0: "aggressive secondary lead" can never follow the green light.
+        names = [rule.name for rule in pack.index[1 * 12 + 6]]
+        self.assertIn('green light steal', names)
+        self.assertNotIn('aggressive secondary lead', names)
+
+    def test_invalid_packs_name_the_problem(self):
+        for change, message in (
+            ({'when': {'outz': 1}}, "rules[0].when: unknown field 'outz'."),
+            ({'when': {'outs': {'gtx': 1}}}, "rules[0].when.outs: unknown operator 'gtx'."),
+            ({'set': {'defensive_alignment': 'x'}}, "rules[0].set: unknown output 'defensive_alignment'."),
+        ):
+            definition = load_default_pack()
+            definition['rules'][0].update(change)
+            with self.assertRaisesMessage(RulePackError, message):
+                compile_pack(definition)
+
+    def test_team_pack_is_hot_reloaded(self):
+        url = reverse('recommendation')
+        default = self.client.post(url, self.payload, format='json').data
+        pack = RulePack.objects.create(name='home', team='Home', definition=self._pack('Curveball in the dirt.'))
+
+        home = self.client.post(url, self.payload, format='json').data
+        visitors = self.client.post(url, {**self.payload, 'defense_team': 'Other', 'offense_team': 'Rivals'},
+                                    format='json').data
+        self.assertEqual(default, generate_recommendation(self.payload))
+        self.assertEqual(home['pitch_call'], 'Curveball in the dirt.')
+        self.assertEqual(visitors['pitch_call'], default['pitch_call'])
+
+        pack.definition = self._pack('Changeup away.')
+        pack.save()
+        self.assertEqual(self.client.post(url, self.payload, format='json').data['pitch_call'], 'Changeup away.')
+
+        pack.delete()
+        self.assertEqual(self.client.post(url, self.payload, format='json').data, default)
+
+    def test_batch_uses_team_packs(self):
+        RulePack.objects.create(name='home', team='Home', definition=self._pack('Curveball in the dirt.'))
+        visitors = {**self.payload, 'defense_team': 'Other', 'offense_team': 'Rivals'}
+
+        response = self.client.post(reverse('recommendation-batch'), {'situations': [self.payload, visitors]},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['pitch_call'] for result in response.data['results']],
+                         ['Curveball in the dirt.', generate_recommendation(visitors)['pitch_call']])
+
+    def test_import_backfill_uses_team_packs(self):
+        RulePack.objects.create(name='home', team='Home', definition=self._pack('Curveball in the dirt.'))
+        log = '\n'.join(json.dumps({**self.payload, 'defense_team': team}) for team in ('Home', 'Other'))
+
+        import_plays(read_rows(io.StringIO(log), 'jsonl'), backfill=True)
+
+        self.assertEqual(
+            [(play.defense_team, play.recommended_pitch) for play in GamePlay.objects.order_by('defense_team')],
+            [('Home', 'Curveball in the dirt.'), ('Other', generate_recommendation(self.payload)['pitch_call'])],
+        )
+
+    def test_load_rule_pack_command(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        path = os.path.join(directory, 'pack.json')
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self._pack('Sinker down.'), handle)
+
+        out = io.StringIO()
+        call_command('load_rule_pack', path, '--name', 'coach-lee', '--team', 'Home', stdout=out)
+
+        self.assertIn('Created rule pack coach-lee (Home)', out.getvalue())
+        self.assertEqual(RulePack.objects.get(name='coach-lee').definition['defaults']['pitch_call'], 'Sinker down.')
+
+
+@override_settings(PLAYCALLING_SHARDS={'databases': ['shard1'], 'organizations': {'travel': 'shard1'}})
+class ShardingTests(APITestCase):
+    databases = {'default', 'shard1'}
+
+    def _play(self, organization, **fields):
+        return GamePlay(
+            organization=organization,
+            offense_team='Visitors',
+            defense_team='Home',
+            outs=1,
+            balls=0,
+            strikes=0,
+            **fields,
+        )
+
+    def test_requests_are_routed_by_organization(self):
+        payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 3,
+            'half_inning': 'top',
+            'outs': 0,
+            'balls': 0,
+            'strikes': 0,
+            'score_difference': 0,
+            'save_to_history': True,
+        }
+        self.client.post(reverse('recommendation'), payload, format='json', HTTP_X_ORGANIZATION='travel')
+        self.client.post(reverse('recommendation'), payload, format='json')
+
+        self.assertEqual(GamePlay.objects.using('shard1').get().organization, 'travel')
+        self.assertEqual(GamePlay.objects.using('default').get().organization, '')
+        travel = self.client.get(reverse('plays-list'), HTTP_X_ORGANIZATION='travel').data['results']
+        self.assertEqual([play['organization'] for play in travel], ['travel'])
+        export = self.client.get(reverse('plays-export'), {'organization': 'travel'})
+        self.assertEqual(len(b''.join(export.streaming_content).splitlines()), 1)
+        bad = self.client.get(reverse('plays-list'), HTTP_X_ORGANIZATION='no spaces')
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_and_summaries_follow_the_play(self):
+        GamePlay.objects.bulk_create([
+            self._play('travel', recommended_pitch='Slider', actual_outcome='Strikeout'),
+            self._play('', recommended_pitch='Slider', actual_outcome='Strikeout'),
+            self._play('travel', recommended_pitch='Slider', actual_outcome='Strikeout'),
+        ])
+        play = GamePlay.objects.using('shard1').first()
+        play.actual_outcome = 'Walk'
+        play.save()
+
+        shard = SituationOutcomeSummary.objects.using('shard1')
+        self.assertEqual(sorted(shard.values_list('outcome', 'count')), [('Strikeout', 1), ('Walk', 1)])
+        self.assertEqual(SituationOutcomeSummary.objects.using('default').get().count, 1)
+        analytics = self.client.get(reverse('analytics-situations'), HTTP_X_ORGANIZATION='travel').data
+        self.assertEqual(analytics['results'][0]['outcomes'], {'Strikeout': 1, 'Walk': 1})
+
+    def test_rebalance_moves_plays_in_batches(self):
+        with override_settings(PLAYCALLING_SHARDS={'databases': ['shard1'], 'organizations': {}}):
+            GamePlay.objects.bulk_create(
+                self._play('travel', recommended_pitch='Slider', actual_outcome='Strikeout') for _ in range(5)
+            )
+        self.assertEqual(GamePlay.objects.using('default').count(), 5)
+
+        out = io.StringIO()
+        call_command('rebalance_shards', '--batch-size', '2', '--skip-migrate', stdout=out)
+
+        self.assertIn('Moved 5 plays of travel from default to shard1.', out.getvalue())
+        self.assertEqual(GamePlay.objects.using('default').count(), 0)
+        self.assertEqual(GamePlay.objects.using('shard1').filter(organization='travel').count(), 5)
+        self.assertFalse(SituationOutcomeSummary.objects.using('default').exists())
+        self.assertEqual(SituationOutcomeSummary.objects.using('shard1').get().count, 5)
+
+
+@override_settings(PLAYCALLING_REPLICAS={'databases': {'default': 'replica'}, 'pin_seconds': 5})
+class ReplicaTests(TransactionTestCase):
+    # Reads inside the TestCase transaction would always stay on the primary.
+    databases = {'default', 'replica'}
+
+    def _create_play(self, **fields):
+        return GamePlay.objects.create(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0,
+                                       **fields)
+
+    def _listed(self, client):
+        return len(client.get(reverse('plays-list')).json()['results'])
+
+    def test_reads_use_the_replica_until_synced(self):
+        play = self._create_play(recommended_pitch='Slider', actual_outcome='Strikeout')
+        self.assertEqual(self._listed(self.client), 0)
+        self.assertEqual(self.client.get(reverse('plays-detail', args=[play.pk])).status_code, 404)
+
+        out = io.StringIO()
+        call_command('sync_replicas', stdout=out)
+
+        self.assertIn('Copied default to replica', out.getvalue())
+        self.assertEqual(self._listed(self.client), 1)
+        analytics = self.client.get(reverse('analytics-situations')).json()
+        self.assertEqual(analytics['results'][0]['outcomes'], {'Strikeout': 1})
+
+    def test_writers_read_their_own_writes(self):
+        call_command('sync_replicas', stdout=io.StringIO())
+        response = self.client.post(
+            reverse('plays-list'),
+            {'offense_team': 'Visitors', 'defense_team': 'Home', 'outs': 1, 'balls': 0, 'strikes': 0},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        self.assertEqual(self._listed(self.client), 1)
+        self.assertEqual(self._listed(self.client_class()), 0)
+
+    def test_updates_load_the_play_from_the_primary(self):
+        play = self._create_play()
+        call_command('sync_replicas', stdout=io.StringIO())
+        # The replica now lags behind the primary.
+        GamePlay.objects.using('default').filter(pk=play.pk).update(actual_outcome='Home run')
+
+        response = self.client.patch(
+            reverse('plays-detail', args=[play.pk]), {'context_notes': 'Wind blowing out.'},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        saved = GamePlay.objects.using('default').get()
+        self.assertEqual((saved.actual_outcome, saved.context_notes), ('Home run', 'Wind blowing out.'))
+        self.assertEqual(GamePlay.objects.using('replica').get().actual_outcome, '')
+
+    def test_sqlite_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class RecommendationTextTests(APITestCase):
+    def _play(self, **texts):
+        return GamePlay(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0, **texts)
+
+    def test_plays_with_the_same_texts_share_a_row(self):
+        texts = {'recommended_pitch': 'Slider', 'defensive_alignment': {'infield': 'Double-play depth.'}}
+        first = self._play(**texts)
+        first.save()
+        plays = GamePlay.objects.bulk_create([self._play(**texts), self._play(**{**texts, 'recommended_pitch': 'Changeup'})])
+
+        self.assertEqual(plays[0].recommendation_text_id, first.recommendation_text_id)
+        self.assertNotEqual(plays[1].recommendation_text_id, first.recommendation_text_id)
+        self.assertEqual(RecommendationText.objects.count(), 2)
+
+        first.recommended_pitch = 'Changeup'
+        first.save(update_fields=['recommended_pitch'])
+        first.refresh_from_db()
+
+        self.assertEqual(first.recommendation_text_id, plays[1].recommendation_text_id)
+        self.assertEqual(first.defensive_alignment, texts['defensive_alignment'])
+        self.assertEqual(GamePlay.objects.get(pk=plays[0].pk).recommended_pitch, 'Slider')
+
+    def test_texts_are_interned_once_per_database_and_digest(self):
+        texts = {**GamePlay().recommendation_texts(), 'offensive_sign': 'Take until a strike.'}
+
+        text = intern_texts(texts, 'default')
+
+        self.assertEqual(intern_texts(dict(reversed(list(texts.items()))), 'default'), text)
+        self.assertEqual(text.texts(), texts)
+        self.assertEqual(RecommendationText.objects.count(), 1)
+
+    def test_api_reads_and_writes_the_texts_like_columns(self):
+        payload = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'outs': 1,
+            'balls': 2,
+            'strikes': 1,
+            'recommended_pitch': 'Sinker',
+            'defensive_alignment': {'infield': 'Halfway.'},
+            'catcher_instructions': 'Stay low.',
+        }
+
+        created = self.client.post(reverse('plays-list'), payload, format='json')
+        url = reverse('plays-detail', args=[created.data['id']])
+        updated = self.client.patch(url, {'runner_instructions': 'Freeze on liners.'}, format='json')
+
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(updated.data['recommended_pitch'], 'Sinker')
+        self.assertEqual(updated.data['defensive_alignment'], {'infield': 'Halfway.'})
+        self.assertEqual(updated.data['runner_instructions'], 'Freeze on liners.')
+        self.assertEqual(updated.data['offensive_sign'], '')
+        self.assertEqual(RecommendationText.objects.count(), 2)
+
+    def test_history_list_loads_the_texts_with_one_query(self):
+        pitches = ('Slider', 'Sinker', 'Cutter', 'Curveball', 'Splitter')
+        GamePlay.objects.bulk_create(self._play(recommended_pitch=pitch) for pitch in pitches)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('plays-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['results'][0]['recommended_pitch'], 'Splitter')
+
+
+class GamePlayViewSetTests(APITestCase):
+    def test_list_endpoint_returns_saved_history(self):
+        GamePlay.objects.create(
+            offense_team='Visitors',
+            defense_team='Home',
+            inning=4,
+            half_inning='bottom',
+            outs=2,
+            balls=0,
+            strikes=2,
+            runners_on_first=False,
+            runners_on_second=True,
+            runners_on_third=False,
+            score_difference=-1,
+            offensive_sign='Aggressive approach.',
+        )
+
+        url = reverse('plays-list')
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    @override_settings(PLAYCALLING_HISTORY_PAGE_SIZE=2)
+    def test_cursor_pagination_walks_history_in_both_directions(self):
+        plays = GamePlay.objects.bulk_create(
+            GamePlay(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0)
+            for _ in range(5)
+        )
+        # Identical timestamps force the pages to rely on the id tie-breaker.
+        GamePlay.objects.update(created_at=plays[0].created_at)
+        expected = sorted(play.id for play in plays)[::-1]
+
+        url = reverse('plays-list')
+        seen, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(play['id'] for play in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = self.client.get(pages[-1]['previous'])
+        self.assertEqual(previous.data['results'], pages[1]['results'])
+
+    def _create_play(self, **overrides):
+        fields = {
+            'offense_team': 'Visitors',
+            'defense_team': 'Home',
+            'inning': 4,
+            'half_inning': 'bottom',
+            'outs': 0,
+            'balls': 0,
+            'strikes': 0,
+        }
+        fields.update(overrides)
+        return GamePlay.objects.create(**fields)
+
+    def test_base_out_state_is_packed_on_save_and_bulk_create(self):
+        play = self._create_play(outs=2, runners_on_first=True, runners_on_third=True)
+        bulk, = GamePlay.objects.bulk_create([
+            GamePlay(offense_team='A', defense_team='B', outs=1, balls=0, strikes=0, runners_on_second=True),
+        ])
+
+        self.assertEqual(play.base_out_state, 21)
+        self.assertEqual(GamePlay.objects.get(pk=bulk.pk).base_out_state, 10)
+
+    def test_list_filters_by_situation(self):
+        match = self._create_play(outs=2, runners_on_first=True, runners_on_third=True, balls=3, strikes=2, inning=8)
+        self._create_play(outs=1, runners_on_first=True, runners_on_third=True, balls=3, strikes=2, inning=8)
+        self._create_play(outs=2, runners_on_first=True, balls=3, strikes=2, inning=8)
+        self._create_play(outs=2, runners_on_first=True, runners_on_third=True, balls=1, strikes=2, inning=8)
+        self._create_play(outs=2, runners_on_first=True, runners_on_third=True, balls=3, strikes=2, inning=3)
+
+        response = self.client.get(
+            reverse('plays-list'),
+            {'outs': 2, 'bases': '1-3', 'count': '3-2', 'inning_min': 7, 'team': 'Home'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([play['id'] for play in response.data['results']], [match.id])
+
+    def test_outs_and_bases_filters_work_independently(self):
+        self._create_play(outs=0, runners_on_second=True)
+        self._create_play(outs=2, runners_on_second=True)
+        self._create_play(outs=2)
+
+        by_outs = self.client.get(reverse('plays-list'), {'outs': 2})
+        by_bases = self.client.get(reverse('plays-list'), {'bases': '2'})
+
+        self.assertEqual(len(by_outs.data['results']), 2)
+        self.assertEqual(len(by_bases.data['results']), 2)
+
+    def test_situation_filter_uses_index(self):
+        plan = filter_plays(GamePlay.objects.all(), {'outs': '2', 'bases': '13', 'count': '3-2'}).explain()
+
+        self.assertIn('gameplay_situation_idx', plan)
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get(reverse('plays-list'), {'outs': 3})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('outs', response.data)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('plays-list'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PlaySearchTests(APITestCase):
+    def _create_play(self, **fields):
+        return GamePlay.objects.create(offense_team='Visitors', defense_team='Home', outs=0, balls=0, strikes=0,
+                                       **fields)
+
+    def _search(self, query, **params):
+        response = self.client.get(reverse('plays-list'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_results_are_ranked_and_paged(self):
+        once = self._create_play(context_notes='Infield in, watch the bunt and the steal of second.')
+        twice = self._create_play(context_notes='Bunt coming.', runner_instructions='Bunt and run.')
+        self._create_play(context_notes='Swing away.')
+
+        first = self._search('bunts', **{'outs': 0})
+        self.assertEqual([play['id'] for play in first['results']], [twice.pk, once.pk])
+        with override_settings(PLAYCALLING_HISTORY_PAGE_SIZE=1):
+            page = self._search('bunt')
+            self.assertEqual(page['results'][0]['id'], twice.pk)
+            self.assertEqual(self.client.get(page['next']).data['results'][0]['id'], once.pk)
+        self.assertEqual(self._search('"bunt" OR *')['results'], [])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        play = self._create_play(catcher_instructions='Pitch out on the first move.')
+        GamePlay.objects.bulk_create([GamePlay(offense_team='Pitchout Kings', defense_team='Home', outs=0,
+                                               balls=0, strikes=0)])
+        self.assertEqual(len(self._search('pitch')['results']), 2)
+
+        play.catcher_instructions = 'Block everything in the dirt.'
+        play.save()
+        GamePlay.objects.filter(offense_team='Pitchout Kings').delete()
+
+        self.assertEqual(self._search('pitch')['results'], [])
+        self.assertEqual([row['id'] for row in self._search('dirt')['results']], [play.pk])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual([row['id'] for row in self._search('dirt')['results']], [play.pk])
+
+    def test_admin_search_uses_the_index(self):
+        from .admin import GamePlayAdmin
+
+        play = self._create_play(offensive_sign='Hit and run on the next pitch.')
+        self._create_play(offensive_sign='Take a strike.')
+        admin = GamePlayAdmin(GamePlay, None)
+
+        queryset, may_have_duplicates = admin.get_search_results(None, GamePlay.objects.all(), 'run')
+
+        self.assertEqual(list(queryset), [play])
+        self.assertFalse(may_have_duplicates)
+        self.assertIn('playcalling_gameplay_fts', str(queryset.query))
 
 
 class RecommendationDashboardTests(TestCase):
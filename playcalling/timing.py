@@ -0,0 +1,146 @@
+"""
+Per-request phase timing reported through the ``Server-Timing`` header.
+
+``ServerTimingMiddleware`` is only installed when ``PLAYCALLING_SERVER_TIMING``
+is on; otherwise Django drops it at startup. Views mark phases with
+``with phase('engine'):``, which costs a context-variable lookup when no
+request is being timed.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('playcalling_request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.phases = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.db_queries += 1
+
+    def header(self, total_seconds):
+        metrics = [f'{name};dur={seconds * 1000:.3f}' for name, seconds in self.phases.items()]
+        metrics.append(f'db;dur={self.db_seconds * 1000:.3f};desc="{self.db_queries} queries"')
+        metrics.append(f'total;dur={total_seconds * 1000:.3f}')
+        return ', '.join(metrics)
+
+
+class _Phase:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name):
+    """Context manager timing a named phase of the current request, if it is timed."""
+    timings = _current.get()
+    if timings is None:
+        return _NO_PHASE
+    return _Phase(timings, name)
+
+
+class ServerTimingMiddleware:
+    """
+    Emit ``Server-Timing`` with per-phase durations plus database query count
+    and time, and log requests slower than ``PLAYCALLING_SLOW_REQUEST_MS``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PLAYCALLING_SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'PLAYCALLING_SLOW_REQUEST_MS', 250)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self._wrap_connections(stack, timings)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        # Database connections are per thread, and async ORM calls run in the
+        # request's thread-sensitive executor, so wrap the connections there.
+        stack = ExitStack()
+        await sync_to_async(self._wrap_connections)(stack, timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _wrap_connections(self, stack, timings):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.db_wrapper))
+
+    def _finish(self, request, response, timings, total):
+        response['Server-Timing'] = timings.header(total)
+        if self.slow_request_ms is not None and total * 1000 >= self.slow_request_ms:
+            logger.warning(
+                'Slow request %s %s took %.1f ms: %s',
+                request.method,
+                request.path,
+                total * 1000,
+                response['Server-Timing'],
+            )
+        return response
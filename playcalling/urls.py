@@ -1,12 +1,54 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import GamePlayViewSet, RecommendationView
+from .async_views import LiveGameStateView, LiveGameStreamView
+from .views import (
+    BatchRecommendationView,
+    DecisionTableView,
+    GamePlayViewSet,
+    GameSessionDetailView,
+    GameSessionEventsView,
+    GameSessionListView,
+    MetricsView,
+    PlayExportView,
+    RecommendationView,
+    SimulationView,
+    SituationAnalyticsView,
+)
 
 router = DefaultRouter()
 router.register('plays', GamePlayViewSet, basename='plays')
 
 urlpatterns = [
+    # Must precede the router so "export" is not taken for a play id.
+    path('plays/export/', PlayExportView.as_view(), name='plays-export'),
+]
+
+if getattr(settings, 'PLAYCALLING_ASYNC_VIEWS', False):
+    from .async_views import AsyncPlayDetailView, AsyncPlayListView, AsyncRecommendationView
+
+    # Shadow the router's list/detail routes; everything else still goes to the viewset.
+    urlpatterns += [
+        path('plays/', AsyncPlayListView.as_view(), name='plays-list'),
+        path('plays/<int:pk>/', AsyncPlayDetailView.as_view(), name='plays-detail'),
+        path('recommendations/', AsyncRecommendationView.as_view(), name='recommendation'),
+    ]
+else:
+    urlpatterns += [
+        path('recommendations/', RecommendationView.as_view(), name='recommendation'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
-    path('recommendations/', RecommendationView.as_view(), name='recommendation'),
+    path('analytics/situations/', SituationAnalyticsView.as_view(), name='analytics-situations'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('recommendations/batch/', BatchRecommendationView.as_view(), name='recommendation-batch'),
+    path('recommendations/table/', DecisionTableView.as_view(), name='recommendation-table'),
+    path('simulate/', SimulationView.as_view(), name='simulate'),
+    path('sessions/', GameSessionListView.as_view(), name='game-session-list'),
+    path('sessions/<int:pk>/', GameSessionDetailView.as_view(), name='game-session-detail'),
+    path('sessions/<int:pk>/events/', GameSessionEventsView.as_view(), name='game-session-events'),
+    path('games/<slug:game_id>/state/', LiveGameStateView.as_view(), name='live-game-state'),
+    path('games/<slug:game_id>/stream/', LiveGameStreamView.as_view(), name='live-game-stream'),
 ]
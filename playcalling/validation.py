@@ -0,0 +1,203 @@
+"""
+Compact validators for hot paths that mirror the DRF serializers.
+
+They apply the same constraints and produce the same ``{field: [message]}``
+error shape as their serializer counterparts, without building DRF field
+objects per request. Keep them in sync with ``serializers.py``.
+"""
+
+import re
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import GamePlay
+
+REQUIRED = 'This field is required.'
+NULL = 'This field may not be null.'
+
+TRUE_VALUES = {'t', 'T', 'y', 'Y', 'yes', 'Yes', 'YES', 'true', 'True', 'TRUE', 'on', 'On', 'ON', '1', 1, True}
+FALSE_VALUES = {'f', 'F', 'n', 'N', 'no', 'No', 'NO', 'false', 'False', 'FALSE', 'off', 'Off', 'OFF', '0', 0, 0.0, False}
+
+_missing = object()
+_decimal_suffix = re.compile(r'\.0*\s*$')
+
+
+class Invalid(Exception):
+    pass
+
+
+class Field:
+    def __init__(self, required=True, default=_missing):
+        self.required = required and default is _missing
+        self.default = default
+
+    def clean(self, value):
+        raise NotImplementedError
+
+
+class CharField(Field):
+    def __init__(self, max_length=None, allow_blank=False, **kwargs):
+        super().__init__(**kwargs)
+        self.max_length = max_length
+        self.allow_blank = allow_blank
+
+    def clean(self, value):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise Invalid('Not a valid string.')
+        value = str(value).strip()
+        if not value and not self.allow_blank:
+            raise Invalid('This field may not be blank.')
+        if self.max_length is not None and len(value) > self.max_length:
+            raise Invalid(f'Ensure this field has no more than {self.max_length} characters.')
+        return value
+
+
+class IntegerField(Field):
+    def __init__(self, min_value=None, max_value=None, **kwargs):
+        super().__init__(**kwargs)
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def clean(self, value):
+        if type(value) is not int:
+            if isinstance(value, str) and len(value) > 1000:
+                raise Invalid('String value too large.')
+            try:
+                value = int(_decimal_suffix.sub('', str(value)))
+            except (ValueError, TypeError):
+                raise Invalid('A valid integer is required.')
+        if self.min_value is not None and value < self.min_value:
+            raise Invalid(f'Ensure this value is greater than or equal to {self.min_value}.')
+        if self.max_value is not None and value > self.max_value:
+            raise Invalid(f'Ensure this value is less than or equal to {self.max_value}.')
+        return value
+
+
+class BooleanField(Field):
+    def clean(self, value):
+        try:
+            if value in TRUE_VALUES:
+                return True
+            if value in FALSE_VALUES:
+                return False
+        except TypeError:
+            pass
+        raise Invalid('Must be a valid boolean.')
+
+
+class ChoiceField(Field):
+    def __init__(self, choices, **kwargs):
+        super().__init__(**kwargs)
+        self.choices = {str(choice): choice for choice in choices}
+
+    def clean(self, value):
+        try:
+            return self.choices[str(value)]
+        except KeyError:
+            raise Invalid(f'"{value}" is not a valid choice.')
+
+
+class JSONField(Field):
+    def clean(self, value):
+        return value
+
+
+class DateTimeField(Field):
+    def clean(self, value):
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None:
+            raise Invalid('Datetime has wrong format.')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+
+class Validator:
+    """Validate a mapping against a ``{name: Field}`` spec."""
+
+    fields = {}
+
+    def validate(self, data):
+        """Return ``(validated_data, errors)``; ``errors`` is empty when valid."""
+        if not hasattr(data, 'get') or isinstance(data, (str, bytes)):
+            return {}, {
+                'non_field_errors': [f'Invalid data. Expected a dictionary, but got {type(data).__name__}.'],
+            }
+        validated, errors = {}, {}
+        for name, field in self.fields.items():
+            value = data.get(name, _missing)
+            if value is _missing:
+                if field.required:
+                    errors[name] = [REQUIRED]
+                elif field.default is not _missing:
+                    validated[name] = field.default() if callable(field.default) else field.default
+                continue
+            if value is None:
+                errors[name] = [NULL]
+                continue
+            try:
+                validated[name] = field.clean(value)
+            except Invalid as exc:
+                errors[name] = [str(exc)]
+        return validated, errors
+
+
+class GamePlayValidator(Validator):
+    """Writable fields of ``GamePlaySerializer`` plus an optional source timestamp."""
+
+    fields = {
+        'offense_team': CharField(max_length=128),
+        'defense_team': CharField(max_length=128),
+        'inning': IntegerField(min_value=0, max_value=32767, required=False),
+        'half_inning': ChoiceField([choice for choice, _ in GamePlay.HALF_INNING_CHOICES], required=False),
+        'outs': IntegerField(min_value=0, max_value=2),
+        'balls': IntegerField(min_value=0, max_value=3),
+        'strikes': IntegerField(min_value=0, max_value=2),
+        'runners_on_first': BooleanField(required=False),
+        'runners_on_second': BooleanField(required=False),
+        'runners_on_third': BooleanField(required=False),
+        'score_difference': IntegerField(min_value=-2147483648, max_value=2147483647, required=False),
+        'context_notes': CharField(allow_blank=True, required=False),
+        'recommended_pitch': CharField(max_length=128, allow_blank=True, required=False),
+        'defensive_alignment': JSONField(required=False),
+        'catcher_instructions': CharField(allow_blank=True, required=False),
+        'offensive_sign': CharField(allow_blank=True, required=False),
+        'runner_instructions': CharField(allow_blank=True, required=False),
+        'actual_outcome': CharField(allow_blank=True, required=False),
+        'created_at': DateTimeField(required=False),
+    }
+
+
+class RecommendationRequestValidator(Validator):
+    """Fast-path equivalent of ``RecommendationRequestSerializer``."""
+
+    fields = {
+        'offense_team': CharField(max_length=128),
+        'defense_team': CharField(max_length=128),
+        'inning': IntegerField(min_value=1),
+        'half_inning': ChoiceField(['top', 'bottom']),
+        'outs': IntegerField(min_value=0, max_value=2),
+        'balls': IntegerField(min_value=0, max_value=3),
+        'strikes': IntegerField(min_value=0, max_value=2),
+        'runners_on_first': BooleanField(default=False),
+        'runners_on_second': BooleanField(default=False),
+        'runners_on_third': BooleanField(default=False),
+        'score_difference': IntegerField(),
+        'context_notes': CharField(allow_blank=True, required=False),
+        'save_to_history': BooleanField(default=False),
+    }
+
+
+class PitchEventValidator(Validator):
+    """One game session event; which of the optional fields apply depends on ``type``."""
+
+    fields = {
+        'type': ChoiceField(['ball', 'strike', 'foul', 'out', 'runner_advance', 'run_scored']),
+        # Bases are numbered 0 (batter) to 4 (home plate).
+        'from': IntegerField(min_value=0, max_value=3, required=False),
+        'to': IntegerField(min_value=1, max_value=4, required=False),
+        'runner': IntegerField(min_value=1, max_value=3, required=False),
+        'runs': IntegerField(min_value=1, max_value=4, default=1),
+    }
@@ -1,20 +1,68 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views import View
 from django.views.generic import TemplateView
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .analytics import situation_summaries
+from .batch import recommend_batch
+from .cache import canonical_key, get_response_cache, response_cache_stats
+from .export import FORMATS as EXPORT_FORMATS, export_rows
+from .filters import filter_plays, situation_filters
 from .forms import RecommendationForm
-from .models import GamePlay
-from .recommendations import generate_recommendation
+from .gamesessions import (
+    MAX_EVENTS_PER_REQUEST,
+    STATE_FIELDS,
+    InvalidEvent,
+    VersionConflict,
+    get_session_store,
+    session_store_stats,
+)
+from .importer import FORMATS, detect_format, import_plays, open_log, read_rows
+from .live import live_channel_stats
+from .models import GamePlay, GameSession, SituationOutcomeSummary
+from .pagination import PlayHistoryCursorPagination, PlaySearchPagination
+from .recommendations import TABULAR_ENGINES, compact_decision_table, get_engine
+from .runexpectancy import annotate_run_expectancy, get_run_expectancy
+from .search import rank_plays
 from .serializers import (
+    BatchRecommendationRequestSerializer,
     GamePlaySerializer,
     RecommendationRequestSerializer,
     RecommendationResponseSerializer,
+    SimulationRequestSerializer,
 )
+from .sharding import current_organization, organization_plays
+from .simulation import annotate_simulation, simulate_situations, simulation_options
+from .timing import phase
+from .validation import IntegerField, Invalid, PitchEventValidator, RecommendationRequestValidator
+from .writebehind import get_history_buffer, history_buffer_stats, write_behind_enabled
 
 
-def _persist_history(validated_request, recommendation):
+RECOMMENDATION_REQUEST_VALIDATOR = RecommendationRequestValidator()
+PITCH_EVENT_VALIDATOR = PitchEventValidator()
+
+
+def _recommend(context):
+    recommendation = get_engine(getattr(settings, 'PLAYCALLING_ENGINE', 'rules'))(context)
+    annotate_simulation(recommendation, context)
+    return annotate_run_expectancy(recommendation, context)
+
+
+def _history_entry(validated_request, recommendation):
     history_fields = {
+        'organization': current_organization(),
         'offense_team': validated_request['offense_team'],
         'defense_team': validated_request['defense_team'],
         'inning': validated_request['inning'],
@@ -31,38 +79,446 @@ def _persist_history(validated_request, recommendation):
     history_fields.update(
         {
             'recommended_pitch': recommendation['pitch_call'],
-            'defensive_alignment': recommendation['defensive_alignment'],
+            'defensive_alignment': dict(recommendation['defensive_alignment']),
             'catcher_instructions': recommendation['catcher_plan'],
             'offensive_sign': recommendation['offensive_signs'].get('hitter', ''),
             'runner_instructions': recommendation['offensive_signs'].get('runner', ''),
             'generated_from_engine': True,
         }
     )
-    GamePlay.objects.create(**history_fields)
+    return GamePlay(**history_fields)
+
+
+def _persist_history(validated_request, recommendation):
+    with phase('history'):
+        play = _history_entry(validated_request, recommendation)
+        if write_behind_enabled():
+            get_history_buffer().submit(play)
+        else:
+            play.save()
+
+
+async def _apersist_history(validated_request, recommendation):
+    with phase('history'):
+        play = _history_entry(validated_request, recommendation)
+        if write_behind_enabled():
+            await get_history_buffer().asubmit(play)
+        else:
+            await play.asave()
 
 
 class GamePlayViewSet(viewsets.ModelViewSet):
-    """CRUD interface for stored play history."""
+    """
+    CRUD interface for stored play history.
 
-    queryset = GamePlay.objects.all().order_by('-created_at')
+    The list accepts situation filters: ``outs``, ``bases`` (e.g. ``1-3``),
+    ``base_out_state``, ``balls``, ``strikes``, ``count`` (e.g. ``3-2``),
+    ``inning_min``, ``inning_max``, ``half_inning``, ``offense_team``,
+    ``defense_team``, ``team`` and ``generated_from_engine``, and ``q``
+    searches the team names, notes and instructions, best match first. Only
+    plays of the request's organization are visible, and new plays are stored
+    for it.
+    """
+
+    queryset = GamePlay.objects.prefetch_related('recommendation_text').order_by('-created_at', '-id')
     serializer_class = GamePlaySerializer
+    pagination_class = PlayHistoryCursorPagination
+
+    def get_queryset(self):
+        return organization_plays(super().get_queryset())
+
+    def perform_create(self, serializer):
+        serializer.save(organization=current_organization())
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = filter_plays(queryset, self.request.query_params)
+            if self.request.query_params.get('q'):
+                queryset = rank_plays(queryset, self.request.query_params['q'])
+        return queryset
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            searching = self.action == 'list' and self.request.query_params.get('q')
+            self._paginator = PlaySearchPagination() if searching else PlayHistoryCursorPagination()
+        return self._paginator
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_log(self, request):
+        """Stream an uploaded CSV or JSON Lines play log (``file``) into the history."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['This field is required.']})
+        fmt = request.data.get('format') or detect_format(upload.name)
+        if fmt not in FORMATS:
+            raise ValidationError({'format': [f'"{fmt}" is not a valid choice.']})
+        backfill = str(request.data.get('backfill', '')).lower() in ('1', 'true', 'yes', 'on')
+
+        rejects = []
+        max_rejects = getattr(settings, 'PLAYCALLING_IMPORT_MAX_REPORTED_REJECTS', 100)
+
+        def reject(line_number, row, errors):
+            if len(rejects) < max_rejects:
+                rejects.append({'line': line_number, 'errors': errors})
+
+        result = import_plays(
+            read_rows(open_log(upload), fmt), backfill=backfill, reject=reject, organization=current_organization()
+        )
+        return Response(
+            {'imported': result.imported, 'rejected': result.rejected, 'rejects': rejects},
+            status=status.HTTP_200_OK,
+        )
+
+
+class PrerenderedResponse(Response):
+    """Response whose plain JSON rendering was produced (and possibly cached) up front."""
+
+    def __init__(self, data, body, **kwargs):
+        super().__init__(data, **kwargs)
+        self.prerendered_body = body
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        if isinstance(renderer, JSONRenderer) and 'indent' not in (self.accepted_media_type or ''):
+            self['Content-Type'] = renderer.media_type
+            return self.prerendered_body
+        return super().rendered_content
+
+
+def _fast_path_enabled():
+    return getattr(settings, 'PLAYCALLING_FAST_PATH', False)
+
+
+def _encode_json(data):
+    """Byte-for-byte what DRF's ``JSONRenderer`` produces with the default settings."""
+    text = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+def _render_recommendation(validated):
+    """Run the engine and render the JSON body once: ``(etag, body, recommendation)``."""
+    with phase('engine'):
+        recommendation = _recommend(validated)
+    with phase('serialize'):
+        if _fast_path_enabled():
+            body = _encode_json(recommendation)
+        else:
+            body = JSONRenderer().render(RecommendationResponseSerializer(recommendation).data)
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body, recommendation
 
 
 class RecommendationView(APIView):
-    """Generate the next play recommendation based on the current game state."""
+    """
+    Generate the next play recommendation based on the current game state.
+
+    ``POST`` takes the situation as a JSON body and can save it to the history.
+    ``GET`` takes the same fields as query parameters and honours
+    ``If-None-Match``. JSON responses carry a strong ``ETag`` and are served
+    from the response cache when it is enabled.
+
+    With ``PLAYCALLING_FAST_PATH`` on, JSON requests skip the DRF serializers:
+    they are checked by ``RecommendationRequestValidator`` and the engine
+    output is encoded directly. The browsable API keeps the serializers.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return self._respond(request, request.query_params, allow_save=False)
 
     def post(self, request, *args, **kwargs):
-        request_serializer = RecommendationRequestSerializer(data=request.data)
-        request_serializer.is_valid(raise_exception=True)
-        validated = request_serializer.validated_data
+        with phase('parse'):
+            data = request.data
+        return self._respond(request, data, allow_save=True)
+
+    def _respond(self, request, data, allow_save):
+        with phase('validate'):
+            if _fast_path_enabled() and request.accepted_renderer.format == 'json':
+                validated, errors = RECOMMENDATION_REQUEST_VALIDATOR.validate(data)
+                if errors:
+                    raise ValidationError(errors)
+            else:
+                request_serializer = RecommendationRequestSerializer(data=data)
+                request_serializer.is_valid(raise_exception=True)
+                validated = request_serializer.validated_data
 
-        recommendation = generate_recommendation(validated)
-        response_serializer = RecommendationResponseSerializer(recommendation)
+        cache = get_response_cache()
+        if cache is None:
+            etag, body, recommendation = _render_recommendation(validated)
+        else:
+            engine_name = getattr(settings, 'PLAYCALLING_ENGINE', 'rules')
+            etag, body, recommendation = cache.get_or_render(
+                canonical_key(engine_name, validated),
+                lambda: _render_recommendation(validated),
+            )
 
-        if validated.get('save_to_history', False):
+        if request.method == 'GET' and etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = PrerenderedResponse(recommendation, body, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+
+        if allow_save and validated.get('save_to_history', False):
             _persist_history(validated, recommendation)
 
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return response
+
+
+class PlayExportView(View):
+    """
+    Stream the play history as NDJSON or CSV (``?format=ndjson|csv``).
+
+    Accepts the same situation filters as the history list, plus
+    ``created_after`` and ``created_before``. This is a plain Django view so
+    ``format`` is not taken over by DRF's content negotiation.
+    """
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return JsonResponse({'format': [f'"{fmt}" is not a valid choice.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = filter_plays(organization_plays(GamePlay.objects.all()), request.GET)
+            # Bind the database now: rows stream after the routing middleware has returned.
+            queryset = queryset.using(queryset.db)
+        except ValidationError as exc:
+            return JsonResponse(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_size = getattr(settings, 'PLAYCALLING_EXPORT_CHUNK_SIZE', 2000)
+        response = StreamingHttpResponse(export_rows(queryset, fmt, chunk_size), content_type=EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="plays.{fmt}"'
+        return response
+
+
+@lru_cache(maxsize=None)
+def _decision_table_document(engine_name):
+    """``(etag, body)`` of the compact decision table; the rules cannot change without a restart."""
+    table = compact_decision_table(engine_name)
+    return f'"{table["format"]}-{table["version"]}"', _encode_json(table)
+
+
+class DecisionTableView(View):
+    """
+    The configured engine's whole decision table, so clients can recommend
+    locally (layout in ``compact_decision_table``). Its strong ``ETag``
+    changes only with the rules: clients keep it for
+    ``PLAYCALLING_DECISION_TABLE_MAX_AGE`` seconds, then revalidate with
+    ``If-None-Match``. Not available while run expectancy or simulations are
+    merged into recommendations, since the table cannot reproduce those.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if get_run_expectancy() is not None or simulation_options()['merge_into_recommendations']:
+            return JsonResponse(
+                {'detail': 'Recommendations carry run expectancy or simulation key points that the table lacks.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            etag, body = _decision_table_document(getattr(settings, 'PLAYCALLING_ENGINE', 'rules'))
+        except ValueError as exc:
+            return JsonResponse({'detail': str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'PLAYCALLING_DECISION_TABLE_MAX_AGE', 86400)}"
+        return response
+
+
+class BatchRecommendationView(APIView):
+    """Generate recommendations for many situations in a single request."""
+
+    def post(self, request, *args, **kwargs):
+        request_serializer = BatchRecommendationRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        situations = request_serializer.validated_data['situations']
+
+        engine = getattr(settings, 'PLAYCALLING_ENGINE', 'rules')
+        if engine in TABULAR_ENGINES:
+            recommendations = recommend_batch(situations)
+        else:
+            # The decision table only holds the rules' answers.
+            recommendations = [get_engine(engine)(situation) for situation in situations]
+        for situation, recommendation in zip(situations, recommendations):
+            annotate_simulation(recommendation, situation)
+            annotate_run_expectancy(recommendation, situation)
+
+        if request_serializer.validated_data['save_to_history']:
+            GamePlay.objects.bulk_create(
+                _history_entry(validated, recommendation)
+                for validated, recommendation in zip(situations, recommendations)
+            )
+
+        return Response(
+            {'count': len(recommendations), 'results': recommendations},
+            status=status.HTTP_200_OK,
+        )
+
+
+class SessionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The game session has changed; reload it and resend the events.'
+    default_code = 'conflict'
+
+
+def _session_response(session_id, state, persist=False, status_code=status.HTTP_200_OK):
+    with phase('engine'):
+        recommendation = _recommend(state)
+    if persist and state['save_to_history']:
+        _persist_history(state, recommendation)
+    return Response(
+        {
+            'id': session_id,
+            'version': state['version'],
+            'state': {name: state[name] for name in STATE_FIELDS if name != 'version'},
+            'recommendation': recommendation,
+        },
+        status=status_code,
+    )
+
+
+class GameSessionListView(APIView):
+    """Start a game session from a full recommendation request."""
+
+    def post(self, request, *args, **kwargs):
+        serializer = RecommendationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session_id, state = get_session_store().create(**serializer.validated_data)
+        return _session_response(session_id, state, status_code=status.HTTP_201_CREATED)
+
+
+class GameSessionDetailView(APIView):
+    """Current state of a game session and its recommendation."""
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            state = get_session_store().get(pk, fresh=True)
+        except GameSession.DoesNotExist:
+            raise NotFound()
+        return _session_response(pk, state)
+
+
+class GameSessionEventsView(APIView):
+    """
+    Advance a game session with one event (the request body) or several
+    (``{"events": [...]}``) and return the next recommendation.
+
+    Events: ``ball``, ``strike``, ``foul``, ``out`` (optionally ``runner`` 1-3
+    for an out on the bases), ``runner_advance`` (``from`` 0-3, where 0 is the
+    batter, ``to`` 1-4, where 4 scores) and ``run_scored`` (``runs``). Pass
+    ``version`` to reject the events if the session has moved on since.
+    """
+
+    version_field = IntegerField(min_value=0)
+
+    def post(self, request, pk, *args, **kwargs):
+        data = request.data
+        single = not hasattr(data, 'get') or 'events' not in data
+        raw_events = [data] if single else data['events']
+        if not isinstance(raw_events, list) or not raw_events:
+            raise ValidationError({'events': ['Expected a non-empty list of events.']})
+        if len(raw_events) > MAX_EVENTS_PER_REQUEST:
+            raise ValidationError({'events': [f'Ensure this field has no more than {MAX_EVENTS_PER_REQUEST} elements.']})
+
+        with phase('validate'):
+            events, errors = [], []
+            for raw_event in raw_events:
+                event, event_errors = PITCH_EVENT_VALIDATOR.validate(raw_event)
+                events.append(event)
+                errors.append(event_errors)
+            expected_version = self._expected_version(data)
+        if any(errors):
+            raise ValidationError(errors[0] if single else {'events': errors})
+
+        try:
+            state = get_session_store().apply(pk, events, expected_version)
+        except GameSession.DoesNotExist:
+            raise NotFound()
+        except InvalidEvent as exc:
+            detail = {exc.field: [exc.message]}
+            if not single:
+                detail = {'events': [detail if index == exc.index else {} for index in range(len(events))]}
+            raise ValidationError(detail)
+        except VersionConflict:
+            raise SessionConflict()
+        return _session_response(pk, state, persist=True)
+
+    def _expected_version(self, data):
+        version = data.get('version') if hasattr(data, 'get') else None
+        if version is None:
+            return None
+        try:
+            return self.version_field.clean(version)
+        except Invalid as exc:
+            raise ValidationError({'version': [str(exc)]})
+
+
+class SituationAnalyticsView(APIView):
+    """
+    Historical outcome counts per situation and recommended pitch.
+
+    Reads only the summary table. Accepts the history situation filters
+    (``outs``, ``bases``, ``base_out_state``, ``balls``, ``strikes``, ``count``)
+    and ``recommended_pitch``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        filters = situation_filters(request.query_params)
+        if request.query_params.get('recommended_pitch'):
+            filters['recommended_pitch'] = request.query_params['recommended_pitch']
+        summaries = situation_summaries(SituationOutcomeSummary.objects.filter(**filters))
+        return Response({'count': len(summaries), 'results': summaries})
+
+
+class SimulationView(APIView):
+    """
+    Simulate the rest of the inning for each tactical option open in a situation.
+
+    The body is a recommendation request, optionally with ``trials`` (per
+    option) and ``seed``, or ``{"situations": [...]}`` to simulate several at
+    once. Responses carry the ``seed`` used, so any run can be reproduced.
+    """
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        if not isinstance(data, dict):
+            raise ValidationError(
+                {'non_field_errors': [f'Invalid data. Expected a dictionary, but got {type(data).__name__}.']}
+            )
+        single = 'situations' not in data
+        if single:
+            data = {
+                'situations': [{name: value for name, value in data.items() if name not in ('trials', 'seed')}],
+                **{name: data[name] for name in ('trials', 'seed') if name in data},
+            }
+        serializer = SimulationRequestSerializer(data=data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except ValidationError as exc:
+            if single and 'situations' in exc.detail:
+                # Report a single situation's errors against its own fields.
+                (errors,) = exc.detail['situations']
+                raise ValidationError(errors)
+            raise
+        validated = serializer.validated_data
+        seed, results = simulate_situations(validated['situations'], validated.get('trials'), validated.get('seed'))
+        if single:
+            return Response({'seed': seed, **results[0]})
+        return Response({'seed': seed, 'count': len(results), 'results': results})
+
+
+class MetricsView(APIView):
+    """Operational counters for the in-process playcalling machinery."""
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'history_buffer': history_buffer_stats(),
+            'recommendation_cache': response_cache_stats(),
+            'live_games': live_channel_stats(),
+            'game_sessions': session_store_stats(),
+        })
 
 
 class RecommendationDashboardView(TemplateView):
@@ -80,12 +536,19 @@ class RecommendationDashboardView(TemplateView):
         recommendation_data = None
         history_created = False
 
-        if form.is_valid():
+        with phase('validate'):
+            form_is_valid = form.is_valid()
+
+        if form_is_valid:
             serializer = RecommendationRequestSerializer(data=form.cleaned_data)
-            if serializer.is_valid():
+            with phase('validate'):
+                serializer_is_valid = serializer.is_valid()
+            if serializer_is_valid:
                 validated = serializer.validated_data
-                recommendation = generate_recommendation(validated)
-                recommendation_data = RecommendationResponseSerializer(recommendation).data
+                with phase('engine'):
+                    recommendation = _recommend(validated)
+                with phase('serialize'):
+                    recommendation_data = RecommendationResponseSerializer(recommendation).data
 
                 if validated.get('save_to_history'):
                     _persist_history(validated, recommendation)
@@ -0,0 +1,225 @@
+"""
+Write-behind persistence for recommendation history.
+
+With ``PLAYCALLING_HISTORY_WRITE_BEHIND`` enabled, ``_persist_history`` hands
+unsaved ``GamePlay`` rows to an in-process bounded queue instead of inserting
+them inside the request. A daemon thread drains the queue with ``bulk_create``
+whenever ``batch_size`` rows are waiting or ``flush_interval`` seconds have
+passed, and the queue is flushed once more when the process exits. When a
+batch cannot be inserted, its rows are saved one at a time so only the
+failing rows are lost.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import GamePlay
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('sync', 'block', 'drop')
+
+DEFAULT_BUFFER_SETTINGS = {
+    'max_size': 10000,
+    'batch_size': 500,
+    'flush_interval': 0.5,
+    # What to do when the queue is full: 'sync' writes the row inline,
+    # 'block' waits up to block_timeout seconds before writing inline,
+    # 'drop' discards the row and counts it.
+    'overflow': 'sync',
+    'block_timeout': 1.0,
+}
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=0.5, overflow='sync', block_timeout=1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow!r}; choose from {OVERFLOW_POLICIES}.')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._exit_hook = False
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'written_inline': 0,
+            'dropped': 0,
+            'failed': 0,
+            'flushes': 0,
+        }
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # Producer side -------------------------------------------------------
+
+    def submit(self, play):
+        """Queue an unsaved ``GamePlay``; returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(play)
+        except queue.Full:
+            return self._overflow(play)
+        self._count('enqueued')
+        return True
+
+    async def asubmit(self, play):
+        """``submit`` for async callers; only the overflow policies leave the event loop."""
+        try:
+            self._queue.put_nowait(play)
+        except queue.Full:
+            return await sync_to_async(self._overflow)(play)
+        self._count('enqueued')
+        return True
+
+    def _overflow(self, play):
+        if self.overflow == 'block':
+            try:
+                self._queue.put(play, timeout=self.block_timeout)
+            except queue.Full:
+                pass
+            else:
+                self._count('enqueued')
+                return True
+        if self.overflow == 'drop':
+            self._count('dropped')
+            logger.warning('History write-behind queue is full; dropped a recommendation.')
+            return False
+        play.save()
+        self._count('written_inline')
+        return True
+
+    # Consumer side -------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='history-write-behind', daemon=True)
+        self._thread.start()
+        if not self._exit_hook:
+            atexit.register(self.stop)
+            self._exit_hook = True
+
+    def stop(self, timeout=5.0):
+        """Stop the flusher thread and write everything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """Synchronously drain the queue in ``batch_size`` chunks."""
+        while self._flush_batch(self._take_batch(block=False)):
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(block=True)
+            if batch:
+                self._flush_batch(batch)
+                close_old_connections()
+
+    def _take_batch(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_batch(self, batch):
+        if not batch:
+            return False
+        started = time.perf_counter()
+        with self._flush_lock:
+            try:
+                GamePlay.objects.bulk_create(batch)
+                written = len(batch)
+            except Exception:
+                logger.warning('History write-behind flush of %d rows failed; saving them one by one.', len(batch),
+                               exc_info=True)
+                written = self._save_each(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counters['written'] += written
+            self._counters['flushes'] += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+        return True
+
+    def _save_each(self, batch):
+        written = 0
+        for play in batch:
+            try:
+                play.save()
+            except Exception:
+                logger.exception('History write-behind could not save a recommendation; dropped it.')
+                self._count('failed')
+            else:
+                written += 1
+        return written
+
+    # Metrics -------------------------------------------------------------
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            flushes = self._counters['flushes']
+            return {
+                'depth': self._queue.qsize(),
+                'max_size': self._queue.maxsize,
+                'overflow': self.overflow,
+                'running': self._thread is not None and self._thread.is_alive(),
+                **self._counters,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'max_flush_ms': round(self._max_flush_ms, 3),
+                'mean_flush_ms': round(self._total_flush_ms / flushes, 3) if flushes else 0.0,
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, 'PLAYCALLING_HISTORY_WRITE_BEHIND', False)
+
+
+def get_history_buffer():
+    """Process-wide buffer configured from ``PLAYCALLING_HISTORY_BUFFER``, started on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                options = {**DEFAULT_BUFFER_SETTINGS, **getattr(settings, 'PLAYCALLING_HISTORY_BUFFER', {})}
+                _buffer = WriteBehindBuffer(**options)
+                _buffer.start()
+    return _buffer
+
+
+def history_buffer_stats():
+    return _buffer.stats() if _buffer is not None else None